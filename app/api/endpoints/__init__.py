@@ -1,4 +1,7 @@
+from app.api.endpoints.audit import router as audit_router
 from app.api.endpoints.auth import router as auth_router
+from app.api.endpoints.introspect import router as introspect_router
+from app.api.endpoints.metrics import router as metrics_router
 from app.api.endpoints.user import router as user_router
 
-__all__ = ["auth_router", "user_router"] 
\ No newline at end of file
+__all__ = ["audit_router", "auth_router", "introspect_router", "metrics_router", "user_router"] 
\ No newline at end of file
@@ -0,0 +1,62 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.core.audit import AuditCursor, audit_log
+from app.core.config import settings
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MAX_EVENTS_PER_REQUEST = 10000
+MAX_WAIT_SECONDS = 30.0
+
+router = APIRouter()
+
+
+def require_audit_token(authorization: Optional[str] = Header(None)) -> None:
+    """Dependency admitting only callers presenting AUDIT_API_TOKEN as a Bearer token."""
+    if not settings.AUDIT_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Audit API is disabled: AUDIT_API_TOKEN is not set"
+        )
+    token = authorization[7:] if authorization and authorization[:7].lower() == "bearer " else ""
+    if not secrets.compare_digest(token.encode(), settings.AUDIT_API_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid audit API token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+@router.get("/events", dependencies=[Depends(require_audit_token)])
+async def stream_events(
+    since: str = Query("0", max_length=4096,
+                       description="Return events after the last seq seen per stream, as worker-0:41,worker-1:17; "
+                                   "0 for the oldest available"),
+    limit: int = Query(1000, ge=1, le=MAX_EVENTS_PER_REQUEST),
+    wait: float = Query(0.0, ge=0.0, le=MAX_WAIT_SECONDS, description="Seconds to wait for new events when there are none")
+):
+    """Stream the audit events of every worker after the ``since`` cursor as NDJSON, oldest first.
+
+    Every line names its ``stream``; pass the highest ``seq`` received from
+    each stream as the next ``since``.
+    """
+    try:
+        cursor = AuditCursor.parse(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid since cursor"
+        )
+    await audit_log.wait_for_events(cursor, wait)
+    return StreamingResponse(
+        audit_log.read(cursor, limit),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={
+            "Cache-Control": "no-store",
+            "X-Audit-Stream": audit_log.stream,
+            "X-Audit-Last-Seq": str(audit_log.last_seq)
+        }
+    )
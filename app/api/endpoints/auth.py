@@ -1,15 +1,25 @@
-from fastapi import APIRouter, HTTPException, status, Query
+import secrets
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 
+from app.core.audit import audit_log
 from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.models import AuthResponse
+from app.core.responses import ModelJSONResponse
+from app.core.session_tokens import session_signer
+from app.core.storage import Storage, get_storage
 from app.core.logger import logger
 from app.services.lark_service import (
-    get_user_access_token,
-    get_user_info,
-    create_or_update_user,
-    refresh_access_token
+    complete_login,
+    refresh_access_token,
+    save_refreshed_session
 )
+from app.services.login_warmup import login_warmup
 
 
 class RefreshTokenRequest(BaseModel):
@@ -17,22 +27,50 @@ class RefreshTokenRequest(BaseModel):
 
 router = APIRouter()
 
+# OAuth state of a login in progress, bound to the browser that started it
+STATE_COOKIE_NAME = "lark_oauth_state"
+STATE_COOKIE_MAX_AGE = 600
+
+
+def _client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
 
 @router.get("/lark/login")
-async def lark_login():
+async def lark_login(client: httpx.AsyncClient = Depends(get_http_client)):
     """Redirect to Lark authorization page."""
+    if settings.LOGIN_WARMUP_ENABLED:
+        # The browser comes back to the callback in a few seconds; have the token and a connection ready
+        login_warmup.schedule(client)
+    state = secrets.token_urlsafe(16)
     auth_url = (
         f"{settings.LARK_AUTH_BASE_URL}/authen/v1/authorize"
         f"?app_id={settings.LARK_APP_ID}"
         f"&redirect_uri={settings.REDIRECT_URI}"
         f"&response_type=code"
+        f"&state={state}"
+    )
+    logger.bind(sample="auth_redirect").info("Redirecting to Lark auth URL: {}", auth_url)
+    response = RedirectResponse(url=auth_url)
+    response.set_cookie(
+        STATE_COOKIE_NAME,
+        state,
+        max_age=STATE_COOKIE_MAX_AGE,
+        httponly=True,
+        secure=settings.SESSION_COOKIE_SECURE,
+        samesite="lax"
     )
-    logger.info(f"Redirecting to Lark auth URL: {auth_url}")
-    return RedirectResponse(url=auth_url)
+    return response
 
 
 @router.get("/lark/callback")
-async def lark_callback(code: str = Query(...)):
+async def lark_callback(
+    request: Request,
+    code: str = Query(...),
+    state: Optional[str] = Query(None),
+    client: httpx.AsyncClient = Depends(get_http_client),
+    storage: Storage = Depends(get_storage)
+):
     """Handle Lark callback with authorization code."""
     try:
         if not code:
@@ -41,46 +79,58 @@ async def lark_callback(code: str = Query(...)):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Missing authorization code"
             )
-            
-        # Exchange code for access token
-        token_data = await get_user_access_token(code)
-        if not token_data or "access_token" not in token_data:
-            logger.error("Failed to get access token")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Failed to get access token"
-            )
-            
-        # Get user info
-        user_info = await get_user_info(token_data["access_token"])
-        if not user_info:
-            logger.error("Failed to get user info")
+
+        expected_state = request.cookies.get(STATE_COOKIE_NAME)
+        if expected_state is not None and not secrets.compare_digest((state or "").encode(), expected_state.encode()):
+            logger.error("OAuth state does not match the login started in this browser")
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Failed to get user info"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid state"
             )
-            
-        # Create or update user and auth info
-        result = await create_or_update_user(user_info, token_data)
-        
+
+        # Reloads and double-submitted redirects from this browser repeat the code and state; they share
+        # or replay the first exchange
+        result, replayed = await complete_login(code, client, storage, state=expected_state)
+
         # Redirect to frontend with success
         # Use the static files served by the same backend
-        redirect_url = f"/static/login-success.html?userId={result['user']['id']}"
-        return RedirectResponse(url=redirect_url)
-    except HTTPException:
+        redirect_url = f"/static/login-success.html?userId={result.user.id}"
+        response = RedirectResponse(url=redirect_url)
+        # Signed session so later reads can identify the user on any worker without a store lookup
+        session_expires_at = result.auth.refresh_expires_at if result.auth else None
+        response.set_cookie(
+            settings.SESSION_COOKIE_NAME,
+            session_signer.issue(result.user, session_expires_at),
+            max_age=settings.SESSION_TOKEN_TTL,
+            httponly=True,
+            secure=settings.SESSION_COOKIE_SECURE,
+            samesite="lax"
+        )
+        audit_log.emit(
+            "login", outcome="success", user_id=result.user.id, ip=_client_ip(request), replayed=replayed or None
+        )
+        return response
+    except HTTPException as e:
+        audit_log.emit("login", outcome="failure", status=e.status_code, reason=e.detail, ip=_client_ip(request))
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
         logger.error(f"Error in Lark callback: {str(e)}")
+        audit_log.emit("login", outcome="failure", status=500, reason="internal error", ip=_client_ip(request))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process Lark authentication"
         )
 
 
-@router.post("/lark/refresh")
-async def refresh_token(request: RefreshTokenRequest):
-    """Refresh the access token using a refresh token."""
+@router.post("/lark/refresh", response_model=AuthResponse, response_class=ModelJSONResponse)
+async def refresh_token(
+    request: RefreshTokenRequest,
+    http_request: Request,
+    client: httpx.AsyncClient = Depends(get_http_client),
+    storage: Storage = Depends(get_storage)
+):
+    """Refresh the access token using a refresh token and store the rotated tokens."""
     try:
         if not request.refresh_token:
             logger.error("Missing refresh token")
@@ -90,26 +140,36 @@ async def refresh_token(request: RefreshTokenRequest):
             )
             
         # Refresh the token
-        token_data = await refresh_access_token(request.refresh_token)
+        token_data = await refresh_access_token(request.refresh_token, client)
         if not token_data or "access_token" not in token_data:
             logger.error("Failed to refresh token")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Failed to refresh token"
             )
+
+        # Keep the stored session, and with it the token indexes, on the new tokens
+        auth = await save_refreshed_session(request.refresh_token, token_data, storage)
+        audit_log.emit(
+            "refresh", outcome="success", user_id=auth.user_id if auth else None, ip=_client_ip(http_request)
+        )
             
-        return {
-            "access_token": token_data["access_token"],
-            "token_type": token_data.get("token_type", "Bearer"),
-            "refresh_token": token_data["refresh_token"],
-            "expires_at": token_data["expires_at"].isoformat(),
-            "refresh_expires_at": token_data["refresh_expires_at"].isoformat()
-        }
-    except HTTPException:
+        return ModelJSONResponse(AuthResponse.model_construct(
+            access_token=token_data["access_token"],
+            token_type=token_data.get("token_type", "Bearer"),
+            refresh_token=token_data["refresh_token"],
+            expires_at=token_data["expires_at"],
+            refresh_expires_at=token_data["refresh_expires_at"]
+        ))
+    except HTTPException as e:
+        audit_log.emit(
+            "refresh", outcome="failure", status=e.status_code, reason=e.detail, ip=_client_ip(http_request)
+        )
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
         logger.error(f"Error refreshing token: {str(e)}")
+        audit_log.emit("refresh", outcome="failure", status=500, reason="internal error", ip=_client_ip(http_request))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to refresh token"
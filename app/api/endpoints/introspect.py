@@ -0,0 +1,58 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.core.models import TokenIntrospection, TokenIntrospectionBatch
+from app.core.responses import ModelJSONResponse
+from app.core.storage import Storage, get_storage
+from app.core.logger import logger
+from app.services.lark_service import introspect_access_tokens
+
+# Token state changes on every refresh; downstream services must not reuse answers
+INTROSPECTION_HEADERS = {"Cache-Control": "no-store"}
+
+
+class IntrospectionRequest(BaseModel):
+    token: str = Field(..., min_length=1)
+
+
+class IntrospectionBatchRequest(BaseModel):
+    tokens: List[str] = Field(..., min_length=1, max_length=settings.INTROSPECT_MAX_TOKENS)
+
+router = APIRouter()
+
+
+@router.post("/introspect", response_model=TokenIntrospection, response_class=ModelJSONResponse)
+async def introspect_token(request: IntrospectionRequest, storage: Storage = Depends(get_storage)):
+    """Check whether a Lark access token belongs to a signed-in user of this app, and whose it is."""
+    try:
+        results = await introspect_access_tokens([request.token], storage)
+        return ModelJSONResponse(results[0], headers=INTROSPECTION_HEADERS)
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error introspecting token: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to introspect token"
+        )
+
+
+@router.post("/introspect/batch", response_model=TokenIntrospectionBatch, response_class=ModelJSONResponse)
+async def introspect_tokens_batch(request: IntrospectionBatchRequest, storage: Storage = Depends(get_storage)):
+    """Introspect several access tokens at once; results follow the order of ``tokens``."""
+    try:
+        results = await introspect_access_tokens(request.tokens, storage)
+        return ModelJSONResponse(TokenIntrospectionBatch.model_construct(results=results), headers=INTROSPECTION_HEADERS)
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error introspecting tokens batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to introspect tokens"
+        )
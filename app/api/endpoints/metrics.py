@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.core.audit import audit_log
+from app.core.cache import user_response_cache
+from app.core.metrics import (
+    audit_dropped, lark_circuit_open, lark_outbound_concurrency, lark_outbound_queue_depth, lark_outbound_rate_limited,
+    record_cache_stats, registry, sessions_gauge, store_evictions, store_journal_pending, store_snapshot_duration,
+    store_snapshots, users_gauge
+)
+from app.core.storage import Storage, get_storage
+from app.services.lark_service import (
+    app_token_cache, lark_breaker, lark_scheduler, login_coalescer, refresh_coalescer
+)
+from app.services.resilience import CLOSED
+
+router = APIRouter()
+
+# Starlette appends "; charset=utf-8" to text/* media types
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(storage: Storage = Depends(get_storage)):
+    """Expose metrics in the Prometheus text format."""
+    # Gauges and mirrored cache counters are sampled at scrape time so the hot path never touches them
+    users_gauge.set(await storage.count_users())
+    sessions_gauge.set(await storage.count_sessions())
+    for reason, count in storage.eviction_stats().items():
+        store_evictions.set(count, reason)
+    persistence = storage.persistence_stats()
+    if persistence:
+        store_snapshots.set(persistence["snapshots"])
+        store_snapshot_duration.set(persistence["last_snapshot_seconds"])
+        store_journal_pending.set(persistence["journal"])
+    record_cache_stats("app_token", app_token_cache.hits, app_token_cache.misses)
+    record_cache_stats("user_response", user_response_cache.hits, user_response_cache.misses)
+    lark_circuit_open.set(int(lark_breaker.state != CLOSED))
+    for priority, depth in lark_scheduler.queue_depth().items():
+        lark_outbound_queue_depth.set(depth, priority)
+    lark_outbound_concurrency.set(int(lark_scheduler.limit))
+    lark_outbound_rate_limited.set(lark_scheduler.rate_limited)
+    audit_dropped.set(audit_log.dropped)
+    refresh = refresh_coalescer.stats()
+    record_cache_stats("refresh_result", refresh["result_hits"] + refresh["coalesced"], refresh["calls"])
+    login = login_coalescer.stats()
+    record_cache_stats("login_result", login["result_hits"] + login["error_hits"] + login["coalesced"], login["calls"])
+
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
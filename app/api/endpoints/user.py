@@ -1,45 +1,79 @@
-from fastapi import APIRouter, HTTPException, status
+import hashlib
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
 
-from app.core.models import users_db, auth_db
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.core.models import SessionClaims, User, UserAuth, UserResponse
+from app.core.responses import ModelJSONResponse
+from app.core.session_tokens import get_session
+from app.core.storage import Storage, get_storage
 from app.core.logger import logger
+from app.core.cache import user_response_cache
+
+# Users looked up per storage round trip when streaming a batch
+BATCH_CHUNK_SIZE = 500
+
+USER_FIELDS = frozenset(User.model_fields)
+
+# Responses carry tokens: browsers may keep them but must revalidate every time
+USER_CACHE_CONTROL = "private, no-cache"
+
+
+class UserBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=settings.USER_BATCH_MAX_IDS)
+    fields: Optional[List[str]] = Field(
+        None,
+        description="User fields to return besides the ID; include \"auth\" to also return tokens. Defaults to everything."
+    )
 
 router = APIRouter()
 
 
-@router.get("/{user_id}")
-async def get_user(user_id: str):
-    """Get user information by user ID."""
+@router.get("/me", response_model=SessionClaims, response_class=ModelJSONResponse)
+async def get_current_user(session: SessionClaims = Depends(get_session)):
+    """Get the signed-in user from their session token, without a storage lookup."""
+    return ModelJSONResponse(session)
+
+
+@router.get("/{user_id}", response_model=UserResponse, response_class=ModelJSONResponse)
+async def get_user(
+    user_id: str,
+    storage: Storage = Depends(get_storage),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get user information by user ID.
+
+    Responses carry a strong ETag and If-None-Match is answered with 304.
+    With storage private to the worker, rendered bodies are cached until the
+    user or session is written or removed.
+    """
     try:
+        cached = user_response_cache.get(user_id) if not storage.shared else None
+        if cached is not None:
+            return _etag_response(*cached, if_none_match)
+
         # Check if user exists
-        if user_id not in users_db:
-            logger.error(f"User not found: {user_id}")
+        user = await storage.get_user(user_id)
+        if user is None:
+            logger.bind(sample="user_not_found").error("User not found: {}", user_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
             
-        # Get user and auth information
-        user = users_db[user_id]
-        auth = auth_db.get(user_id)
-        
-        if not auth:
-            logger.error(f"Auth information not found for user: {user_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Auth information not found"
-            )
-            
+        # Users imported by the directory sync have a profile but no session until they log in
+        auth = await storage.get_auth(user_id)
+
         # Return user data and token information
-        return {
-            "user": user.dict(),
-            "auth": {
-                "access_token": auth.access_token,
-                "token_type": auth.token_type,
-                "refresh_token": auth.refresh_token,
-                "expires_at": auth.expires_at.isoformat(),
-                "refresh_expires_at": auth.refresh_expires_at.isoformat()
-            }
-        }
+        etag = _user_etag(user, auth)
+        body = ModelJSONResponse(UserResponse.from_records(user, auth)).body
+        if not storage.shared:
+            user_response_cache.set(user_id, (etag, body))
+        return _etag_response(etag, body, if_none_match)
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
@@ -48,4 +82,106 @@ async def get_user(user_id: str):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get user information"
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.post("/batch")
+async def get_users_batch(request: UserBatchRequest, storage: Storage = Depends(get_storage)):
+    """Get several users by ID in one request.
+
+    Returns the found users and the IDs that don't exist. Requests with more
+    than USER_BATCH_STREAM_THRESHOLD IDs are streamed in chunks.
+    """
+    try:
+        unknown_fields = set(request.fields or ()) - USER_FIELDS - {"auth"}
+        if unknown_fields:
+            logger.error(f"Unknown user fields requested: {sorted(unknown_fields)}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}"
+            )
+
+        # Deduplicate while keeping the caller's order
+        user_ids = list(dict.fromkeys(request.ids))
+        # The ID is always returned so callers can match results to their request
+        user_fields = (USER_FIELDS & set(request.fields)) | {"id"} if request.fields else None
+        include_auth = request.fields is None or "auth" in request.fields
+
+        body = _stream_users_batch(storage, user_ids, user_fields, include_auth)
+        if len(user_ids) > settings.USER_BATCH_STREAM_THRESHOLD:
+            return StreamingResponse(body, media_type="application/json")
+
+        return Response(b"".join([chunk async for chunk in body]), media_type="application/json")
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error getting users batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get user information"
+        )
+
+
+async def _load_users_batch(
+    storage: Storage,
+    user_ids: Sequence[str],
+    user_fields: Optional[Set[str]],
+    include_auth: bool
+) -> Tuple[List[bytes], List[str]]:
+    """Load a chunk of users and return ``(serialized_users, missing_ids)``."""
+    users = await storage.get_users(user_ids)
+    auths = await storage.get_auths(list(users)) if include_auth else {}
+    include: Dict[str, Any] = {"user": user_fields if user_fields is not None else True}
+    if include_auth:
+        include["auth"] = True
+
+    found = []
+    missing = []
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if user is None:
+            missing.append(user_id)
+            continue
+        item = UserResponse.from_records(user, auths.get(user_id))
+        found.append(item.__pydantic_serializer__.to_json(item, include=include))
+    return found, missing
+
+
+async def _stream_users_batch(
+    storage: Storage,
+    user_ids: Sequence[str],
+    user_fields: Optional[Set[str]],
+    include_auth: bool
+) -> AsyncIterator[bytes]:
+    """Yield the batch response document chunk by chunk."""
+    missing: List[str] = []
+    separator = b""
+    yield b'{"users":['
+    for start in range(0, len(user_ids), BATCH_CHUNK_SIZE):
+        found, chunk_missing = await _load_users_batch(
+            storage, user_ids[start:start + BATCH_CHUNK_SIZE], user_fields, include_auth
+        )
+        missing.extend(chunk_missing)
+        if found:
+            yield separator + b",".join(found)
+            separator = b","
+    yield b'],"missing":' + json.dumps(missing, separators=(",", ":")).encode() + b"}"
+
+
+def _user_etag(user: User, auth: Optional[UserAuth]) -> str:
+    """Strong ETag derived from the user's last update and the auth record version."""
+    version = auth.version if auth is not None else "-"
+    digest = hashlib.blake2b(
+        f"{user.id}|{user.updated_at.isoformat()}|{version}".encode(),
+        digest_size=12
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_response(etag: str, body: bytes, if_none_match: Optional[str]) -> Response:
+    """Return 304 if the client already has this version, else the cached body."""
+    headers = {"ETag": etag, "Cache-Control": USER_CACHE_CONTROL}
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
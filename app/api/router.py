@@ -1,9 +1,13 @@
 from fastapi import APIRouter
+from app.api.endpoints.audit import router as audit_router
 from app.api.endpoints.auth import router as auth_router
+from app.api.endpoints.introspect import router as introspect_router
 from app.api.endpoints.user import router as user_router
 
 router = APIRouter()
 
 # Include all routers
 router.include_router(auth_router, prefix="/auth/user", tags=["auth"])
+router.include_router(introspect_router, prefix="/auth", tags=["auth"])
 router.include_router(user_router, prefix="/user", tags=["user"])
+router.include_router(audit_router, prefix="/audit", tags=["audit"])
@@ -0,0 +1,389 @@
+"""
+Audit event stream of logins, refreshes and Lark API failures.
+
+``audit_log.emit`` numbers each event and appends it to an in-memory ring
+buffer; it neither serializes nor touches the disk. A background task
+serializes new events to JSON lines and appends them in batches to
+append-only NDJSON segment files (``events-<first seq>.ndjson``) from a
+worker thread.
+
+Each worker claims its own stream directory, ``worker-<n>`` under
+AUDIT_LOG_DIR, by holding a flock() on it, so workers never write to the
+same segment. Sequence numbers are per stream and resume from the newest
+segment when a restarted worker claims the stream again. Segments are never
+deleted by the application.
+
+Readers ask any worker for the events after a cursor holding the ``seq`` of
+the last event they have seen in each stream. The worker merges its own
+stream, recent events from the ring buffer and older ones from the segments,
+with the segments the other workers have flushed so far.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STREAM_PREFIX = "worker-"
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".ndjson"
+# Lines per chunk handed to the response, so streaming doesn't cost a thread hop per event
+READ_CHUNK_LINES = 500
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+
+
+def _line_seq(line: bytes) -> int:
+    # Every line starts with {"seq":<n>,
+    return int(line[7:line.index(b",", 7)])
+
+
+def _line_ts(line: bytes) -> bytes:
+    # ISO 8601 UTC timestamps of equal precision sort as bytes
+    start = line.index(b'"ts":"') + 6
+    return line[start:start + 29]
+
+
+class AuditCursor:
+    """Position of a reader in the audit streams: the last ``seq`` seen per stream.
+
+    Written as ``worker-0:41,worker-1:17``. A bare number applies to every
+    stream not named, so ``0`` starts each stream from its oldest event.
+    """
+    __slots__ = ("default", "positions")
+
+    def __init__(self, default: int = 0, positions: Optional[Dict[str, int]] = None):
+        self.default = default
+        self.positions = positions or {}
+
+    @classmethod
+    def parse(cls, text: str) -> "AuditCursor":
+        """Parse a cursor, raising ValueError when it is malformed."""
+        cursor = cls()
+        for part in text.split(","):
+            stream, _, seq = part.strip().rpartition(":")
+            value = int(seq)
+            if value < 0:
+                raise ValueError(f"Negative seq in audit cursor: {part}")
+            if stream:
+                cursor.positions[stream] = value
+            else:
+                cursor.default = value
+        return cursor
+
+    def get(self, stream: str) -> int:
+        return self.positions.get(stream, self.default)
+
+
+class AuditEvent:
+    """A recorded event, serialized on first use by the flush or a reader."""
+    __slots__ = ("seq", "stream", "timestamp", "type", "fields", "_line")
+
+    def __init__(self, seq: int, stream: str, timestamp: float, event_type: str, fields: Dict[str, Any]):
+        self.seq = seq
+        self.stream = stream
+        self.timestamp = timestamp
+        self.type = event_type
+        self.fields = fields
+        self._line: Optional[bytes] = None
+
+    @property
+    def line(self) -> bytes:
+        if self._line is None:
+            event = {
+                "seq": self.seq,
+                "stream": self.stream,
+                "ts": datetime.fromtimestamp(self.timestamp, timezone.utc).isoformat(timespec="milliseconds"),
+                "type": self.type,
+            }
+            event.update((key, value) for key, value in self.fields.items() if value is not None)
+            # Serializing twice from two threads yields the same bytes, so no lock is needed
+            self._line = _encoder.encode(event).encode() + b"\n"
+        return self._line
+
+
+class AuditLog:
+    """Ring buffer of recent audit events, flushed in batches to NDJSON segments under ``root``."""
+
+    def __init__(self, root: Optional[str], buffer_size: int, flush_interval: float,
+                 flush_batch: int, segment_bytes: int):
+        self.root = root
+        # Stream directory claimed at start
+        self.directory: Optional[str] = None
+        self._stream = "memory"
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.segment_bytes = segment_bytes
+        self.dropped = 0
+        self._seq = 0
+        self._buffer: Deque[AuditEvent] = deque(maxlen=buffer_size)
+        # Events emitted since the last flush; bounded like the buffer so a stalled disk can't grow it forever
+        self._pending: Deque[AuditEvent] = deque()
+        self._max_pending = buffer_size
+        self._new_events: Optional[asyncio.Event] = None
+        self._flush_now: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._segment: Optional[BinaryIO] = None
+        self._stream_lock: Optional[int] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def stream(self) -> str:
+        """Name of this worker's stream: its directory under the root, or "memory" when not written to disk."""
+        return self._stream
+
+    def emit(self, event_type: str, **fields: Any) -> int:
+        """Record an event and return its sequence number. Fields whose value is None are left out."""
+        self._seq += 1
+        event = AuditEvent(self._seq, self.stream, time.time(), event_type, fields)
+        self._buffer.append(event)
+
+        if self._task is not None:
+            if len(self._pending) >= self._max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(event)
+            if len(self._pending) >= self.flush_batch:
+                self._flush_now.set()
+        if self._new_events is not None:
+            self._new_events.set()
+            self._new_events = None
+        return self._seq
+
+    async def start(self) -> None:
+        """Resume numbering from the newest segment and start the background flush."""
+        if not self.root:
+            return
+        self.directory = await asyncio.to_thread(self._claim_stream)
+        self._stream = os.path.basename(self.directory)
+        self._seq = max(self._seq, await asyncio.to_thread(self._last_stored_seq, self.directory))
+        self._flush_now = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Audit events are written to {self.directory}, continuing after seq {self._seq}")
+
+    async def stop(self) -> None:
+        """Flush the remaining events and stop the background flush."""
+        if self._task is None:
+            return
+        # Let the loop finish its current write and flush once more, rather than cancelling it mid-write
+        self._closing = True
+        self._flush_now.set()
+        await self._task
+        self._task = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        if self._stream_lock is not None:
+            os.close(self._stream_lock)
+            self._stream_lock = None
+
+    async def wait_for_events(self, cursor: AuditCursor, timeout: float) -> None:
+        """Return once any stream has an event after ``cursor``, or after ``timeout`` seconds.
+
+        Events of this worker end the wait at once; the other workers' streams
+        are checked every flush interval, which is how often they reach disk.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if self._seq > cursor.get(self.stream) or remaining <= 0:
+                return
+            if self._shares_root and await asyncio.to_thread(self._others_ahead_of, cursor):
+                return
+            if self._new_events is None:
+                self._new_events = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._new_events.wait(), min(remaining, self.flush_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    def read(self, cursor: AuditCursor, limit: int) -> Iterator[bytes]:
+        """Return chunks of NDJSON lines for up to ``limit`` events after ``cursor``, oldest first.
+
+        Every line names its ``stream``. Call on the event loop; the returned
+        iterator may be consumed from a thread. When the cursor predates this
+        worker's ring buffer its events are read from the segments first;
+        other workers' events are read from their segments.
+        """
+        # None when the reader has seen everything this worker recorded
+        buffered = list(self._buffer) if cursor.get(self.stream) < self._seq else None
+        return self._chunks(itertools.islice(self._merged_lines(cursor, buffered), limit))
+
+    def stats(self) -> dict:
+        return {"last_seq": self._seq, "buffered": len(self._buffer), "pending": len(self._pending),
+                "dropped": self.dropped}
+
+    @property
+    def _shares_root(self) -> bool:
+        # Streams of other workers live next to this one unless the root itself is the stream
+        return self.directory is not None and self.directory != self.root
+
+    def _merged_lines(self, cursor: AuditCursor, buffered: Optional[List[AuditEvent]]) -> Iterator[bytes]:
+        streams = []
+        if buffered is not None:
+            streams.append(self._own_lines(cursor.get(self.stream), buffered))
+        if self._shares_root:
+            streams += [
+                self._tagged(stream, self._read_segments(directory, cursor.get(stream)))
+                for stream, directory in self._other_streams()
+            ]
+        yield from streams[0] if len(streams) == 1 else heapq.merge(*streams, key=_line_ts)
+
+    def _own_lines(self, cursor: int, buffered: List[AuditEvent]) -> Iterator[bytes]:
+        if self.directory and not (buffered and cursor + 1 >= buffered[0].seq):
+            for line in self._tagged(self.stream, self._read_segments(self.directory, cursor)):
+                cursor = _line_seq(line)
+                yield line
+        # Events not flushed yet when the segments were read; the buffer holds consecutive seqs
+        if buffered:
+            for event in buffered[max(cursor + 1 - buffered[0].seq, 0):]:
+                yield event.line
+
+    @staticmethod
+    def _tagged(stream: str, lines: Iterable[bytes]) -> Iterator[bytes]:
+        # Segments written before events named their stream lack the field
+        tag = b',"stream":' + _encoder.encode(stream).encode()
+        for line in lines:
+            end_of_seq = line.index(b",", 7)
+            if line.startswith(b',"stream":', end_of_seq):
+                yield line
+            else:
+                yield line[:end_of_seq] + tag + line[end_of_seq:]
+
+    @staticmethod
+    def _chunks(lines: Iterable[bytes]) -> Iterator[bytes]:
+        chunk: List[bytes] = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= READ_CHUNK_LINES:
+                yield b"".join(chunk)
+                chunk = []
+        if chunk:
+            yield b"".join(chunk)
+
+    def _other_streams(self) -> List[Tuple[str, str]]:
+        """Return ``(stream, directory)`` of every other worker's stream under the root."""
+        streams = []
+        for name in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, name)
+            if name.startswith(STREAM_PREFIX) and directory != self.directory and os.path.isdir(directory):
+                streams.append((name, directory))
+        return streams
+
+    def _others_ahead_of(self, cursor: AuditCursor) -> bool:
+        return any(
+            self._last_stored_seq(directory) > cursor.get(stream) for stream, directory in self._other_streams()
+        )
+
+    def _claim_stream(self) -> str:
+        """Return the first stream directory no other live worker holds, keeping it locked."""
+        if fcntl is None:
+            os.makedirs(self.root, exist_ok=True)
+            return self.root
+        for slot in itertools.count():
+            directory = os.path.join(self.root, f"{STREAM_PREFIX}{slot}")
+            os.makedirs(directory, exist_ok=True)
+            fd = os.open(os.path.join(directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            self._stream_lock = fd
+            return directory
+
+    @staticmethod
+    def _segments(directory: str) -> List[tuple]:
+        """Return ``(first seq, path)`` of every segment of a stream, oldest first."""
+        names = os.listdir(directory) if os.path.isdir(directory) else []
+        segments = []
+        for name in names:
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                first_seq = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+                if first_seq.isdigit():
+                    segments.append((int(first_seq), os.path.join(directory, name)))
+        return sorted(segments)
+
+    def _read_segments(self, directory: str, cursor: int) -> Iterator[bytes]:
+        segments = self._segments(directory)
+        # Skip segments that end before the cursor: the next one starts at or before cursor + 1
+        start = 0
+        for i, (first_seq, _) in enumerate(segments):
+            if first_seq <= cursor + 1:
+                start = i
+        for _, path in segments[start:]:
+            with open(path, "rb") as f:
+                for line in f:
+                    # A line still being written has no newline yet
+                    if line.endswith(b"\n") and _line_seq(line) > cursor:
+                        yield line
+
+    def _last_stored_seq(self, directory: str) -> int:
+        segments = self._segments(directory)
+        if not segments:
+            return 0
+        with open(segments[-1][1], "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 65536, 0))
+            lines = [line for line in f.read().split(b"\n") if line.startswith(b'{"seq":')]
+        for line in reversed(lines):
+            try:
+                return _line_seq(line)
+            except ValueError:
+                continue
+        return segments[-1][0] - 1
+
+    async def _flush_loop(self) -> None:
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_now.clear()
+            if self._pending:
+                events = list(self._pending)
+                self._pending.clear()
+                try:
+                    await asyncio.to_thread(self._write, events)
+                except OSError as e:
+                    logger.error(f"Failed to write {len(events)} audit events: {e}")
+            if self._closing and not self._pending:
+                return
+
+    def _write(self, events: List[AuditEvent]) -> None:
+        if self._segment is None or self._segment.tell() >= self.segment_bytes:
+            if self._segment is not None:
+                self._segment.close()
+            path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{events[0].seq:012d}{SEGMENT_SUFFIX}")
+            self._segment = open(path, "ab")
+        self._segment.write(b"".join(event.line for event in events))
+        self._segment.flush()
+
+
+audit_log = AuditLog(
+    root=settings.AUDIT_LOG_DIR,
+    buffer_size=settings.AUDIT_BUFFER_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    flush_batch=settings.AUDIT_FLUSH_BATCH,
+    segment_bytes=settings.AUDIT_SEGMENT_BYTES
+)
@@ -0,0 +1,138 @@
+"""
+Small in-process caches shared by the services.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or ``default`` if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache a value, evicting the least recently used entry when full."""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a cached value if present."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every cached value."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache hit/miss counters and the current size."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RequestCoalescer:
+    """Share one in-flight call per key between concurrent callers.
+
+    Successful results are kept for ``ttl`` seconds so that retries arriving
+    just after the call completed get the same result without a new call.
+    Errors for which ``cache_error`` returns True, i.e. the upstream rejected
+    the key for good, are re-raised to callers of the same key for
+    ``error_ttl`` seconds instead of being retried.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, error_ttl: float = 0.0,
+                 cache_error: Optional[Callable[[BaseException], bool]] = None):
+        self.results = TTLCache(ttl, max_entries)
+        self.errors = TTLCache(error_ttl, max_entries)
+        self.error_ttl = error_ttl
+        self.cache_error = cache_error
+        self.calls = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``fn`` for ``key``, calling it at most once at a time."""
+        cached = self.results.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        if self.cache_error is not None:
+            error = self.errors.get(key)
+            if error is not None:
+                # Drop the previous raise's traceback so it doesn't grow with every replay
+                raise error.with_traceback(None)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(self._call(key, fn))
+            future.add_done_callback(_consume_exception)
+            self._inflight[key] = future
+        # Shield the shared call so one cancelled caller doesn't cancel it for everyone
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        """Return call counters and result cache statistics."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "result_hits": self.results.hits,
+            "error_hits": self.errors.hits,
+        }
+
+    async def _call(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        try:
+            result = await fn()
+            self.results.set(key, result)
+            return result
+        except Exception as e:
+            if self.cache_error is not None and self.error_ttl > 0 and self.cache_error(e):
+                self.errors.set(key, e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Avoid "exception was never retrieved" warnings when every waiter was cancelled
+    if not future.cancelled():
+        future.exception()
+
+
+# Rendered GET /api/user/{user_id} bodies as (etag, body), invalidated on every write to the user. Only
+# used with storage private to this worker, since writes by other workers would not invalidate it
+user_response_cache = TTLCache(ttl=settings.USER_CACHE_TTL, max_entries=settings.USER_CACHE_MAX_ENTRIES)
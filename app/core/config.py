@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -11,9 +11,119 @@ class Settings(BaseSettings):
     LARK_API_BASE_URL: str = "https://open.larksuite.com/open-apis"
     LARK_AUTH_BASE_URL: str = "https://accounts.larksuite.com/open-apis"
     REDIRECT_URI: str
+
+    # Renew the cached app access token this many seconds before it expires
+    APP_TOKEN_REFRESH_MARGIN: int = 300
+
+    # Replay a completed token refresh to retries of the same refresh token for this many seconds
+    REFRESH_RESULT_TTL: float = 10.0
+    REFRESH_RESULT_CACHE_SIZE: int = 10000
+    # Repeated login callbacks with the same code replay the first result for this many seconds;
+    # codes Lark rejected are answered with the same 401 for LOGIN_REJECTED_TTL (codes live 5 minutes)
+    LOGIN_RESULT_TTL: float = 60.0
+    LOGIN_REJECTED_TTL: float = 300.0
+    LOGIN_RESULT_CACHE_SIZE: int = 10000
+
+    # Directory through which the workers of one host share the app token and refresh leases;
+    # unset keeps both per worker. Lock waits outlast an app token fetch plus a refresh
+    SHARED_STATE_DIR: Optional[str] = None
+    SHARED_STATE_LOCK_TIMEOUT: float = 35.0
+
+    # Background refresh of stored sessions before their access tokens expire
+    TOKEN_REFRESH_SCHEDULER_ENABLED: bool = False
+    TOKEN_REFRESH_MARGIN: int = 600
+    TOKEN_REFRESH_JITTER: int = 120
+    TOKEN_REFRESH_CONCURRENCY: int = 8
+
+    # Import the organization directory from the Lark contact API into the user store
+    DIRECTORY_SYNC_ENABLED: bool = False
+    DIRECTORY_SYNC_INTERVAL: float = 3600.0
+    DIRECTORY_SYNC_CONCURRENCY: int = 8
+    DIRECTORY_SYNC_PAGE_SIZE: int = 50
+
+    # Batch user lookup; larger requests are streamed
+    USER_BATCH_MAX_IDS: int = 10000
+    USER_BATCH_STREAM_THRESHOLD: int = 500
+
+    # Maximum tokens per POST /api/auth/introspect/batch request
+    INTROSPECT_MAX_TOKENS: int = 1000
+
+    # Rendered GET /api/user/{user_id} responses cached per worker
+    USER_CACHE_TTL: float = 30.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # Signed session tokens issued at login. The first key signs, every key verifies:
+    # rotate by prepending a new key and drop the old one after SESSION_TOKEN_TTL
+    SESSION_SECRET_KEYS: List[str] = []
+    SESSION_TOKEN_TTL: int = 86400
+    SESSION_COOKIE_NAME: str = "lark_session"
+    SESSION_COOKIE_SECURE: bool = False
+
+    # Shared HTTP client for Lark API calls
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_HTTP2: bool = False
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 10.0
+    HTTP_WRITE_TIMEOUT: float = 10.0
+    HTTP_POOL_TIMEOUT: float = 5.0
+
+    # Lark API call budget: total deadline per call including retries, and backoff between attempts
+    LARK_CALL_DEADLINE: float = 15.0
+    LARK_RETRY_ATTEMPTS: int = 3
+    LARK_RETRY_BASE_DELAY: float = 0.2
+    LARK_RETRY_MAX_DELAY: float = 2.0
+    # Fail Lark API calls fast once this share of calls in the window failed
+    LARK_BREAKER_FAILURE_RATE: float = 0.5
+    LARK_BREAKER_MIN_CALLS: int = 20
+    LARK_BREAKER_WINDOW: float = 30.0
+    LARK_BREAKER_RESET_TIMEOUT: float = 15.0
+    # Outbound scheduler per worker: requests per second (0 is unlimited) with a burst allowance, and the
+    # range of the concurrency limit, which halves on 429 responses and grows back while calls succeed
+    LARK_RATE_LIMIT: float = 50.0
+    LARK_RATE_BURST: int = 20
+    LARK_MAX_CONCURRENCY: int = 32
+    LARK_MIN_CONCURRENCY: int = 2
+    # Renew the app token and open a connection to Lark when the login redirect is served, so the
+    # callback doesn't wait for either; each host is warmed at most once per interval (keep it under
+    # HTTP_KEEPALIVE_EXPIRY)
+    LOGIN_WARMUP_ENABLED: bool = False
+    LOGIN_WARMUP_INTERVAL: float = 15.0
     
+    # Logging; LOG_FILE="" disables the file sink
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: Optional[str] = "logs/lark_oauth.log"
+    LOG_FILE_LEVEL: str = "DEBUG"
+    # Write from a background thread so slow sinks never block the event loop
+    LOG_ENQUEUE: bool = True
+    LOG_JSON: bool = False
+    # Share of records kept per sample key, e.g. {"auth_redirect": 0.01}
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+
+    # Audit events: kept in a ring buffer per worker and flushed in batches to NDJSON segments.
+    # AUDIT_LOG_DIR="" keeps them in memory only; GET /api/audit/events needs AUDIT_API_TOKEN
+    AUDIT_LOG_DIR: Optional[str] = "logs/audit"
+    AUDIT_BUFFER_SIZE: int = 10000
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    AUDIT_FLUSH_BATCH: int = 500
+    AUDIT_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    AUDIT_API_TOKEN: Optional[str] = None
+
     # Database settings (if needed)
+    # Unset keeps users in memory; sqlite:///path/to/lark.db shares them between workers
     DATABASE_URL: Optional[str] = None
+    DATABASE_POOL_SIZE: int = 4
+    DATABASE_BATCH_SIZE: int = 100
+    # Seconds between purges of sessions whose refresh token has expired; 0 disables the purge
+    SESSION_PURGE_INTERVAL: float = 300.0
+    # Users kept by the in-memory store before the least recently active are evicted; 0 is unlimited
+    MEMORY_STORE_MAX_USERS: int = 0
+    # Directory for the in-memory store's snapshots and write-ahead log, restored on startup; unset keeps nothing
+    MEMORY_STORE_DIR: Optional[str] = None
+    # Seconds between snapshots of the in-memory store, and between write-ahead log flushes
+    MEMORY_STORE_SNAPSHOT_INTERVAL: float = 300.0
+    MEMORY_STORE_WAL_FLUSH_INTERVAL: float = 1.0
     
     class Config:
         env_file = ".env"
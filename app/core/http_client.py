@@ -0,0 +1,65 @@
+"""
+Shared pooled HTTP client for Lark API calls.
+The client is opened and closed by the application lifespan; route handlers
+receive it through the get_http_client dependency.
+"""
+
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import logger
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Create an AsyncClient configured from the HTTP_* settings."""
+    http2 = settings.HTTP_HTTP2
+    if http2 and transport is None:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            read=settings.HTTP_READ_TIMEOUT,
+            write=settings.HTTP_WRITE_TIMEOUT,
+            pool=settings.HTTP_POOL_TIMEOUT,
+        ),
+        http2=http2,
+        transport=transport,
+    )
+
+
+async def init_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Open the shared client, replacing any client that is already open."""
+    global _client
+    await close_http_client()
+    _client = create_http_client(transport)
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use outside the app lifespan."""
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
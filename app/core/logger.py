@@ -1,36 +1,220 @@
 """
 Centralized logging configuration using loguru.
 All modules should import logger from this file.
+
+Log with loguru's lazy formatting (``logger.info("... {}", value)``) on hot
+paths: loguru drops messages below every sink's level before formatting them.
+High-volume messages can be sampled by binding a sample key, e.g.
+``logger.bind(sample="auth_redirect").info(...)``, and setting its rate in
+``LOG_SAMPLE_RATES``.
+
+The LOG_* options are read from the environment here, so scripts can log
+before a .env file exists; create_application applies the values from
+settings, which include the .env file.
 """
 
-import sys
+import asyncio
+import glob
+import json as jsonlib
 import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Mapping, Optional, TextIO, Union
+
 from loguru import logger
 
-# Remove default handler
-logger.remove()
+CONSOLE_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan> - <level>{message}</level>"
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+
+# Same rotation policy as the synchronous file sink: 10 MB files kept for 7 days
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_RETENTION = 7 * 24 * 3600
+
+
+class RotatingFile:
+    """Append-only UTF-8 log file rotated by size, keeping rotated files for ``retention`` seconds."""
+
+    def __init__(self, path: str, max_bytes: int = LOG_FILE_MAX_BYTES, retention: float = LOG_FILE_RETENTION):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.retention = retention
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    def write(self, text: str) -> None:
+        # Encode here so the size is counted in bytes, as loguru's rotation counts it
+        data = text.encode("utf-8")
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        os.rename(self.path, f"{self.path}.{time.strftime('%Y-%m-%d_%H-%M-%S')}_{time.time_ns() % 10**6:06d}")
+        cutoff = time.time() - self.retention
+        for rotated in glob.glob(f"{glob.escape(self.path)}.*"):
+            if os.path.getmtime(rotated) < cutoff:
+                os.remove(rotated)
+        self._file = open(self.path, "ab")
+        self._size = 0
+
+
+class BatchingSink:
+    """Loguru sink handing formatted messages to a writer thread.
+
+    ``write`` only appends to a deque, so logging never blocks the event loop
+    on I/O or file rotation. The thread writes everything queued since its
+    last pass in one call and flushes once per batch.
+    """
 
-# Console logging with colors (no HTML-like tags, use loguru's native coloring)
-logger.add(
-    sys.stdout,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan> - <level>{message}</level>",
-    level="INFO",
-    colorize=True
-)
+    def __init__(self, stream: Any, close_stream: bool = False):
+        self._stream = stream
+        self._close_stream = close_stream
+        # Formatted messages, plus events set once everything queued before them is written
+        self._pending: Deque[Union[str, threading.Event]] = deque()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
 
-# File logging for debugging (only if logs directory exists or can be created)
-try:
-    os.makedirs("logs", exist_ok=True)
+    def write(self, message: str) -> None:
+        self._pending.append(message)
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        """Write the remaining messages and stop the thread; called by ``logger.remove()``."""
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        if self._close_stream:
+            self._stream.close()
+
+    async def complete(self) -> None:
+        """Wait until queued messages are written; awaited by ``logger.complete()``."""
+        written = threading.Event()
+        self._pending.append(written)
+        self._wakeup.set()
+        await asyncio.get_running_loop().run_in_executor(None, written.wait)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            batch = []
+            markers = []
+            while self._pending:
+                item = self._pending.popleft()
+                (markers if isinstance(item, threading.Event) else batch).append(item)
+            if batch:
+                try:
+                    self._stream.write("".join(batch))
+                    self._stream.flush()
+                except Exception as e:
+                    sys.stderr.write(f"Failed to write {len(batch)} log messages: {e!r}\n")
+            for marker in markers:
+                marker.set()
+            if self._stopping and not self._pending:
+                return
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_sample_rates() -> Dict[str, float]:
+    try:
+        return jsonlib.loads(os.environ.get("LOG_SAMPLE_RATES") or "{}")
+    except ValueError:
+        sys.stderr.write("Ignoring LOG_SAMPLE_RATES: not a JSON object\n")
+        return {}
+
+
+def sampling_filter(sample_rates: Mapping[str, float]):
+    """Build a sink filter keeping ``rate`` of the records bound with each sample key."""
+    def keep(record: Dict[str, Any]) -> bool:
+        key = record["extra"].get("sample")
+        if key is None:
+            return True
+        rate = sample_rates.get(key, 1.0)
+        return rate >= 1.0 or random.random() < rate
+    return keep
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    file: Optional[str] = None,
+    file_level: Optional[str] = None,
+    enqueue: Optional[bool] = None,
+    json: Optional[bool] = None,
+    sample_rates: Optional[Mapping[str, float]] = None,
+    console: TextIO = sys.stdout
+) -> None:
+    """(Re)configure the console and file sinks.
+
+    Options left as None are read from the LOG_* environment variables, with
+    the same defaults as settings; pass ``file=""`` to disable the file sink.
+    With ``enqueue`` both sinks write through a BatchingSink. Call
+    ``await logger.complete()`` before exit to flush queued messages.
+    """
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    file = os.environ.get("LOG_FILE", "logs/lark_oauth.log") if file is None else file
+    file_level = file_level or os.environ.get("LOG_FILE_LEVEL", "DEBUG")
+    enqueue = _env_flag("LOG_ENQUEUE", True) if enqueue is None else enqueue
+    json = _env_flag("LOG_JSON", False) if json is None else json
+    sample_rates = _env_sample_rates() if sample_rates is None else sample_rates
+    logger.remove()
+    keep = sampling_filter(sample_rates) if sample_rates else None
+
+    # Console logging with colors (no HTML-like tags, use loguru's native coloring)
     logger.add(
-        "logs/lark_oauth.log",
-        rotation="10 MB",
-        retention="7 days",
-        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}",
-        level="DEBUG"
+        BatchingSink(console) if enqueue else console,
+        format=CONSOLE_FORMAT,
+        level=level,
+        colorize=not json,
+        serialize=json,
+        filter=keep
     )
-except (OSError, PermissionError):
-    # If we can't create logs directory, just skip file logging
-    pass
+
+    if not file:
+        return
+    # File logging for debugging (only if logs directory exists or can be created)
+    try:
+        os.makedirs(os.path.dirname(file) or ".", exist_ok=True)
+        if enqueue:
+            logger.add(
+                BatchingSink(RotatingFile(file), close_stream=True),
+                format=FILE_FORMAT,
+                level=file_level,
+                serialize=json,
+                filter=keep
+            )
+        else:
+            logger.add(
+                file,
+                rotation="10 MB",
+                retention="7 days",
+                format=FILE_FORMAT,
+                level=file_level,
+                serialize=json,
+                filter=keep
+            )
+    except (OSError, PermissionError):
+        # If we can't create logs directory, just skip file logging
+        pass
+
+
+configure_logging()
 
 # Export the configured logger
-__all__ = ["logger"] 
\ No newline at end of file
+__all__ = ["logger", "configure_logging"]
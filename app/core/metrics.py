@@ -0,0 +1,221 @@
+"""
+Lightweight in-process metrics rendered in the Prometheus text format.
+Metrics are plain dicts keyed by label values, so recording on the hot path
+costs a dict lookup and an addition.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Base class holding one value per combination of label values."""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value: float, *labels: str) -> None:
+        """Mirror a counter that is maintained elsewhere (e.g. cache statistics)."""
+        self._values[labels] = value
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+    type = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [count per bucket (+Inf last), sum]
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together at /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+lark_upstream_duration = registry.histogram(
+    "lark_upstream_request_duration_seconds", "Latency of Lark API calls by endpoint", ("endpoint",)
+)
+lark_upstream_errors = registry.counter(
+    "lark_upstream_errors_total", "Failed Lark API calls by endpoint and kind (http, api, circuit_open)",
+    ("endpoint", "kind")
+)
+lark_upstream_retries = registry.counter(
+    "lark_upstream_retries_total", "Retried Lark API call attempts by endpoint", ("endpoint",)
+)
+lark_circuit_open = registry.gauge("lark_circuit_open", "1 while the Lark API circuit breaker rejects calls")
+lark_login_stage_duration = registry.histogram(
+    "lark_login_stage_duration_seconds",
+    "Latency of the login callback by stage (app_token, code_exchange, user_info, store, total)", ("stage",)
+)
+lark_login_warmups = registry.counter(
+    "lark_login_warmups_total", "Work done by login warm-ups by kind (app_token, connection)", ("kind",)
+)
+lark_outbound_wait = registry.histogram(
+    "lark_outbound_wait_seconds", "Time Lark API calls waited for an outbound slot by priority", ("priority",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+lark_outbound_queue_depth = registry.gauge(
+    "lark_outbound_queue_depth", "Lark API calls waiting for an outbound slot by priority", ("priority",)
+)
+lark_outbound_concurrency = registry.gauge(
+    "lark_outbound_concurrency_limit", "Current adaptive concurrency limit of Lark API calls"
+)
+lark_outbound_rate_limited = registry.counter(
+    "lark_outbound_rate_limited_total", "Lark API calls answered with 429"
+)
+users_gauge = registry.gauge("lark_users", "Stored users")
+sessions_gauge = registry.gauge("lark_sessions", "Stored sessions")
+store_evictions = registry.counter(
+    "lark_store_evictions_total", "Entries removed from the store by reason (expired, lru)", ("reason",)
+)
+store_snapshots = registry.counter("lark_store_snapshots_total", "Snapshots of the in-memory store written")
+store_snapshot_duration = registry.gauge(
+    "lark_store_snapshot_duration_seconds", "Time taken by the latest snapshot of the in-memory store"
+)
+store_journal_pending = registry.gauge(
+    "lark_store_journal_pending", "In-memory store writes waiting to be appended to the write-ahead log"
+)
+audit_dropped = registry.counter(
+    "lark_audit_events_dropped_total", "Audit events dropped because the segment writes fell behind"
+)
+cache_hits = registry.counter("lark_cache_hits_total", "Cache hits by cache", ("cache",))
+cache_misses = registry.counter("lark_cache_misses_total", "Cache misses by cache", ("cache",))
+cache_hit_ratio = registry.gauge("lark_cache_hit_ratio", "Cache hit ratio since start by cache", ("cache",))
+
+
+def record_cache_stats(cache: str, hits: int, misses: int) -> None:
+    """Publish the hit/miss counters of a cache."""
+    cache_hits.set(hits, cache)
+    cache_misses.set(misses, cache)
+    cache_hit_ratio.set(hits / (hits + misses) if hits + misses else 0, cache)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; use its template to keep cardinality low
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "other"),
+                status_code
+            )
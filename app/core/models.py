@@ -1,5 +1,6 @@
+import sys
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 import uuid
 
@@ -12,6 +13,8 @@ class UserAuth(BaseModel):
     refresh_token: str
     expires_at: datetime
     refresh_expires_at: datetime
+    # Incremented by storage on every save
+    version: int = 0
     
     class Config:
         populate_by_name = True
@@ -30,8 +33,168 @@ class User(BaseModel):
     
     class Config:
         populate_by_name = True
+ 
+
+class AuthResponse(BaseModel):
+    """Token information returned to clients."""
+    access_token: str
+    token_type: str = "Bearer"
+    refresh_token: str
+    expires_at: datetime
+    refresh_expires_at: datetime
+
+    @classmethod
+    def from_auth(cls, auth: UserAuth) -> "AuthResponse":
+        """Build the response from a stored (already validated) auth record."""
+        return cls.model_construct(
+            access_token=auth.access_token,
+            token_type=auth.token_type,
+            refresh_token=auth.refresh_token,
+            expires_at=auth.expires_at,
+            refresh_expires_at=auth.refresh_expires_at
+        )
+
+
+class UserResponse(BaseModel):
+    """A user together with their token information."""
+    user: User
+    auth: Optional[AuthResponse] = None
+
+    @classmethod
+    def from_records(cls, user: User, auth: Optional[UserAuth]) -> "UserResponse":
+        """Build the response from stored (already validated) records."""
+        return cls.model_construct(user=user, auth=AuthResponse.from_auth(auth) if auth else None)
+
+
+class TokenIntrospection(BaseModel):
+    """Whether an access token belongs to an unexpired stored session, and whose it is."""
+    active: bool
+    user_id: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+
+class TokenIntrospectionBatch(BaseModel):
+    """Introspection results in the order the tokens were given."""
+    results: List[TokenIntrospection]
+
+
+class SessionClaims(BaseModel):
+    """Identity carried by a signed session token."""
+    user_id: str
+    name: str
+    email: Optional[str] = None
+    avatar_url: Optional[str] = None
+    expires_at: datetime
+
+
+def _to_epoch(value: datetime) -> float:
+    # A float keeps the microseconds, so the API returns the same datetimes that were stored
+    return value.timestamp()
+
+
+class SessionRecord:
+    """Compact in-memory form of UserAuth.
+
+    Uses __slots__ and epoch-second floats instead of a pydantic model with
+    two datetimes; converted to UserAuth only at the API boundary.
+    """
+    __slots__ = (
+        "user_id", "access_token", "token_type", "refresh_token", "expires_at", "refresh_expires_at", "version"
+    )
+
+    def __init__(
+        self,
+        user_id: str,
+        access_token: str,
+        token_type: str,
+        refresh_token: str,
+        expires_at: float,
+        refresh_expires_at: float,
+        version: int = 0
+    ):
+        self.user_id = user_id
+        self.access_token = access_token
+        # Nearly every session shares the same token type, so keep one string for all of them
+        self.token_type = sys.intern(token_type)
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.refresh_expires_at = refresh_expires_at
+        self.version = version
+
+    @classmethod
+    def from_model(cls, auth: UserAuth) -> "SessionRecord":
+        return cls(
+            auth.user_id,
+            auth.access_token,
+            auth.token_type,
+            auth.refresh_token,
+            _to_epoch(auth.expires_at),
+            _to_epoch(auth.refresh_expires_at),
+            auth.version
+        )
+
+    def to_model(self) -> UserAuth:
+        return UserAuth.model_construct(
+            user_id=self.user_id,
+            access_token=self.access_token,
+            token_type=self.token_type,
+            refresh_token=self.refresh_token,
+            expires_at=datetime.fromtimestamp(self.expires_at),
+            refresh_expires_at=datetime.fromtimestamp(self.refresh_expires_at),
+            version=self.version
+        )
+
+
+class UserRecord:
+    """Compact in-memory form of User, converted to User only at the API boundary."""
+    __slots__ = ("id", "name", "email", "open_id", "union_id", "avatar_url", "created_at", "updated_at")
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        email: Optional[str],
+        open_id: str,
+        union_id: str,
+        avatar_url: Optional[str],
+        created_at: float,
+        updated_at: float
+    ):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.open_id = open_id
+        self.union_id = union_id
+        self.avatar_url = avatar_url
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserRecord":
+        return cls(
+            user.id,
+            user.name,
+            user.email,
+            user.open_id,
+            user.union_id,
+            user.avatar_url,
+            _to_epoch(user.created_at),
+            _to_epoch(user.updated_at)
+        )
+
+    def to_model(self) -> User:
+        return User.model_construct(
+            id=self.id,
+            name=self.name,
+            email=self.email,
+            open_id=self.open_id,
+            union_id=self.union_id,
+            avatar_url=self.avatar_url,
+            created_at=datetime.fromtimestamp(self.created_at),
+            updated_at=datetime.fromtimestamp(self.updated_at)
+        )
 
 
 # In-memory storage for development/testing
-users_db: dict[str, User] = {}
-auth_db: dict[str, UserAuth] = {} 
\ No newline at end of file
+users_db: dict[str, UserRecord] = {}
+auth_db: dict[str, SessionRecord] = {}
\ No newline at end of file
@@ -0,0 +1,75 @@
+from typing import Dict, Iterator, Optional
+
+from app.core.models import UserRecord, users_db
+
+
+class UserRepository:
+    """User store with O(1) secondary indexes on open_id and union_id.
+
+    Wraps the ``users`` dict and keeps both indexes consistent on every insert,
+    update and delete. All writes must go through the repository.
+    """
+
+    def __init__(self, users: Dict[str, UserRecord]):
+        self._users = users
+        self._by_open_id: Dict[str, str] = {}
+        self._by_union_id: Dict[str, str] = {}
+        self.reindex()
+
+    def reindex(self) -> None:
+        """Rebuild both indexes from the underlying dict."""
+        self._by_open_id = {user.open_id: user_id for user_id, user in self._users.items()}
+        self._by_union_id = {user.union_id: user_id for user_id, user in self._users.items()}
+
+    def get(self, user_id: str) -> Optional[UserRecord]:
+        """Get a user by ID."""
+        return self._users.get(user_id)
+
+    def get_by_open_id(self, open_id: str) -> Optional[UserRecord]:
+        """Get a user by Lark open_id."""
+        user_id = self._by_open_id.get(open_id)
+        return self._users.get(user_id) if user_id is not None else None
+
+    def get_by_union_id(self, union_id: str) -> Optional[UserRecord]:
+        """Get a user by Lark union_id."""
+        user_id = self._by_union_id.get(union_id)
+        return self._users.get(user_id) if user_id is not None else None
+
+    def upsert(self, user: UserRecord) -> None:
+        """Insert or replace a user, updating the indexes."""
+        previous = self._users.get(user.id)
+        if previous is not None:
+            self._unindex(previous)
+        self._users[user.id] = user
+        self._by_open_id[user.open_id] = user.id
+        self._by_union_id[user.union_id] = user.id
+
+    def update(self, users: Dict[str, UserRecord]) -> None:
+        """Insert or replace many users at once, rebuilding the indexes."""
+        self._users.update(users)
+        self.reindex()
+
+    def delete(self, user_id: str) -> Optional[UserRecord]:
+        """Remove a user and its index entries, returning the removed user."""
+        user = self._users.pop(user_id, None)
+        if user is not None:
+            self._unindex(user)
+        return user
+
+    def _unindex(self, user: UserRecord) -> None:
+        if self._by_open_id.get(user.open_id) == user.id:
+            del self._by_open_id[user.open_id]
+        if self._by_union_id.get(user.union_id) == user.id:
+            del self._by_union_id[user.union_id]
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __iter__(self) -> Iterator[UserRecord]:
+        return iter(self._users.values())
+
+
+user_repository = UserRepository(users_db)
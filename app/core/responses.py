@@ -0,0 +1,18 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class ModelJSONResponse(JSONResponse):
+    """JSON response that serializes pydantic models directly with pydantic-core.
+
+    Route handlers return ``ModelJSONResponse(model)`` to skip FastAPI's
+    jsonable_encoder pass. The output is byte-for-byte what JSONResponse would
+    produce for the equivalent dict.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return super().render(content)
@@ -0,0 +1,122 @@
+"""
+Signed session tokens issued at login.
+
+A session token is a compact HS256 JWT carrying the user ID, display claims
+and an expiry. Any worker can verify it with the shared keys, without looking
+the user up in storage. Tokens are signed with the first key of
+SESSION_SECRET_KEYS and accepted when signed with any of them, so keys can be
+rotated without logging anyone out.
+"""
+
+import hashlib
+import secrets
+import time
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+from fastapi import HTTPException, Request, status
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.models import SessionClaims, User
+
+ALGORITHM = "HS256"
+
+
+class InvalidSessionToken(Exception):
+    """Raised when a session token is malformed, forged, signed with an unknown key or expired."""
+
+
+def _key_id(secret: str) -> str:
+    # Identifies the key in the token header without revealing it
+    return hashlib.blake2b(secret.encode(), digest_size=6).hexdigest()
+
+
+class SessionTokenSigner:
+    """Issue and verify session tokens with a rotating set of HMAC keys.
+
+    Keys are parsed once; verification picks the key named by the token's
+    ``kid`` header instead of trying each one.
+    """
+
+    def __init__(self, secret_keys: Sequence[str], ttl: int):
+        if not secret_keys:
+            raise ValueError("At least one session secret key is required")
+        self.ttl = ttl
+        self._keys: Dict[str, Key] = {_key_id(secret): jwk.construct(secret, ALGORITHM) for secret in secret_keys}
+        self._signing_key_id = _key_id(secret_keys[0])
+
+    def issue(self, user: User, expires_at: Optional[datetime] = None) -> str:
+        """Sign a token for ``user`` valid for ``ttl`` seconds, or until ``expires_at`` if sooner."""
+        now = int(time.time())
+        expires = now + self.ttl
+        if expires_at is not None:
+            expires = min(expires, int(expires_at.timestamp()))
+        claims = {
+            "sub": user.id,
+            "name": user.name,
+            "email": user.email,
+            "avatar_url": user.avatar_url,
+            "iat": now,
+            "exp": expires,
+        }
+        return jwt.encode(
+            claims,
+            self._keys[self._signing_key_id],
+            algorithm=ALGORITHM,
+            headers={"kid": self._signing_key_id}
+        )
+
+    def verify(self, token: str) -> SessionClaims:
+        """Return the claims of a valid token or raise InvalidSessionToken."""
+        try:
+            key = self._keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise InvalidSessionToken("Session token signed with an unknown key")
+            claims = jwt.decode(token, key, algorithms=[ALGORITHM])
+        except JWTError as e:
+            raise InvalidSessionToken(str(e))
+        return SessionClaims.model_construct(
+            user_id=claims["sub"],
+            name=claims["name"],
+            email=claims.get("email"),
+            avatar_url=claims.get("avatar_url"),
+            expires_at=datetime.fromtimestamp(claims["exp"])
+        )
+
+
+def _create_signer() -> SessionTokenSigner:
+    secret_keys = settings.SESSION_SECRET_KEYS
+    if not secret_keys:
+        logger.warning("SESSION_SECRET_KEYS is not set: session tokens are signed with a random key "
+                       "and are rejected by other workers and after a restart")
+        secret_keys = [secrets.token_urlsafe(32)]
+    return SessionTokenSigner(secret_keys, settings.SESSION_TOKEN_TTL)
+
+
+session_signer = _create_signer()
+
+
+def get_session(request: Request) -> SessionClaims:
+    """Dependency returning the caller's verified session from the Bearer token or session cookie."""
+    token = request.cookies.get(settings.SESSION_COOKIE_NAME)
+    authorization = request.headers.get("authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing session token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    try:
+        return session_signer.verify(token)
+    except InvalidSessionToken as e:
+        logger.bind(sample="invalid_session").warning("Rejected session token: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired session token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
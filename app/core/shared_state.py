@@ -0,0 +1,157 @@
+"""
+State shared by the uvicorn workers of one host.
+
+Every worker keeps its own app token cache and refresh coalescer. With
+SHARED_STATE_DIR set they are backed by files in that directory:
+
+- ``app_token.json`` holds the current app access token and its wall-clock
+  expiry. A worker renewing it holds ``app_token.lock``, so one worker calls
+  Lark and the others pick up its token. ``tenant_token.*`` does the same
+  for the tenant access token.
+- ``refresh-XX.lock`` files lease refresh tokens, striped by token digest.
+  The worker holding the lease calls Lark and leaves the result in
+  ``refresh-XX.json`` for REFRESH_RESULT_TTL seconds, where workers waiting
+  on the same refresh token find it instead of sending the rotated-away
+  token to Lark again.
+
+Locks are flock()s, released by the kernel when their holder exits, so a
+crashed worker never wedges the others. They are polled without blocking
+to keep the event loop free while waiting.
+
+The JSON files hold access and refresh tokens in plain text: the directory
+is created 0700 and every file 0600, readable by the workers' user only.
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.storage.base import token_digest
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Unrelated refresh tokens sharing a stripe wait for each other; 256 stripes keep that rare
+REFRESH_LOCK_STRIPES = 256
+LOCK_POLL_MIN_DELAY = 0.002
+LOCK_POLL_MAX_DELAY = 0.05
+
+
+class SharedStateTimeout(Exception):
+    """Raised when a shared lock is still held by another worker after the lock timeout."""
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.warning(f"Ignoring corrupt shared state file {path}")
+        return None
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    # Readers never take the lock, so replace the file atomically instead of rewriting it
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+@asynccontextmanager
+async def file_lock(path: str, timeout: float) -> AsyncIterator[None]:
+    """Hold an exclusive flock() on ``path``, waiting up to ``timeout`` seconds for it."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        deadline = time.monotonic() + timeout
+        delay = LOCK_POLL_MIN_DELAY
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise SharedStateTimeout(f"Timed out waiting for {path}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LOCK_POLL_MAX_DELAY)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+class RefreshLease:
+    """Exclusive right to refresh one refresh token, with the result of an earlier holder if any."""
+
+    def __init__(self, results_path: str, key: str, result_ttl: float):
+        self._results_path = results_path
+        self._key = key
+        self._result_ttl = result_ttl
+        entry = (_read_json(results_path) or {}).get(key)
+        self.result: Optional[Dict[str, Any]] = entry[1] if entry and entry[0] > time.time() else None
+
+    def publish(self, result: Dict[str, Any]) -> None:
+        """Leave ``result`` for workers waiting on the same refresh token."""
+        now = time.time()
+        results = {
+            key: entry for key, entry in (_read_json(self._results_path) or {}).items()
+            if entry[0] > now
+        }
+        results[self._key] = [now + self._result_ttl, result]
+        _write_json(self._results_path, results)
+
+
+class SharedState:
+    """File-backed access tokens and refresh leases shared by the workers using ``directory``."""
+
+    def __init__(self, directory: str, lock_timeout: float, result_ttl: float):
+        if fcntl is None:
+            raise RuntimeError("SHARED_STATE_DIR needs flock(), which this platform does not provide")
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.directory = directory
+        self.lock_timeout = lock_timeout
+        self.result_ttl = result_ttl
+
+    def read_token(self, name: str) -> Optional[Tuple[str, float]]:
+        """Return the published token ``name`` and its expiry as a Unix timestamp, if any."""
+        data = _read_json(os.path.join(self.directory, f"{name}.json"))
+        if data is None:
+            return None
+        return data["token"], data["expires_at"]
+
+    def publish_token(self, name: str, token: str, expires_at: float) -> None:
+        """Publish token ``name`` expiring at the Unix timestamp ``expires_at``; call under ``token_lock``."""
+        _write_json(os.path.join(self.directory, f"{name}.json"), {"token": token, "expires_at": expires_at})
+
+    def token_lock(self, name: str):
+        """Lock held while renewing token ``name``."""
+        return file_lock(os.path.join(self.directory, f"{name}.lock"), self.lock_timeout)
+
+    @asynccontextmanager
+    async def refresh_lease(self, refresh_token: str) -> AsyncIterator[RefreshLease]:
+        """Hold the lease on ``refresh_token`` until the block exits."""
+        digest = token_digest(refresh_token)
+        stripe = os.path.join(self.directory, f"refresh-{digest[0] % REFRESH_LOCK_STRIPES:02x}")
+        async with file_lock(f"{stripe}.lock", self.lock_timeout):
+            yield RefreshLease(f"{stripe}.json", digest.hex(), self.result_ttl)
+
+
+def _create_shared_state() -> Optional[SharedState]:
+    if not settings.SHARED_STATE_DIR:
+        return None
+    logger.info(f"Sharing app token and refresh leases through {settings.SHARED_STATE_DIR}")
+    return SharedState(settings.SHARED_STATE_DIR, settings.SHARED_STATE_LOCK_TIMEOUT, settings.REFRESH_RESULT_TTL)
+
+
+# None when SHARED_STATE_DIR is unset and each worker coordinates only with itself
+shared_state = _create_shared_state()
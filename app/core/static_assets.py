@@ -0,0 +1,252 @@
+"""
+Static asset serving shared by the frontend server (scripts/run_frontend.py)
+and the backend's /static mount.
+
+Each file gets a strong ETag from its content. Small files are kept in memory
+together with gzip (and brotli, when installed) variants compressed once at
+load time. Larger files are served from disk with sendfile.
+
+Stylesheet and script references in the HTML pages are rewritten to
+``?v=<content hash>`` URLs, so those assets can be cached as immutable; a page
+is rebuilt as soon as an asset it references changes.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, unquote
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.core.logger import logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files up to this size are kept in memory, larger ones are sent from disk
+MAX_CACHED_FILE_SIZE = 256 * 1024
+# Compressing tiny files saves nothing once headers are counted
+MIN_COMPRESS_SIZE = 256
+COMPRESSIBLE_EXTENSIONS = frozenset({".html", ".css", ".js", ".json", ".svg", ".txt", ".map"})
+
+# Assets requested with a ?v=<version> query never change under that URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned assets may change at any time: cache but revalidate with the ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Relative stylesheet and script references of a page: <link href="..."> and <script src="...">
+ASSET_REFERENCE = re.compile(rb'(<(?:link|script)\b[^>]*?\b(?:href|src)=")([^"?#:/][^"?#:]*)(")', re.IGNORECASE)
+
+# Preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _compress(encoding: str, content: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=11)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+class StaticAsset:
+    """A static file with its validators and, when small enough, its encoded bodies."""
+    __slots__ = ("path", "size", "mtime_ns", "content_type", "etag", "bodies", "references")
+
+    def __init__(self, path: str, rewrite: Optional[Callable[[bytes], bytes]] = None):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        self.content_type = content_type
+        # Encoded bodies by content coding; empty when the file is served from disk
+        self.bodies: Dict[str, bytes] = {}
+        # Versions of the assets this page links to, by path relative to the index directory
+        self.references: Dict[str, str] = {}
+
+        digest = hashlib.blake2b(digest_size=12)
+        with open(path, "rb") as f:
+            if self.size <= MAX_CACHED_FILE_SIZE:
+                content = f.read()
+                if rewrite is not None:
+                    content = rewrite(content)
+                digest.update(content)
+                self.bodies["identity"] = content
+            else:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        self.etag = digest.hexdigest()
+
+        content = self.bodies.get("identity")
+        if content is not None and len(content) >= MIN_COMPRESS_SIZE \
+                and os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            for encoding in ENCODINGS:
+                compressed = _compress(encoding, content)
+                if len(compressed) < len(content) * 0.9:
+                    self.bodies[encoding] = compressed
+
+    @property
+    def cached(self) -> bool:
+        return bool(self.bodies)
+
+    def is_stale(self, stat: os.stat_result) -> bool:
+        return stat.st_size != self.size or stat.st_mtime_ns != self.mtime_ns
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, Optional[bytes], str]:
+        """Pick the best encoding the client accepts.
+
+        Returns ``(encoding, body, etag)``; ``body`` is None when the file must
+        be sent from disk. Each encoding has its own strong ETag.
+        """
+        if accept_encoding and len(self.bodies) > 1:
+            accepted = _accepted_encodings(accept_encoding)
+            for encoding in ENCODINGS:
+                if encoding in accepted and encoding in self.bodies:
+                    return encoding, self.bodies[encoding], f'"{self.etag}-{encoding}"'
+        return "identity", self.bodies.get("identity"), f'"{self.etag}"'
+
+    def headers(self, encoding: str, etag: str, versioned: bool, body: Optional[bytes]) -> Dict[str, str]:
+        """Response headers for the selected encoding."""
+        headers = {
+            "Content-Type": self.content_type,
+            "Content-Length": str(len(body) if body is not None else self.size),
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if versioned else REVALIDATE_CACHE_CONTROL,
+        }
+        if len(self.bodies) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return headers
+
+
+def not_modified_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """The subset of response headers repeated on a 304."""
+    return {name: headers[name] for name in ("ETag", "Cache-Control", "Vary") if name in headers}
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def is_versioned(query: str, etag: str) -> bool:
+    """Whether a query string pins the current version of the asset (``?v=<etag>``)."""
+    return any(key == "v" and value == etag for key, value in parse_qsl(query))
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+class StaticAssetIndex:
+    """Assets of a directory, built on first request and rebuilt when the file changes."""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+        self._assets: Dict[str, StaticAsset] = {}
+
+    def preload(self) -> int:
+        """Build every asset up front and return how many were loaded."""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                self.get(os.path.relpath(os.path.join(root, name), self.directory))
+        return len(self._assets)
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        """Return the asset at a path relative to the directory, or None if there is no such file."""
+        full_path = os.path.realpath(os.path.join(self.directory, path.lstrip("/")))
+        if not full_path.startswith(self.directory + os.sep):
+            return None
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            self._assets.pop(full_path, None)
+            return None
+
+        asset = self._assets.get(full_path)
+        if asset is None or asset.is_stale(stat) or self._references_changed(asset):
+            if not os.path.isfile(full_path):
+                return None
+            try:
+                asset = self._load(full_path)
+            except OSError as e:
+                logger.error(f"Failed to load static file {full_path}: {e}")
+                return None
+            self._assets[full_path] = asset
+        return asset
+
+    def _load(self, full_path: str) -> StaticAsset:
+        if not full_path.endswith(".html"):
+            return StaticAsset(full_path)
+
+        page_directory = os.path.dirname(os.path.relpath(full_path, self.directory))
+        references: Dict[str, str] = {}
+
+        def version_reference(match: "re.Match[bytes]") -> bytes:
+            url = match.group(2).decode("latin-1")
+            path = os.path.normpath(os.path.join(page_directory, unquote(url)))
+            # Pages are never pinned, so a page linking another page stays as it is
+            target = None if path.endswith(".html") else self.get(path)
+            if target is None:
+                return match.group(0)
+            references[path] = target.etag
+            return match.group(1) + f"{url}?v={target.etag}".encode("latin-1") + match.group(3)
+
+        asset = StaticAsset(full_path, lambda content: ASSET_REFERENCE.sub(version_reference, content))
+        asset.references = references
+        return asset
+
+    def _references_changed(self, asset: StaticAsset) -> bool:
+        for path, etag in asset.references.items():
+            target = self.get(path)
+            if target is None or target.etag != etag:
+                return True
+        return False
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles serving precompressed in-memory assets with strong ETags and Cache-Control.
+
+    Files too large for the in-memory cache fall back to StaticFiles. Assets
+    are compressed when the app is created; the per-request freshness check,
+    and the rebuild of a changed file, run in a worker thread rather than on
+    the event loop.
+    """
+
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.assets = StaticAssetIndex(directory)
+        self.assets.preload()
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            asset = await run_in_threadpool(self.assets.get, path)
+            if asset is not None and asset.cached:
+                request_headers = Headers(scope=scope)
+                encoding, body, etag = asset.select(request_headers.get("accept-encoding"))
+                headers = asset.headers(encoding, etag, is_versioned(scope["query_string"].decode("latin-1"), asset.etag), body)
+                if not_modified(request_headers.get("if-none-match"), etag):
+                    return Response(status_code=304, headers=not_modified_headers(headers))
+                return Response(body, headers=headers)
+        return await super().get_response(path, scope)
@@ -0,0 +1,98 @@
+"""
+Storage backends for users and their authentication information.
+The backend is selected by Settings.DATABASE_URL: in-memory dicts when unset,
+SQLite for sqlite:/// URLs. Route handlers receive it through get_storage.
+While the app runs, sessions whose refresh token has expired are purged every
+SESSION_PURGE_INTERVAL seconds. With MEMORY_STORE_DIR set, the in-memory
+store is snapshotted there and restored when the app starts.
+"""
+
+import asyncio
+from typing import Optional
+
+from app.core.cache import user_response_cache
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.models import auth_db
+from app.core.repository import user_repository
+from app.core.storage.base import Storage
+from app.core.storage.memory import MemoryStorage
+from app.core.storage.persistence import StorePersistence
+
+_storage: Optional[Storage] = None
+_purge_task: Optional[asyncio.Task] = None
+
+
+def create_storage(database_url: Optional[str] = None) -> Storage:
+    """Create the storage backend for a database URL."""
+    if not database_url:
+        persistence = None
+        if settings.MEMORY_STORE_DIR:
+            persistence = StorePersistence(
+                settings.MEMORY_STORE_DIR,
+                snapshot_interval=settings.MEMORY_STORE_SNAPSHOT_INTERVAL,
+                flush_interval=settings.MEMORY_STORE_WAL_FLUSH_INTERVAL,
+            )
+        return MemoryStorage(user_repository, auth_db, max_users=settings.MEMORY_STORE_MAX_USERS,
+                             persistence=persistence, on_remove=user_response_cache.delete)
+
+    scheme, _, path = database_url.partition(":///")
+    if scheme in ("sqlite", "sqlite+aiosqlite") and path:
+        from app.core.storage.sqlite import SqliteStorage
+        return SqliteStorage(
+            path,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            batch_size=settings.DATABASE_BATCH_SIZE,
+        )
+
+    raise ValueError(f"Unsupported DATABASE_URL: {database_url}")
+
+
+async def init_storage() -> Storage:
+    """Create and open the storage backend configured in settings."""
+    global _storage
+    await close_storage()
+    _storage = create_storage(settings.DATABASE_URL)
+    await _storage.init()
+    logger.info(f"Using {type(_storage).__name__}")
+    if settings.SESSION_PURGE_INTERVAL > 0:
+        global _purge_task
+        _purge_task = asyncio.create_task(_purge_loop(_storage, settings.SESSION_PURGE_INTERVAL))
+    return _storage
+
+
+async def _purge_loop(storage: Storage, interval: float) -> None:
+    while True:
+        try:
+            purged = await storage.purge_expired_sessions()
+            if purged:
+                logger.info(f"Purged {purged} expired sessions")
+        except Exception as e:
+            logger.error(f"Failed to purge expired sessions: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+async def close_storage() -> None:
+    """Stop the purge and close the storage backend."""
+    global _storage, _purge_task
+    if _purge_task is not None:
+        _purge_task.cancel()
+        try:
+            await _purge_task
+        except asyncio.CancelledError:
+            pass
+        _purge_task = None
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
+
+
+def get_storage() -> Storage:
+    """Return the storage backend, defaulting to in-memory outside the app lifespan."""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+__all__ = ["Storage", "MemoryStorage", "create_storage", "init_storage", "close_storage", "get_storage"]
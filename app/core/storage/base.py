@@ -0,0 +1,92 @@
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.models import User, UserAuth
+
+
+def token_digest(token: str) -> bytes:
+    """Fixed-size digest under which persistent backends index tokens, so indexes never hold them in clear."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+class Storage(ABC):
+    """Interface for persisting users and their authentication information."""
+
+    # Whether other worker processes read and write the same data
+    shared = False
+
+    async def init(self) -> None:
+        """Open connections and prepare the schema."""
+
+    async def close(self) -> None:
+        """Flush pending writes and release resources."""
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[User]:
+        """Get a user by ID."""
+
+    @abstractmethod
+    async def get_user_by_open_id(self, open_id: str) -> Optional[User]:
+        """Get a user by Lark open_id."""
+
+    @abstractmethod
+    async def get_user_by_union_id(self, union_id: str) -> Optional[User]:
+        """Get a user by Lark union_id."""
+
+    @abstractmethod
+    async def get_users(self, user_ids: Sequence[str]) -> Dict[str, User]:
+        """Get the users that exist among ``user_ids``, keyed by ID."""
+
+    @abstractmethod
+    async def save_user(self, user: User) -> str:
+        """Insert or replace a user, returning the ID it is stored under.
+
+        That is the ID of the stored user with the same open_id, if another
+        worker created one since it was looked up.
+        """
+
+    @abstractmethod
+    async def get_auth(self, user_id: str) -> Optional[UserAuth]:
+        """Get the authentication information of a user."""
+
+    @abstractmethod
+    async def get_auths(self, user_ids: Sequence[str]) -> Dict[str, UserAuth]:
+        """Get the authentication information that exists among ``user_ids``, keyed by user ID."""
+
+    @abstractmethod
+    async def save_auth(self, auth: UserAuth) -> None:
+        """Insert or replace the authentication information of a user."""
+
+    @abstractmethod
+    async def get_auth_by_refresh_token(self, refresh_token: str) -> Optional[UserAuth]:
+        """Get the authentication information currently holding ``refresh_token``."""
+
+    @abstractmethod
+    async def get_access_token_owners(self, access_tokens: Sequence[str]) -> Dict[str, Tuple[str, datetime]]:
+        """Return ``(user_id, expires_at)`` for each of ``access_tokens`` held by a stored session, keyed by token."""
+
+    @abstractmethod
+    async def list_session_expiries(self) -> List[Tuple[str, datetime]]:
+        """Return ``(user_id, expires_at)`` for every session whose refresh token is still valid."""
+
+    @abstractmethod
+    async def count_users(self) -> int:
+        """Return the number of stored users."""
+
+    @abstractmethod
+    async def count_sessions(self) -> int:
+        """Return the number of stored authentication records."""
+
+    @abstractmethod
+    async def purge_expired_sessions(self) -> int:
+        """Delete the sessions whose refresh token has expired and return how many were removed."""
+
+    def eviction_stats(self) -> Dict[str, int]:
+        """Entries removed since start, by reason."""
+        return {"expired": 0, "lru": 0}
+
+    def persistence_stats(self) -> Dict[str, Any]:
+        """Snapshot and write-ahead log counters; empty when the backend keeps no snapshots."""
+        return {}
@@ -0,0 +1,277 @@
+import asyncio
+import gc
+import heapq
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.logger import logger
+from app.core.models import SessionRecord, User, UserAuth, UserRecord
+from app.core.repository import UserRepository
+from app.core.storage.base import Storage
+from app.core.storage.persistence import StorePersistence
+
+EXPIRY_BUCKET_SECONDS = 60
+
+
+class MemoryStorage(Storage):
+    """Process-local storage backed by the in-memory users_db and auth_db dicts.
+
+    Entries are kept as compact UserRecord/SessionRecord objects and converted
+    to pydantic models only when read. Access and refresh tokens are indexed
+    to their user ID; the dicts key on the token strings the records already
+    hold, so the indexes add no per-token objects.
+
+    Sessions are also filed in a timing wheel of one-minute buckets by
+    ``refresh_expires_at``, so purging expired sessions visits only the
+    buckets that have passed instead of every session. Entries superseded by
+    a refresh are skipped when their bucket is purged.
+    With ``max_users`` set, users are kept in least recently active order and
+    the oldest one is evicted, together with its session, once the store
+    holds more.
+
+    With ``persistence`` set, the store is restored from its snapshot and log
+    at init, and every write is journaled to them (see StorePersistence).
+    ``on_remove`` is called with the user ID whenever a session or user is
+    dropped by eviction or purge.
+    """
+
+    def __init__(self, users: UserRepository, auths: Dict[str, SessionRecord], max_users: int = 0,
+                 persistence: Optional[StorePersistence] = None,
+                 on_remove: Optional[Callable[[str], None]] = None):
+        self.users = users
+        self.auths = auths
+        self.max_users = max_users
+        self.persistence = persistence
+        self.on_remove = on_remove
+        self.expired_purged = 0
+        self.lru_evicted = 0
+        self._by_access_token: Dict[str, str] = {}
+        self._by_refresh_token: Dict[str, str] = {}
+        # Bucket number -> user IDs, plus a heap of the bucket numbers in use
+        self._expiry_buckets: Dict[int, List[str]] = {}
+        self._bucket_heap: List[int] = []
+        self._bucketed = 0
+        # Only maintained when the store is capped; oldest activity first
+        self._recent: Optional[OrderedDict] = OrderedDict() if max_users > 0 else None
+        self._build_indexes()
+
+    async def init(self) -> None:
+        if self.persistence is None:
+            return
+        if not await asyncio.to_thread(self.persistence.claim):
+            logger.warning(f"{self.persistence.directory} is used by another worker: "
+                           f"this worker's in-memory store is not persisted")
+            self.persistence = None
+            return
+        start = time.perf_counter()
+        # No request is served before init returns, so the whole restore can run in a thread
+        await asyncio.to_thread(self._restore)
+        logger.info(f"Restored {len(self.users)} users and {len(self.auths)} sessions "
+                    f"in {time.perf_counter() - start:.2f}s")
+        await self.persistence.start(self)
+
+    async def close(self) -> None:
+        if self.persistence is not None:
+            await self.persistence.stop()
+
+    async def get_user(self, user_id: str) -> Optional[User]:
+        record = self.users.get(user_id)
+        if record is None:
+            return None
+        self._touch(record.id)
+        return record.to_model()
+
+    async def get_user_by_open_id(self, open_id: str) -> Optional[User]:
+        record = self.users.get_by_open_id(open_id)
+        if record is None:
+            return None
+        self._touch(record.id)
+        return record.to_model()
+
+    async def get_user_by_union_id(self, union_id: str) -> Optional[User]:
+        record = self.users.get_by_union_id(union_id)
+        if record is None:
+            return None
+        self._touch(record.id)
+        return record.to_model()
+
+    async def get_users(self, user_ids: Sequence[str]) -> Dict[str, User]:
+        records = (self.users.get(user_id) for user_id in user_ids)
+        return {record.id: record.to_model() for record in records if record is not None}
+
+    async def save_user(self, user: User) -> str:
+        record = UserRecord.from_model(user)
+        self.users.upsert(record)
+        if self.persistence is not None:
+            self.persistence.user(record)
+        self._touch(user.id)
+        return user.id
+
+    async def get_auth(self, user_id: str) -> Optional[UserAuth]:
+        record = self.auths.get(user_id)
+        if record is None:
+            return None
+        self._touch(user_id)
+        return record.to_model()
+
+    async def get_auths(self, user_ids: Sequence[str]) -> Dict[str, UserAuth]:
+        records = (self.auths.get(user_id) for user_id in user_ids)
+        return {record.user_id: record.to_model() for record in records if record is not None}
+
+    async def save_auth(self, auth: UserAuth) -> None:
+        record = SessionRecord.from_model(auth)
+        previous = self.auths.get(auth.user_id)
+        if previous is not None:
+            self._unindex(previous)
+        record.version = previous.version + 1 if previous is not None else 1
+        self.auths[auth.user_id] = record
+        self._index(record)
+        self._push_expiry(record)
+        if self.persistence is not None:
+            self.persistence.session(record)
+        self._touch(auth.user_id)
+
+    async def get_auth_by_refresh_token(self, refresh_token: str) -> Optional[UserAuth]:
+        record = self.auths.get(self._by_refresh_token.get(refresh_token))
+        if record is None:
+            return None
+        self._touch(record.user_id)
+        return record.to_model()
+
+    async def get_access_token_owners(self, access_tokens: Sequence[str]) -> Dict[str, Tuple[str, datetime]]:
+        owners = {}
+        for token in access_tokens:
+            record = self.auths.get(self._by_access_token.get(token))
+            if record is not None:
+                self._touch(record.user_id)
+                owners[token] = (record.user_id, datetime.fromtimestamp(record.expires_at))
+        return owners
+
+    async def list_session_expiries(self) -> List[Tuple[str, datetime]]:
+        now = time.time()
+        return [
+            (record.user_id, datetime.fromtimestamp(record.expires_at))
+            for record in self.auths.values()
+            if record.refresh_expires_at > now
+        ]
+
+    async def count_users(self) -> int:
+        return len(self.users)
+
+    async def count_sessions(self) -> int:
+        return len(self.auths)
+
+    async def purge_expired_sessions(self) -> int:
+        now = time.time()
+        heap = self._bucket_heap
+        purged = 0
+        # Only buckets that ended before now; a session is purged at most one bucket late
+        while heap and (heap[0] + 1) * EXPIRY_BUCKET_SECONDS <= now:
+            user_ids = self._expiry_buckets.pop(heapq.heappop(heap))
+            self._bucketed -= len(user_ids)
+            for user_id in user_ids:
+                record = self.auths.get(user_id)
+                # The session may have been refreshed or removed since it was filed here
+                if record is not None and record.refresh_expires_at <= now:
+                    self._remove_auth(user_id)
+                    if self._recent is not None and user_id not in self.users:
+                        self._recent.pop(user_id, None)
+                    purged += 1
+        self.expired_purged += purged
+        return purged
+
+    def eviction_stats(self) -> Dict[str, int]:
+        return {"expired": self.expired_purged, "lru": self.lru_evicted}
+
+    def _push_expiry(self, record: SessionRecord) -> None:
+        bucket = int(record.refresh_expires_at // EXPIRY_BUCKET_SECONDS)
+        user_ids = self._expiry_buckets.get(bucket)
+        if user_ids is None:
+            user_ids = self._expiry_buckets[bucket] = []
+            heapq.heappush(self._bucket_heap, bucket)
+        user_ids.append(record.user_id)
+        self._bucketed += 1
+        # Every refresh leaves a stale entry behind; drop them once they outnumber the live ones
+        if self._bucketed > 2 * len(self.auths) + 1024:
+            self._rebuild_expiry_wheel()
+
+    def _rebuild_expiry_wheel(self) -> None:
+        buckets: Dict[int, List[str]] = {}
+        for record in self.auths.values():
+            bucket = int(record.refresh_expires_at // EXPIRY_BUCKET_SECONDS)
+            user_ids = buckets.get(bucket)
+            if user_ids is None:
+                user_ids = buckets[bucket] = []
+            user_ids.append(record.user_id)
+        self._expiry_buckets = buckets
+        # A sorted list is a valid heap
+        self._bucket_heap = sorted(buckets)
+        self._bucketed = len(self.auths)
+
+    def _touch(self, user_id: str) -> None:
+        recent = self._recent
+        if recent is None:
+            return
+        if user_id in recent:
+            recent.move_to_end(user_id)
+        else:
+            recent[user_id] = None
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self._recent) > self.max_users:
+            user_id, _ = self._recent.popitem(last=False)
+            if self.users.delete(user_id) is not None and self.persistence is not None:
+                self.persistence.delete_user(user_id)
+            self._remove_auth(user_id)
+            self.lru_evicted += 1
+
+    def _remove_auth(self, user_id: str) -> None:
+        # The timing wheel entry is left behind and skipped when its bucket is purged
+        record = self.auths.pop(user_id, None)
+        if record is not None:
+            self._unindex(record)
+            if self.persistence is not None:
+                self.persistence.delete_session(user_id)
+        if self.on_remove is not None:
+            self.on_remove(user_id)
+
+    def persistence_stats(self) -> Dict[str, Any]:
+        return self.persistence.stats() if self.persistence is not None else {}
+
+    def _restore(self) -> None:
+        # Collections triggered by the millions of new objects would each traverse all of them again
+        gc.disable()
+        try:
+            users, sessions = self.persistence.load()
+            self.users.update(users)
+            self.auths.update(sessions)
+            self._build_indexes()
+        finally:
+            gc.enable()
+        # The restored records live as long as the process: keep later full collections from visiting them
+        gc.freeze()
+
+    def _build_indexes(self) -> None:
+        self._by_access_token = {record.access_token: user_id for user_id, record in self.auths.items()}
+        self._by_refresh_token = {record.refresh_token: user_id for user_id, record in self.auths.items()}
+        self._rebuild_expiry_wheel()
+        if self._recent is not None:
+            self._recent.clear()
+            for user in self.users:
+                self._recent[user.id] = None
+            for user_id in self.auths:
+                self._recent[user_id] = None
+            self._evict()
+
+    def _index(self, record: SessionRecord) -> None:
+        self._by_access_token[record.access_token] = record.user_id
+        self._by_refresh_token[record.refresh_token] = record.user_id
+
+    def _unindex(self, record: SessionRecord) -> None:
+        if self._by_access_token.get(record.access_token) == record.user_id:
+            del self._by_access_token[record.access_token]
+        if self._by_refresh_token.get(record.refresh_token) == record.user_id:
+            del self._by_refresh_token[record.refresh_token]
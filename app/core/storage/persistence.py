@@ -0,0 +1,340 @@
+"""
+Snapshot and write-ahead log of the in-memory store, so a restarted worker
+keeps its users and sessions.
+
+Every write to MemoryStorage appends a small tuple to an in-memory journal;
+the request path takes no lock and does no I/O. A background task appends
+the journal in batches to ``wal-<generation>.log``, and every
+``snapshot_interval`` seconds writes all records to
+``snapshot-<generation>.bin`` and starts the next generation. Records are
+never changed once stored, so the snapshot copies the record lists on the
+event loop and serializes them in a thread while requests go on.
+
+Both hold CRC-checked frames of JSON, so reading them back can only ever
+yield plain records. They hold live tokens, so the directory is created
+0700 and the files 0600, and files another user owns are never loaded.
+
+On startup the newest complete snapshot is loaded and the logs of its
+generation and any later one are replayed. A log ending in a torn batch
+(the process died mid-write) is replayed up to that batch. A batch that
+fails to reach the log stays queued and is retried in the next
+generation's log. Batches are flushed to the OS, not fsynced: a process
+crash loses nothing written more than ``flush_interval`` ago, a power loss
+may lose more.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from app.core.logger import logger
+from app.core.models import SessionRecord, UserRecord
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+OP_USER = 1
+OP_SESSION = 2
+OP_DELETE_SESSION = 3
+OP_DELETE_USER = 4
+
+SNAPSHOT_MAGIC = b"LARKSNAP2\n"
+# Payload length and CRC32 before every serialized batch or snapshot
+FRAME_HEADER = struct.Struct(">II")
+FORMAT_VERSION = 2
+# Records per snapshot frame; each frame is encoded in one call holding the GIL, so keep them small
+SNAPSHOT_CHUNK = 2000
+
+_encoder = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+
+UserFields = Tuple[Any, ...]
+SessionFields = Tuple[Any, ...]
+
+
+def user_fields(record: UserRecord) -> UserFields:
+    return (record.id, record.name, record.email, record.open_id, record.union_id, record.avatar_url,
+            record.created_at, record.updated_at)
+
+
+def session_fields(record: SessionRecord) -> SessionFields:
+    return (record.user_id, record.access_token, record.token_type, record.refresh_token, record.expires_at,
+            record.refresh_expires_at, record.version)
+
+
+def _frame(payload: Any) -> bytes:
+    data = _encoder.encode(payload).encode()
+    return FRAME_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+def _owned(path: str) -> bool:
+    """Whether ``path`` belongs to this process's user; anyone else could have planted sessions in it."""
+    return not hasattr(os, "getuid") or os.stat(path).st_uid == os.getuid()
+
+
+def _create(path: str, flags: int) -> int:
+    return os.open(path, os.O_WRONLY | os.O_CREAT | flags, 0o600)
+
+
+def _read_frames(f: BinaryIO) -> Iterator[Any]:
+    """Yield the payloads of ``f`` up to the first incomplete or corrupt frame."""
+    while True:
+        header = f.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        length, crc = FRAME_HEADER.unpack(header)
+        data = f.read(length)
+        if len(data) < length or zlib.crc32(data) != crc:
+            logger.warning(f"Ignoring a torn batch at the end of {f.name}")
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            logger.warning(f"Ignoring {f.name} from the first undecodable batch on")
+            return
+
+
+class StorePersistence:
+    """Journal, write-ahead log and periodic snapshots of one MemoryStorage under ``directory``."""
+
+    def __init__(self, directory: str, snapshot_interval: float, flush_interval: float):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.flush_interval = flush_interval
+        self.generation = 0
+        self.snapshots = 0
+        self.last_snapshot_seconds = 0.0
+        self.journal: List[tuple] = []
+        self._wal: Optional[BinaryIO] = None
+        self._lock_fd: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._flush_now: Optional[asyncio.Event] = None
+
+    # Called by MemoryStorage on every write: an append, nothing else
+
+    def user(self, record: UserRecord) -> None:
+        self.journal.append((OP_USER, user_fields(record)))
+
+    def session(self, record: SessionRecord) -> None:
+        self.journal.append((OP_SESSION, session_fields(record)))
+
+    def delete_session(self, user_id: str) -> None:
+        self.journal.append((OP_DELETE_SESSION, user_id))
+
+    def delete_user(self, user_id: str) -> None:
+        self.journal.append((OP_DELETE_USER, user_id))
+
+    def claim(self) -> bool:
+        """Lock the directory for this process; False if another live process holds it."""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        if fcntl is None:
+            return True
+        fd = os.open(os.path.join(self.directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def load(self) -> Tuple[Dict[str, UserRecord], Dict[str, SessionRecord]]:
+        """Read the newest snapshot and replay the logs written after it, returning records by user ID."""
+        users: Dict[str, UserRecord] = {}
+        sessions: Dict[str, SessionRecord] = {}
+        snapshots = self._files("snapshot-", ".bin")
+        logs = self._files("wal-", ".log")
+        # Continue after everything found, so nothing old is mistaken for the current generation
+        self.generation = max((generation for generation, _ in snapshots + logs), default=0) + 1
+        if not _owned(self.directory):
+            logger.error(f"Not restoring the store: {self.directory} belongs to another user")
+            return users, sessions
+        base = 0
+        for generation, path in reversed(snapshots):
+            if not _owned(path):
+                logger.error(f"Ignoring {path}: it belongs to another user")
+                continue
+            loaded = self._read_snapshot(path)
+            if loaded is not None:
+                users, sessions = loaded
+                base = generation
+                break
+        replayed = 0
+        for generation, path in logs:
+            if generation < base:
+                continue
+            if not _owned(path):
+                logger.error(f"Ignoring {path}: it belongs to another user")
+                continue
+            with open(path, "rb") as f:
+                for batch in _read_frames(f):
+                    replayed += len(batch)
+                    for op, value in batch:
+                        if op == OP_SESSION:
+                            sessions[value[0]] = SessionRecord(*value)
+                        elif op == OP_USER:
+                            users[value[0]] = UserRecord(*value)
+                        elif op == OP_DELETE_SESSION:
+                            sessions.pop(value, None)
+                        elif op == OP_DELETE_USER:
+                            users.pop(value, None)
+        logger.info(f"Loaded {len(users)} users and {len(sessions)} sessions from snapshot {base} "
+                    f"and {replayed} logged writes")
+        return users, sessions
+
+    async def start(self, storage: Any) -> None:
+        """Start the background log flush and snapshots of ``storage``."""
+        self._wal = await asyncio.to_thread(self._open_wal, self.generation)
+        self._flush_now = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run(storage))
+
+    async def stop(self) -> None:
+        """Flush the journal, write a final snapshot and stop."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._flush_now.set()
+        await self._task
+        self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def snapshot(self, storage: Any) -> None:
+        """Write every record to a new snapshot and start the next log generation."""
+        start = time.perf_counter()
+        await self._flush()
+        # No await between the copy and the switch. Writes journaled but not flushed yet are in the copy
+        # and also go to the next log; replaying them over the snapshot sets the same state again
+        users = list(storage.users)
+        sessions = list(storage.auths.values())
+        generation = self.generation + 1
+        previous_wal = self._wal
+        self.generation = generation
+        self._wal = None
+        await asyncio.to_thread(self._write_snapshot, generation, users, sessions, previous_wal)
+        self.snapshots += 1
+        self.last_snapshot_seconds = time.perf_counter() - start
+        logger.info(f"Snapshot {generation} of {len(users)} users and {len(sessions)} sessions written "
+                    f"in {self.last_snapshot_seconds:.2f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"generation": self.generation, "snapshots": self.snapshots, "journal": len(self.journal),
+                "last_snapshot_seconds": self.last_snapshot_seconds}
+
+    async def _run(self, storage: Any) -> None:
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                if self._closing or time.monotonic() >= next_snapshot:
+                    await self.snapshot(storage)
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+                else:
+                    await self._flush()
+            except OSError as e:
+                logger.error(f"Failed to persist the in-memory store: {e}")
+            if self._closing:
+                return
+
+    async def _flush(self) -> None:
+        if not self.journal:
+            return
+        batch, self.journal = self.journal, []
+        try:
+            if self._wal is None:
+                self._wal = await asyncio.to_thread(self._open_wal, self.generation)
+            await asyncio.to_thread(self._append, self._wal, batch)
+        except OSError:
+            # Retry ahead of the writes journaled meanwhile. The log may now end in part of this batch,
+            # which hides anything appended after it from replay, so the retry goes to the next generation
+            self.journal[:0] = batch
+            if self._wal is not None:
+                wal, self._wal = self._wal, None
+                self.generation += 1
+                await asyncio.to_thread(self._close_quietly, wal)
+            raise
+
+    def _append(self, wal: BinaryIO, batch: List[tuple]) -> None:
+        wal.write(_frame(batch))
+        wal.flush()
+
+    def _open_wal(self, generation: int) -> BinaryIO:
+        path = os.path.join(self.directory, f"wal-{generation:08d}.log")
+        return os.fdopen(_create(path, os.O_APPEND), "ab")
+
+    @staticmethod
+    def _close_quietly(wal: BinaryIO) -> None:
+        try:
+            wal.close()
+        except OSError:
+            # Closing flushes the buffer, which fails again the way the append did
+            pass
+
+    def _write_snapshot(self, generation: int, users: List[UserRecord], sessions: List[SessionRecord],
+                        previous_wal: Optional[BinaryIO]) -> None:
+        path = os.path.join(self.directory, f"snapshot-{generation:08d}.bin")
+        with os.fdopen(_create(path + ".tmp", os.O_TRUNC), "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(_frame({"version": FORMAT_VERSION}))
+            for op, records, fields in ((OP_USER, users, user_fields), (OP_SESSION, sessions, session_fields)):
+                for i in range(0, len(records), SNAPSHOT_CHUNK):
+                    f.write(_frame((op, [fields(record) for record in records[i:i + SNAPSHOT_CHUNK]])))
+            # Only a snapshot ending in this frame is complete
+            f.write(_frame({"users": len(users), "sessions": len(sessions)}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        if previous_wal is not None:
+            previous_wal.close()
+        # The new snapshot covers every older snapshot and log
+        for prefix, suffix in (("snapshot-", ".bin"), ("wal-", ".log")):
+            for old_generation, old_path in self._files(prefix, suffix):
+                if old_generation < generation:
+                    os.remove(old_path)
+
+    def _read_snapshot(self, path: str) -> Optional[Tuple[Dict[str, UserRecord], Dict[str, SessionRecord]]]:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                logger.warning(f"Ignoring {path}: not a store snapshot")
+                return None
+            frames = _read_frames(f)
+            header = next(frames, None)
+            if not isinstance(header, dict) or header.get("version") != FORMAT_VERSION:
+                logger.warning(f"Ignoring {path}: unsupported snapshot version")
+                return None
+            users: Dict[str, UserRecord] = {}
+            sessions: Dict[str, SessionRecord] = {}
+            for frame in frames:
+                if isinstance(frame, dict):
+                    if frame == {"users": len(users), "sessions": len(sessions)}:
+                        return users, sessions
+                    break
+                op, chunk = frame
+                if op == OP_USER:
+                    users.update({fields[0]: UserRecord(*fields) for fields in chunk})
+                else:
+                    sessions.update({fields[0]: SessionRecord(*fields) for fields in chunk})
+        logger.warning(f"Ignoring {path}: incomplete snapshot")
+        return None
+
+    def _files(self, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+        """Return ``(generation, path)`` of the files named ``<prefix><generation><suffix>``, oldest first."""
+        files = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                generation = name[len(prefix):-len(suffix)]
+                if generation.isdigit():
+                    files.append((int(generation), os.path.join(self.directory, name)))
+        return sorted(files)
@@ -0,0 +1,361 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+
+import aiosqlite
+
+from app.core.logger import logger
+from app.core.models import User, UserAuth
+from app.core.storage.base import Storage, token_digest
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT,
+        open_id TEXT NOT NULL,
+        union_id TEXT NOT NULL,
+        avatar_url TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_open_id ON users (open_id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_union_id ON users (union_id)",
+    """
+    CREATE TABLE IF NOT EXISTS user_auth (
+        user_id TEXT PRIMARY KEY,
+        access_token TEXT NOT NULL,
+        token_type TEXT NOT NULL,
+        refresh_token TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        refresh_expires_at REAL NOT NULL,
+        version INTEGER NOT NULL DEFAULT 1,
+        access_token_hash BLOB,
+        refresh_token_hash BLOB
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_user_auth_expires_at ON user_auth (expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_user_auth_refresh_expires_at ON user_auth (refresh_expires_at)",
+)
+
+# Token hash columns were added after the first schema; created after migrating older databases
+TOKEN_HASH_COLUMNS = ("access_token_hash", "refresh_token_hash")
+TOKEN_HASH_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_user_auth_access_token_hash ON user_auth (access_token_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_user_auth_refresh_token_hash ON user_auth (refresh_token_hash)",
+)
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+)
+
+USER_COLUMNS = "id, name, email, open_id, union_id, avatar_url, created_at, updated_at"
+AUTH_COLUMNS = "user_id, access_token, token_type, refresh_token, expires_at, refresh_expires_at, version"
+
+# A first login of the same Lark user on two workers inserts two new IDs for one open_id:
+# the second updates the row of the first and returns its ID
+UPSERT_USER = f"""
+    INSERT INTO users ({USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        name = excluded.name,
+        email = excluded.email,
+        open_id = excluded.open_id,
+        union_id = excluded.union_id,
+        avatar_url = excluded.avatar_url,
+        updated_at = excluded.updated_at
+    ON CONFLICT (open_id) DO UPDATE SET
+        name = excluded.name,
+        email = excluded.email,
+        union_id = excluded.union_id,
+        avatar_url = excluded.avatar_url,
+        updated_at = excluded.updated_at
+    RETURNING id
+"""
+
+UPSERT_AUTH = f"""
+    INSERT INTO user_auth ({AUTH_COLUMNS}, access_token_hash, refresh_token_hash) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        access_token = excluded.access_token,
+        token_type = excluded.token_type,
+        refresh_token = excluded.refresh_token,
+        expires_at = excluded.expires_at,
+        refresh_expires_at = excluded.refresh_expires_at,
+        version = user_auth.version + 1,
+        access_token_hash = excluded.access_token_hash,
+        refresh_token_hash = excluded.refresh_token_hash
+"""
+
+# Stay well below SQLite's limit on bound parameters per statement
+MAX_IN_PARAMS = 500
+
+# SQL, parameters, whether the statement returns rows, and the future of its result
+WriteRequest = Tuple[str, Sequence[Any], bool, asyncio.Future]
+
+
+def _user_from_row(row: Sequence[Any]) -> User:
+    return User(
+        id=row[0],
+        name=row[1],
+        email=row[2],
+        open_id=row[3],
+        union_id=row[4],
+        avatar_url=row[5],
+        created_at=datetime.fromtimestamp(row[6]),
+        updated_at=datetime.fromtimestamp(row[7]),
+    )
+
+
+def _auth_from_row(row: Sequence[Any]) -> UserAuth:
+    return UserAuth(
+        user_id=row[0],
+        access_token=row[1],
+        token_type=row[2],
+        refresh_token=row[3],
+        expires_at=datetime.fromtimestamp(row[4]),
+        refresh_expires_at=datetime.fromtimestamp(row[5]),
+        version=row[6],
+    )
+
+
+class SqliteStorage(Storage):
+    """SQLite storage shared by every worker on the host.
+
+    Reads use a pool of connections; writes are queued to a single writer
+    connection that commits everything queued so far in one transaction.
+    The database runs in WAL mode so readers never block the writer.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, pool_size: int = 4, batch_size: int = 100):
+        self.path = path
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.expired_purged = 0
+        self._readers: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+
+    async def init(self) -> None:
+        self._writer = await self._connect()
+        for statement in SCHEMA:
+            await self._writer.execute(statement)
+        await self._migrate_token_hashes()
+        for statement in TOKEN_HASH_INDEXES:
+            await self._writer.execute(statement)
+        await self._writer.commit()
+
+        self._readers = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._readers.put_nowait(await self._connect())
+
+        self._writes = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._write_loop())
+        logger.info(f"SQLite storage ready at {self.path} ({self.pool_size} reader connections)")
+
+    async def close(self) -> None:
+        if self._writer_task is not None:
+            # The sentinel lets the writer commit everything queued before it
+            self._writes.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+        for connection in self._connections:
+            await connection.close()
+        self._connections = []
+
+    async def get_user(self, user_id: str) -> Optional[User]:
+        row = await self._fetchone(f"SELECT {USER_COLUMNS} FROM users WHERE id = ?", (user_id,))
+        return _user_from_row(row) if row else None
+
+    async def get_user_by_open_id(self, open_id: str) -> Optional[User]:
+        row = await self._fetchone(f"SELECT {USER_COLUMNS} FROM users WHERE open_id = ?", (open_id,))
+        return _user_from_row(row) if row else None
+
+    async def get_user_by_union_id(self, union_id: str) -> Optional[User]:
+        row = await self._fetchone(f"SELECT {USER_COLUMNS} FROM users WHERE union_id = ?", (union_id,))
+        return _user_from_row(row) if row else None
+
+    async def get_users(self, user_ids: Sequence[str]) -> Dict[str, User]:
+        rows = await self._fetch_in(f"SELECT {USER_COLUMNS} FROM users WHERE id IN ({{}})", user_ids)
+        return {row[0]: _user_from_row(row) for row in rows}
+
+    async def save_user(self, user: User) -> str:
+        rows = await self._write(UPSERT_USER, (
+            user.id,
+            user.name,
+            user.email,
+            user.open_id,
+            user.union_id,
+            user.avatar_url,
+            user.created_at.timestamp(),
+            user.updated_at.timestamp(),
+        ), returning=True)
+        return rows[0][0]
+
+    async def get_auth(self, user_id: str) -> Optional[UserAuth]:
+        row = await self._fetchone(f"SELECT {AUTH_COLUMNS} FROM user_auth WHERE user_id = ?", (user_id,))
+        return _auth_from_row(row) if row else None
+
+    async def get_auths(self, user_ids: Sequence[str]) -> Dict[str, UserAuth]:
+        rows = await self._fetch_in(f"SELECT {AUTH_COLUMNS} FROM user_auth WHERE user_id IN ({{}})", user_ids)
+        return {row[0]: _auth_from_row(row) for row in rows}
+
+    async def save_auth(self, auth: UserAuth) -> None:
+        await self._write(UPSERT_AUTH, (
+            auth.user_id,
+            auth.access_token,
+            auth.token_type,
+            auth.refresh_token,
+            auth.expires_at.timestamp(),
+            auth.refresh_expires_at.timestamp(),
+            token_digest(auth.access_token),
+            token_digest(auth.refresh_token),
+        ))
+
+    async def get_auth_by_refresh_token(self, refresh_token: str) -> Optional[UserAuth]:
+        row = await self._fetchone(
+            f"SELECT {AUTH_COLUMNS} FROM user_auth WHERE refresh_token_hash = ?", (token_digest(refresh_token),)
+        )
+        return _auth_from_row(row) if row and row[3] == refresh_token else None
+
+    async def get_access_token_owners(self, access_tokens: Sequence[str]) -> Dict[str, Tuple[str, datetime]]:
+        rows = await self._fetch_in(
+            "SELECT access_token, user_id, expires_at FROM user_auth WHERE access_token_hash IN ({})",
+            [token_digest(token) for token in access_tokens]
+        )
+        requested = set(access_tokens)
+        return {
+            token: (user_id, datetime.fromtimestamp(expires_at))
+            for token, user_id, expires_at in rows
+            if token in requested
+        }
+
+    async def list_session_expiries(self) -> List[Tuple[str, datetime]]:
+        async with self._reader() as connection:
+            async with connection.execute(
+                "SELECT user_id, expires_at FROM user_auth WHERE refresh_expires_at > ? ORDER BY expires_at",
+                (datetime.now().timestamp(),)
+            ) as cursor:
+                rows = await cursor.fetchall()
+        return [(user_id, datetime.fromtimestamp(expires_at)) for user_id, expires_at in rows]
+
+    async def count_users(self) -> int:
+        row = await self._fetchone("SELECT COUNT(*) FROM users", ())
+        return row[0]
+
+    async def count_sessions(self) -> int:
+        row = await self._fetchone("SELECT COUNT(*) FROM user_auth", ())
+        return row[0]
+
+    async def purge_expired_sessions(self) -> int:
+        # Served by ix_user_auth_refresh_expires_at, so only the expired rows are visited
+        purged = await self._write("DELETE FROM user_auth WHERE refresh_expires_at <= ?", (datetime.now().timestamp(),))
+        self.expired_purged += purged
+        return purged
+
+    def eviction_stats(self) -> Dict[str, int]:
+        return {"expired": self.expired_purged, "lru": 0}
+
+    async def _migrate_token_hashes(self) -> None:
+        """Add and backfill the token hash columns on databases created before they existed."""
+        async with self._writer.execute("PRAGMA table_info(user_auth)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        missing = [column for column in TOKEN_HASH_COLUMNS if column not in columns]
+        if not missing:
+            return
+        for column in missing:
+            await self._writer.execute(f"ALTER TABLE user_auth ADD COLUMN {column} BLOB")
+        async with self._writer.execute("SELECT user_id, access_token, refresh_token FROM user_auth") as cursor:
+            rows = await cursor.fetchall()
+        await self._writer.executemany(
+            "UPDATE user_auth SET access_token_hash = ?, refresh_token_hash = ? WHERE user_id = ?",
+            [(token_digest(access), token_digest(refresh), user_id) for user_id, access, refresh in rows]
+        )
+        logger.info(f"Indexed token hashes of {len(rows)} existing sessions")
+
+    async def _connect(self) -> aiosqlite.Connection:
+        connection = await aiosqlite.connect(self.path)
+        for pragma in PRAGMAS:
+            await connection.execute(pragma)
+        self._connections.append(connection)
+        return connection
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        connection = await self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put_nowait(connection)
+
+    async def _fetchone(self, sql: str, params: Sequence[Any]) -> Optional[Sequence[Any]]:
+        async with self._reader() as connection:
+            async with connection.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def _fetch_in(self, sql: str, values: Sequence[Any]) -> List[Sequence[Any]]:
+        """Run a query with an ``IN ({})`` placeholder over ``values`` in chunks."""
+        rows: List[Sequence[Any]] = []
+        async with self._reader() as connection:
+            for start in range(0, len(values), MAX_IN_PARAMS):
+                chunk = values[start:start + MAX_IN_PARAMS]
+                async with connection.execute(sql.format(", ".join("?" * len(chunk))), chunk) as cursor:
+                    rows.extend(await cursor.fetchall())
+        return rows
+
+    async def _write(self, sql: str, params: Sequence[Any], returning: bool = False) -> Any:
+        """Queue a write, wait until the batch containing it is committed and return the rows it changed.
+
+        With ``returning``, return the rows of the statement's RETURNING clause instead.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((sql, params, returning, future))
+        return await future
+
+    async def _write_loop(self) -> None:
+        stopping = False
+        while not (stopping and self._writes.empty()):
+            request = await self._writes.get()
+            batch: List[WriteRequest] = []
+            # Group commit: take everything that queued up while the last batch was committing
+            while True:
+                if request is None:
+                    stopping = True
+                else:
+                    batch.append(request)
+                if self._writes.empty() or len(batch) >= self.batch_size:
+                    break
+                request = self._writes.get_nowait()
+            if batch:
+                await self._commit(batch)
+
+    async def _commit(self, batch: List[WriteRequest]) -> None:
+        results: List[Union[int, List[Any], Exception]] = []
+        try:
+            for sql, params, returning, _ in batch:
+                try:
+                    cursor = await self._writer.execute(sql, params)
+                    results.append(await cursor.fetchall() if returning else cursor.rowcount)
+                except Exception as e:
+                    # A failed statement only rolls back itself, the rest of the batch still commits
+                    logger.error(f"SQLite write failed: {str(e)}")
+                    results.append(e)
+            await self._writer.commit()
+        except Exception as e:
+            logger.error(f"SQLite commit failed: {str(e)}")
+            results = [e] * len(batch)
+
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -1,12 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from contextlib import asynccontextmanager
 
+from app.api.endpoints import metrics_router
 from app.api.router import router
+from app.core.audit import audit_log
 from app.core.config import settings
-from app.core.logger import logger
+from app.core.http_client import init_http_client, close_http_client
+from app.core.metrics import MetricsMiddleware
+from app.core.static_assets import CachedStaticFiles
+from app.core.storage import init_storage, close_storage
+from app.services.directory_sync import directory_sync
+from app.services.lark_service import refresh_user_session
+from app.services.refresh_scheduler import refresh_scheduler
+from app.core.logger import configure_logging, logger
 
 
 @asynccontextmanager
@@ -14,13 +22,36 @@ async def lifespan(app: FastAPI):
     """Handle startup and shutdown events."""
     # Startup logic
     logger.info("Starting Lark OAuth Integration API")
+    await init_http_client()
+    storage = await init_storage()
+    await audit_log.start()
+    if settings.TOKEN_REFRESH_SCHEDULER_ENABLED:
+        await refresh_scheduler.start(refresh_user_session, await storage.list_session_expiries())
+    if settings.DIRECTORY_SYNC_ENABLED:
+        await directory_sync.start(settings.DIRECTORY_SYNC_INTERVAL)
     yield
     # Shutdown logic
     logger.info("Shutting down Lark OAuth Integration API")
+    await directory_sync.stop()
+    await refresh_scheduler.stop()
+    await close_storage()
+    await audit_log.stop()
+    await close_http_client()
+    # Flush messages still queued for the enqueued sinks
+    await logger.complete()
 
 
 def create_application() -> FastAPI:
     """Create and configure the FastAPI application."""
+    # The logger was configured from the environment alone; apply the LOG_* settings, .env included
+    configure_logging(
+        level=settings.LOG_LEVEL,
+        file=settings.LOG_FILE or "",
+        file_level=settings.LOG_FILE_LEVEL,
+        enqueue=settings.LOG_ENQUEUE,
+        json=settings.LOG_JSON,
+        sample_rates=settings.LOG_SAMPLE_RATES,
+    )
     app = FastAPI(
         title=settings.PROJECT_NAME,
         description="A simple API for Lark OAuth authentication",
@@ -37,12 +68,16 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Record request latency per route
+    app.add_middleware(MetricsMiddleware)
+
     # Include routers
     app.include_router(router, prefix="/api")
+    app.include_router(metrics_router)
 
     # Mount static files (if needed)
     try:
-        app.mount("/static", StaticFiles(directory="static"), name="static")
+        app.mount("/static", CachedStaticFiles(directory="static"), name="static")
     except RuntimeError:
         # Handle case when static directory doesn't exist
         logger.warning("Static directory not found, skipping static file mounting")
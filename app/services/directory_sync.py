@@ -0,0 +1,157 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Set
+
+from fastapi import HTTPException
+
+from app.core.audit import audit_log
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.storage import Storage, get_storage
+from app.services.lark_service import list_department_users_page, list_departments_page, upsert_user
+from app.services.rate_limiter import BACKGROUND, lark_priority
+
+ROOT_DEPARTMENT_ID = "0"
+
+
+def _user_info(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a contact API user to the user info shape used at login."""
+    return {
+        "open_id": item.get("open_id"),
+        "union_id": item.get("union_id"),
+        "name": item.get("name"),
+        "email": item.get("email") or item.get("enterprise_email"),
+        "avatar_url": (item.get("avatar") or {}).get("avatar_72"),
+    }
+
+
+class DirectorySync:
+    """Import the organization's users from the Lark contact API into the user store.
+
+    Departments are listed page by page and handed, as they arrive, to
+    ``concurrency`` workers that page through each department's users and
+    upsert every page before fetching the next, so at most ``concurrency``
+    pages are held at once. Every sync is a full sync: each listed user is
+    compared with the stored one, and only new or changed profiles are
+    written.
+    """
+
+    def __init__(self, concurrency: int, page_size: int):
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def run(self, storage: Optional[Storage] = None) -> Dict[str, Any]:
+        """Sync the whole directory once and return its counters."""
+        storage = storage or get_storage()
+        counts = dict.fromkeys(("departments", "failed_departments", "users", "created", "updated",
+                                "unchanged", "skipped"), 0)
+        seen: Set[str] = set()
+        departments: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        start = time.perf_counter()
+
+        async def list_departments():
+            await departments.put(ROOT_DEPARTMENT_ID)
+            page_token = None
+            while True:
+                page = await list_departments_page(page_token, self.page_size)
+                for department in page.get("items") or []:
+                    await departments.put(department["open_department_id"])
+                page_token = page.get("page_token")
+                if not page.get("has_more") or not page_token:
+                    break
+            for _ in range(self.concurrency):
+                await departments.put(None)
+
+        async def sync_department(department_id: str):
+            page_token = None
+            while True:
+                page = await list_department_users_page(department_id, page_token, self.page_size)
+                for item in page.get("items") or []:
+                    await self._sync_user(_user_info(item), seen, counts, storage)
+                page_token = page.get("page_token")
+                if not page.get("has_more") or not page_token:
+                    return
+
+        async def worker():
+            while True:
+                department_id = await departments.get()
+                if department_id is None:
+                    return
+                counts["departments"] += 1
+                try:
+                    await sync_department(department_id)
+                except HTTPException as e:
+                    counts["failed_departments"] += 1
+                    logger.warning(f"Directory sync of department {department_id} failed: {e.detail}")
+
+        # Contact API calls yield to logins and refreshes; the workers inherit the priority
+        with lark_priority(BACKGROUND):
+            tasks = [asyncio.create_task(list_departments())]
+            tasks += [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            try:
+                # The first failure ends the sync: the lister would otherwise wait forever on a full
+                # queue nobody reads, or the workers on departments that never come
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        elapsed = time.perf_counter() - start
+        result = {**counts, "seconds": round(elapsed, 3), "users_per_second": round(counts["users"] / elapsed, 1)}
+        self.last_result = result
+        logger.info(f"Directory sync finished: {result}")
+        audit_log.emit("directory_sync", **result)
+        return result
+
+    async def _sync_user(self, user_info: Dict[str, Any], seen: Set[str],
+                         counts: Dict[str, int], storage: Storage) -> None:
+        open_id = user_info["open_id"]
+        if not open_id or not user_info["union_id"] or not user_info["name"]:
+            counts["skipped"] += 1
+            return
+        if open_id in seen:
+            # Users in several departments are listed once per department
+            return
+        seen.add(open_id)
+        counts["users"] += 1
+        _, outcome = await upsert_user(user_info, storage)
+        counts[outcome] += 1
+
+    async def start(self, interval: float) -> None:
+        """Sync now and then every ``interval`` seconds in the background."""
+        self._task = asyncio.create_task(self._run_periodically(interval))
+        logger.info(f"Directory sync started, every {interval:.0f}s")
+
+    async def stop(self) -> None:
+        """Cancel the background sync."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run_periodically(self, interval: float) -> None:
+        while True:
+            try:
+                await self.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Directory sync failed: {e!r}")
+            await asyncio.sleep(interval)
+
+
+directory_sync = DirectorySync(
+    concurrency=settings.DIRECTORY_SYNC_CONCURRENCY,
+    page_size=settings.DIRECTORY_SYNC_PAGE_SIZE
+)
@@ -1,15 +1,144 @@
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from functools import partial
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 import httpx
 from fastapi import HTTPException, status
 
+from app.core.audit import audit_log
+from app.core.cache import RequestCoalescer, user_response_cache
 from app.core.config import settings
-from app.core.models import User, UserAuth, users_db, auth_db
+from app.core.http_client import get_http_client
+from app.core.models import TokenIntrospection, User, UserAuth, UserResponse
+from app.core.storage import Storage, get_storage
 from app.core.logger import logger
+from app.core.metrics import (
+    lark_login_stage_duration, lark_outbound_wait, lark_upstream_duration, lark_upstream_errors, lark_upstream_retries
+)
+from app.core.shared_state import SharedStateTimeout, shared_state
+from app.services.rate_limiter import (
+    INTERACTIVE, PRIORITY_NAMES, REFRESH, OutboundScheduler, current_priority, lark_priority
+)
+from app.services.refresh_scheduler import refresh_scheduler
+from app.services.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, send_with_resilience
+from app.services.token_cache import AppTokenCache
 
 
-async def get_app_access_token() -> str:
-    """Get an app access token from Lark."""
+class CodeRejectedError(HTTPException):
+    """Lark rejected an authorization code; sending it again cannot succeed."""
+
+
+# Lark error codes of the code exchange that condemn the code itself: invalid, expired or already used.
+# Other errors (bad app credentials, Lark-side failures) may pass when the user's browser retries, so
+# they are not cached against the code
+REJECTED_CODE_ERRORS = frozenset({20003, 20004, 20065})
+
+
+# Shared by every request in this process, and with the other workers when SHARED_STATE_DIR is set;
+# see AppTokenCache for renewal semantics
+app_token_cache = AppTokenCache(refresh_margin=settings.APP_TOKEN_REFRESH_MARGIN, shared=shared_state)
+# Tenant access token for the contact API used by the directory sync
+tenant_token_cache = AppTokenCache(
+    refresh_margin=settings.APP_TOKEN_REFRESH_MARGIN,
+    shared=shared_state,
+    name="tenant_token"
+)
+# Keyed by refresh token; Lark rotates refresh tokens, so only one upstream call per token may win.
+# Across workers the same holds through shared_state refresh leases
+refresh_coalescer = RequestCoalescer(
+    ttl=settings.REFRESH_RESULT_TTL,
+    max_entries=settings.REFRESH_RESULT_CACHE_SIZE
+)
+# Keyed by authorization code and OAuth state; Lark accepts a code once, so repeated callbacks from the
+# same browser share or replay the first exchange, and codes Lark rejected are answered from the cache
+login_coalescer = RequestCoalescer(
+    ttl=settings.LOGIN_RESULT_TTL,
+    max_entries=settings.LOGIN_RESULT_CACHE_SIZE,
+    error_ttl=settings.LOGIN_REJECTED_TTL,
+    cache_error=lambda e: isinstance(e, CodeRejectedError)
+)
+# One breaker for every Lark endpoint: they share a host, so they degrade together
+lark_breaker = CircuitBreaker(
+    failure_rate=settings.LARK_BREAKER_FAILURE_RATE,
+    minimum_calls=settings.LARK_BREAKER_MIN_CALLS,
+    window=settings.LARK_BREAKER_WINDOW,
+    reset_timeout=settings.LARK_BREAKER_RESET_TIMEOUT
+)
+lark_retry_policy = RetryPolicy(
+    attempts=settings.LARK_RETRY_ATTEMPTS,
+    base_delay=settings.LARK_RETRY_BASE_DELAY,
+    max_delay=settings.LARK_RETRY_MAX_DELAY,
+    deadline=settings.LARK_CALL_DEADLINE
+)
+# Every attempt of every Lark API call takes a slot; waiting counts against LARK_CALL_DEADLINE
+lark_scheduler = OutboundScheduler(
+    rate=settings.LARK_RATE_LIMIT,
+    burst=settings.LARK_RATE_BURST,
+    max_concurrency=settings.LARK_MAX_CONCURRENCY,
+    min_concurrency=settings.LARK_MIN_CONCURRENCY
+)
+
+
+async def _request_json(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    method: str,
+    url: str,
+    idempotent: bool = True,
+    **kwargs: Any
+) -> Dict[str, Any]:
+    """Send a request to the Lark API and return the decoded JSON body.
+
+    The call runs within ``LARK_CALL_DEADLINE`` and goes through the circuit
+    breaker. Each attempt waits for a slot from the outbound scheduler at the
+    priority set with ``lark_priority``. Failures are retried with jittered
+    backoff; calls that are not ``idempotent`` are only retried when the
+    request was never sent. Records latency, retries and errors under
+    ``endpoint`` in the upstream metrics.
+    """
+    def on_retry(error: httpx.HTTPError) -> None:
+        lark_upstream_retries.inc(endpoint)
+        logger.warning("Retrying Lark API call {} after {!r}", endpoint, error)
+
+    async def send() -> httpx.Response:
+        async with lark_scheduler.slot() as waited:
+            lark_outbound_wait.observe(waited, PRIORITY_NAMES[current_priority()])
+            response = await client.request(method, url, **kwargs)
+        lark_scheduler.record(response)
+        return response
+
+    start = time.perf_counter()
+    try:
+        response = await send_with_resilience(
+            send,
+            lark_breaker,
+            lark_retry_policy,
+            idempotent,
+            on_retry
+        )
+        data = response.json()
+    except CircuitOpenError as e:
+        lark_upstream_errors.inc(endpoint, "circuit_open")
+        audit_log.emit("upstream_error", endpoint=endpoint, kind="circuit_open")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Lark API is temporarily unavailable",
+            headers={"Retry-After": str(max(int(e.retry_after), 1))}
+        )
+    except httpx.HTTPError as e:
+        lark_upstream_errors.inc(endpoint, "http")
+        audit_log.emit("upstream_error", endpoint=endpoint, kind="http", error=type(e).__name__)
+        raise
+    finally:
+        lark_upstream_duration.observe(time.perf_counter() - start, endpoint)
+    if data.get("code") != 0:
+        lark_upstream_errors.inc(endpoint, "api")
+        audit_log.emit("upstream_error", endpoint=endpoint, kind="api", code=data.get("code"), msg=data.get("msg"))
+    return data
+
+
+async def _fetch_app_access_token(client: httpx.AsyncClient) -> Tuple[str, int]:
+    """Request a new app access token from Lark and return it with its lifetime in seconds."""
     try:
         url = f"{settings.LARK_API_BASE_URL}/auth/v3/app_access_token/internal"
         payload = {
@@ -17,25 +146,27 @@ async def get_app_access_token() -> str:
             "app_secret": settings.LARK_APP_SECRET
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
+        # Every caller waits on the renewal, whatever priority happened to trigger it
+        with lark_priority(INTERACTIVE):
+            data = await _request_json(client, "app_access_token", "POST", url, json=payload)
+        
+        if data.get("code") != 0:
+            logger.error(f"Failed to get app access token: {data.get('msg')}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Failed to get app access token: {data.get('msg')}"
+            )
             
-            if data.get("code") != 0:
-                logger.error(f"Failed to get app access token: {data.get('msg')}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Failed to get app access token: {data.get('msg')}"
-                )
-                
-            return data.get("app_access_token")
+        return data.get("app_access_token"), data.get("expire", 7200)
     except httpx.HTTPError as e:
         logger.error(f"HTTP error occurred: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Failed to communicate with Lark API"
         )
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
     except Exception as e:
         logger.error(f"Unexpected error occurred: {str(e)}")
         raise HTTPException(
@@ -44,10 +175,129 @@ async def get_app_access_token() -> str:
         )
 
 
-async def get_user_access_token(code: str) -> Dict[str, Any]:
+async def get_app_access_token(client: Optional[httpx.AsyncClient] = None) -> str:
+    """Get an app access token from Lark, served from the in-process cache while fresh."""
+    client = client or get_http_client()
+    return await app_token_cache.get(partial(_fetch_app_access_token, client))
+
+
+async def _fetch_tenant_access_token(client: httpx.AsyncClient) -> Tuple[str, int]:
+    """Request a new tenant access token from Lark and return it with its lifetime in seconds."""
+    try:
+        url = f"{settings.LARK_API_BASE_URL}/auth/v3/tenant_access_token/internal"
+        payload = {
+            "app_id": settings.LARK_APP_ID,
+            "app_secret": settings.LARK_APP_SECRET
+        }
+
+        with lark_priority(INTERACTIVE):
+            data = await _request_json(client, "tenant_access_token", "POST", url, json=payload)
+
+        if data.get("code") != 0:
+            logger.error(f"Failed to get tenant access token: {data.get('msg')}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Failed to get tenant access token: {data.get('msg')}"
+            )
+
+        return data.get("tenant_access_token"), data.get("expire", 7200)
+    except httpx.HTTPError as e:
+        logger.error(f"HTTP error occurred: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to communicate with Lark API"
+        )
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error occurred: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+
+async def get_tenant_access_token(client: Optional[httpx.AsyncClient] = None) -> str:
+    """Get a tenant access token from Lark, served from the in-process cache while fresh."""
+    client = client or get_http_client()
+    return await tenant_token_cache.get(partial(_fetch_tenant_access_token, client))
+
+
+async def _get_contact_page(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    path: str,
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Get one page of a paginated contact API listing: ``items``, ``has_more`` and ``page_token``."""
+    try:
+        tenant_access_token = await get_tenant_access_token(client)
+        url = f"{settings.LARK_API_BASE_URL}/contact/v3/{path}"
+        headers = {"Authorization": f"Bearer {tenant_access_token}"}
+
+        data = await _request_json(client, endpoint, "GET", url, headers=headers, params=params)
+
+        if data.get("code") != 0:
+            logger.error(f"Failed to list {endpoint}: {data.get('msg')}")
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Failed to list {endpoint}: {data.get('msg')}"
+            )
+
+        return data.get("data", {})
+    except httpx.HTTPError as e:
+        logger.error(f"HTTP error occurred: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to communicate with Lark API"
+        )
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error occurred: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+
+async def list_departments_page(
+    page_token: Optional[str] = None,
+    page_size: int = 50,
+    client: Optional[httpx.AsyncClient] = None
+) -> Dict[str, Any]:
+    """Get one page of all departments below the organization root."""
+    params = {"department_id_type": "open_department_id", "fetch_child": "true", "page_size": page_size}
+    if page_token:
+        params["page_token"] = page_token
+    return await _get_contact_page(client or get_http_client(), "departments", "departments/0/children", params)
+
+
+async def list_department_users_page(
+    department_id: str,
+    page_token: Optional[str] = None,
+    page_size: int = 50,
+    client: Optional[httpx.AsyncClient] = None
+) -> Dict[str, Any]:
+    """Get one page of the users directly in a department ("0" is the root)."""
+    params = {
+        "department_id": department_id,
+        "department_id_type": "open_department_id",
+        "user_id_type": "open_id",
+        "page_size": page_size
+    }
+    if page_token:
+        params["page_token"] = page_token
+    return await _get_contact_page(client or get_http_client(), "department_users", "users/find_by_department", params)
+
+
+async def get_user_access_token(code: str, client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
     """Exchange authorization code for user access token."""
+    client = client or get_http_client()
     try:
-        app_access_token = await get_app_access_token()
+        app_access_token = await get_app_access_token(client)
         url = f"{settings.LARK_API_BASE_URL}/authen/v1/oidc/access_token"
         headers = {"Authorization": f"Bearer {app_access_token}"}
         payload = {
@@ -55,28 +305,33 @@ async def get_user_access_token(code: str) -> Dict[str, Any]:
             "code": code
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") != 0:
-                logger.error(f"Failed to get user access token: {data.get('msg')}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Failed to get user access token: {data.get('msg')}"
-                )
-            
-            token_data = data.get("data", {})
-            # Calculate expiration times
-            now = datetime.now()
-            expires_in = token_data.get("expires_in", 7200)
-            refresh_expires_in = token_data.get("refresh_expires_in", 2592000)
-            
-            token_data["expires_at"] = now + timedelta(seconds=expires_in)
-            token_data["refresh_expires_at"] = now + timedelta(seconds=refresh_expires_in)
-            
-            return token_data
+        data = await _request_json(
+            client, "oidc_access_token", "POST", url, idempotent=False, headers=headers, json=payload
+        )
+        
+        if data.get("code") in REJECTED_CODE_ERRORS:
+            logger.error(f"Lark rejected the authorization code: {data.get('msg')}")
+            raise CodeRejectedError(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Failed to get user access token: {data.get('msg')}"
+            )
+        if data.get("code") != 0:
+            logger.error(f"Failed to get user access token: {data.get('msg')}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Failed to get user access token: {data.get('msg')}"
+            )
+        
+        token_data = data.get("data", {})
+        # Calculate expiration times
+        now = datetime.now()
+        expires_in = token_data.get("expires_in", 7200)
+        refresh_expires_in = token_data.get("refresh_expires_in", 2592000)
+        
+        token_data["expires_at"] = now + timedelta(seconds=expires_in)
+        token_data["refresh_expires_at"] = now + timedelta(seconds=refresh_expires_in)
+        
+        return token_data
     except httpx.HTTPError as e:
         logger.error(f"HTTP error occurred: {str(e)}")
         raise HTTPException(
@@ -94,25 +349,23 @@ async def get_user_access_token(code: str) -> Dict[str, Any]:
         )
 
 
-async def get_user_info(access_token: str) -> Dict[str, Any]:
+async def get_user_info(access_token: str, client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
     """Get user information using the access token."""
+    client = client or get_http_client()
     try:
         url = f"{settings.LARK_API_BASE_URL}/authen/v1/user_info"
         headers = {"Authorization": f"Bearer {access_token}"}
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") != 0:
-                logger.error(f"Failed to get user info: {data.get('msg')}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Failed to get user info: {data.get('msg')}"
-                )
-            
-            return data.get("data", {})
+        data = await _request_json(client, "user_info", "GET", url, headers=headers)
+        
+        if data.get("code") != 0:
+            logger.error(f"Failed to get user info: {data.get('msg')}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Failed to get user info: {data.get('msg')}"
+            )
+        
+        return data.get("data", {})
     except httpx.HTTPError as e:
         logger.error(f"HTTP error occurred: {str(e)}")
         raise HTTPException(
@@ -130,10 +383,59 @@ async def get_user_info(access_token: str) -> Dict[str, Any]:
         )
 
 
-async def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
-    """Refresh the access token using a refresh token."""
+async def refresh_access_token(refresh_token: str, client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
+    """Refresh the access token using a refresh token.
+
+    Concurrent refreshes of the same refresh token share one upstream call,
+    and its result is replayed for REFRESH_RESULT_TTL seconds afterwards.
+    """
+    client = client or get_http_client()
+    return await refresh_coalescer.run(refresh_token, partial(_refresh_with_lease, refresh_token, client))
+
+
+async def _refresh_with_lease(refresh_token: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+    """Refresh under the cross-worker lease on ``refresh_token`` when SHARED_STATE_DIR is set.
+
+    A worker that waited for the lease replays the holder's result instead
+    of sending the already rotated refresh token to Lark.
+    """
+    if shared_state is None:
+        return await _refresh_access_token(refresh_token, client)
     try:
-        app_access_token = await get_app_access_token()
+        async with shared_state.refresh_lease(refresh_token) as lease:
+            if lease.result is not None:
+                return _decode_token_data(lease.result)
+            token_data = await _refresh_access_token(refresh_token, client)
+            lease.publish(_encode_token_data(token_data))
+            return token_data
+    except SharedStateTimeout as e:
+        logger.error(f"Token refresh lease not acquired: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Token refresh already in progress"
+        )
+
+
+def _encode_token_data(token_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **token_data,
+        "expires_at": token_data["expires_at"].timestamp(),
+        "refresh_expires_at": token_data["refresh_expires_at"].timestamp()
+    }
+
+
+def _decode_token_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **data,
+        "expires_at": datetime.fromtimestamp(data["expires_at"]),
+        "refresh_expires_at": datetime.fromtimestamp(data["refresh_expires_at"])
+    }
+
+
+async def _refresh_access_token(refresh_token: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+    """Call Lark to exchange a refresh token for a new access token."""
+    try:
+        app_access_token = await get_app_access_token(client)
         url = f"{settings.LARK_API_BASE_URL}/authen/v1/oidc/refresh_access_token"
         headers = {"Authorization": f"Bearer {app_access_token}"}
         payload = {
@@ -141,28 +443,28 @@ async def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
             "refresh_token": refresh_token
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") != 0:
-                logger.error(f"Failed to refresh token: {data.get('msg')}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Failed to refresh token: {data.get('msg')}"
-                )
-            
-            token_data = data.get("data", {})
-            # Calculate expiration times
-            now = datetime.now()
-            expires_in = token_data.get("expires_in", 7200)
-            refresh_expires_in = token_data.get("refresh_expires_in", 2592000)
-            
-            token_data["expires_at"] = now + timedelta(seconds=expires_in)
-            token_data["refresh_expires_at"] = now + timedelta(seconds=refresh_expires_in)
-            
-            return token_data
+        with lark_priority(REFRESH):
+            data = await _request_json(
+                client, "oidc_refresh_access_token", "POST", url, idempotent=False, headers=headers, json=payload
+            )
+        
+        if data.get("code") != 0:
+            logger.error(f"Failed to refresh token: {data.get('msg')}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Failed to refresh token: {data.get('msg')}"
+            )
+        
+        token_data = data.get("data", {})
+        # Calculate expiration times
+        now = datetime.now()
+        expires_in = token_data.get("expires_in", 7200)
+        refresh_expires_in = token_data.get("refresh_expires_in", 2592000)
+        
+        token_data["expires_at"] = now + timedelta(seconds=expires_in)
+        token_data["refresh_expires_at"] = now + timedelta(seconds=refresh_expires_in)
+        
+        return token_data
     except httpx.HTTPError as e:
         logger.error(f"HTTP error occurred: {str(e)}")
         raise HTTPException(
@@ -180,71 +482,76 @@ async def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
         )
 
 
-async def create_or_update_user(user_info: Dict[str, Any], token_data: Dict[str, Any]) -> Dict[str, Any]:
+async def upsert_user(user_info: Dict[str, Any], storage: Optional[Storage] = None) -> Tuple[User, str]:
+    """Create or update the user described by Lark user info, matched by open_id.
+
+    Returns the stored user and what happened to it: "created", "updated",
+    or "unchanged" when its profile already matched and nothing was written.
+    """
+    storage = storage or get_storage()
+    # Extract required fields from user_info
+    required_fields = ["open_id", "union_id", "name"]
+    for field in required_fields:
+        if field not in user_info:
+            logger.error(f"Missing required field: {field}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Missing required user information: {field}"
+            )
+
+    # Check if user exists by open_id
+    existing_user = await storage.get_user_by_open_id(user_info["open_id"])
+
+    if existing_user:
+        profile = {
+            "name": user_info["name"],
+            "email": user_info.get("email"),
+            "avatar_url": user_info.get("avatar_url")
+        }
+        if all(getattr(existing_user, key) == value for key, value in profile.items()):
+            return existing_user, "unchanged"
+        # Update existing user
+        user = existing_user.model_copy(update={**profile, "updated_at": datetime.now()})
+        outcome = "updated"
+    else:
+        # Create new user
+        user = User(
+            name=user_info["name"],
+            email=user_info.get("email"),
+            open_id=user_info["open_id"],
+            union_id=user_info["union_id"],
+            avatar_url=user_info.get("avatar_url")
+        )
+        outcome = "created"
+
+    stored_id = await storage.save_user(user)
+    if stored_id != user.id:
+        # Another worker created this user first and ours was merged into it
+        user = await storage.get_user(stored_id)
+        outcome = "updated"
+    user_response_cache.delete(user.id)
+    return user, outcome
+
+
+async def create_or_update_user(
+    user_info: Dict[str, Any],
+    token_data: Dict[str, Any],
+    storage: Optional[Storage] = None
+) -> UserResponse:
     """Create or update a user and their authentication information."""
+    storage = storage or get_storage()
     try:
-        # Extract required fields from user_info
-        required_fields = ["open_id", "union_id", "name"]
-        for field in required_fields:
-            if field not in user_info:
-                logger.error(f"Missing required field: {field}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Missing required user information: {field}"
-                )
-        
-        # Check if user exists by open_id
-        existing_user = None
-        for user in users_db.values():
-            if user.open_id == user_info["open_id"]:
-                existing_user = user
-                break
-        
-        if existing_user:
-            # Update existing user
-            user_id = existing_user.id
-            user_data = {
-                **existing_user.dict(),
-                "name": user_info["name"],
-                "email": user_info.get("email"),
-                "avatar_url": user_info.get("avatar_url"),
-                "updated_at": datetime.now()
-            }
-            users_db[user_id] = User(**user_data)
-        else:
-            # Create new user
-            user = User(
-                name=user_info["name"],
-                email=user_info.get("email"),
-                open_id=user_info["open_id"],
-                union_id=user_info["union_id"],
-                avatar_url=user_info.get("avatar_url")
-            )
-            user_id = user.id
-            users_db[user_id] = user
+        user, _ = await upsert_user(user_info, storage)
+        user_id = user.id
         
         # Create or update user auth
-        auth = UserAuth(
-            user_id=user_id,
-            access_token=token_data["access_token"],
-            token_type=token_data.get("token_type", "Bearer"),
-            refresh_token=token_data["refresh_token"],
-            expires_at=token_data["expires_at"],
-            refresh_expires_at=token_data["refresh_expires_at"]
-        )
-        auth_db[user_id] = auth
+        auth = _build_user_auth(user_id, token_data)
+        await storage.save_auth(auth)
+        user_response_cache.delete(user_id)
+        refresh_scheduler.schedule(user_id, auth.expires_at)
         
         # Return user data and token information
-        return {
-            "user": users_db[user_id].dict(),
-            "auth": {
-                "access_token": auth.access_token,
-                "token_type": auth.token_type,
-                "refresh_token": auth.refresh_token,
-                "expires_at": auth.expires_at.isoformat(),
-                "refresh_expires_at": auth.refresh_expires_at.isoformat()
-            }
-        }
+        return UserResponse.from_records(user, auth)
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
@@ -253,4 +560,158 @@ async def create_or_update_user(user_info: Dict[str, Any], token_data: Dict[str,
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process user information"
-        ) 
\ No newline at end of file
+        )
+
+
+async def complete_login(
+    code: str,
+    client: Optional[httpx.AsyncClient] = None,
+    storage: Optional[Storage] = None,
+    state: Optional[str] = None
+) -> Tuple[UserResponse, bool]:
+    """Exchange an authorization code and store the user and session.
+
+    ``state`` is the OAuth state bound to the caller's browser. Concurrent
+    calls with the same code and state share one exchange, and its result
+    is replayed for LOGIN_RESULT_TTL seconds; a code Lark rejected fails
+    the same way for LOGIN_REJECTED_TTL seconds. Without a state every call
+    goes to Lark, since anyone who learned the code would get the session.
+    Returns the result and whether it was shared or replayed rather than
+    produced by this call.
+    """
+    performed = False
+
+    async def login() -> UserResponse:
+        nonlocal performed
+        performed = True
+        return await _complete_login(code, client or get_http_client(), storage or get_storage())
+
+    if state is None:
+        return await login(), False
+    result = await login_coalescer.run((code, state), login)
+    return result, not performed
+
+
+async def _complete_login(code: str, client: httpx.AsyncClient, storage: Storage) -> UserResponse:
+    """Run the login callback's upstream calls, recording each stage's latency."""
+    start = stage_start = time.perf_counter()
+
+    def end_stage(stage: str) -> None:
+        nonlocal stage_start
+        now = time.perf_counter()
+        lark_login_stage_duration.observe(now - stage_start, stage)
+        stage_start = now
+
+    # Cached unless due for renewal; fetched here so its latency is its own stage
+    await get_app_access_token(client)
+    end_stage("app_token")
+
+    token_data = await get_user_access_token(code, client)
+    end_stage("code_exchange")
+    if not token_data or "access_token" not in token_data:
+        logger.error("Failed to get access token")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Failed to get access token"
+        )
+
+    user_info = await get_user_info(token_data["access_token"], client)
+    end_stage("user_info")
+    if not user_info:
+        logger.error("Failed to get user info")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Failed to get user info"
+        )
+
+    result = await create_or_update_user(user_info, token_data, storage)
+    end_stage("store")
+    lark_login_stage_duration.observe(time.perf_counter() - start, "total")
+    return result
+
+
+async def refresh_user_session(
+    user_id: str,
+    storage: Optional[Storage] = None,
+    client: Optional[httpx.AsyncClient] = None
+) -> Optional[UserAuth]:
+    """Refresh a stored session and write the rotated tokens back to storage.
+
+    Returns None if the user has no session or its refresh token has expired,
+    and the stored session untouched if its access token is not due yet.
+    """
+    storage = storage or get_storage()
+    auth = await storage.get_auth(user_id)
+    if auth is None or auth.refresh_expires_at <= datetime.now():
+        return None
+    # Schedulers fire at most margin + jitter before the expiry they know of; a later stored expiry
+    # means another worker sharing the store refreshed the session since
+    not_due = timedelta(seconds=refresh_scheduler.margin + refresh_scheduler.jitter)
+    if auth.expires_at - datetime.now() > not_due:
+        return auth
+
+    try:
+        token_data = await refresh_access_token(auth.refresh_token, client)
+    except HTTPException as e:
+        audit_log.emit(
+            "refresh", outcome="failure", user_id=user_id, source="scheduler", status=e.status_code, reason=e.detail
+        )
+        raise
+    new_auth = _build_user_auth(user_id, token_data)
+    await storage.save_auth(new_auth)
+    user_response_cache.delete(user_id)
+    audit_log.emit("refresh", outcome="success", user_id=user_id, source="scheduler")
+    return new_auth
+
+
+async def save_refreshed_session(
+    refresh_token: str,
+    token_data: Dict[str, Any],
+    storage: Optional[Storage] = None
+) -> Optional[UserAuth]:
+    """Write tokens obtained with ``refresh_token`` back to the session that held it.
+
+    Returns None if no stored session holds the refresh token, e.g. when a
+    concurrent refresh of the same token already wrote the rotated tokens.
+    """
+    storage = storage or get_storage()
+    auth = await storage.get_auth_by_refresh_token(refresh_token)
+    if auth is None:
+        return None
+
+    new_auth = _build_user_auth(auth.user_id, token_data)
+    await storage.save_auth(new_auth)
+    user_response_cache.delete(auth.user_id)
+    refresh_scheduler.schedule(auth.user_id, new_auth.expires_at)
+    return new_auth
+
+
+async def introspect_access_tokens(
+    access_tokens: Sequence[str],
+    storage: Optional[Storage] = None
+) -> List[TokenIntrospection]:
+    """Report, for each access token, whether it belongs to an unexpired stored session."""
+    storage = storage or get_storage()
+    owners = await storage.get_access_token_owners(list(dict.fromkeys(access_tokens)))
+    now = datetime.now()
+    inactive = TokenIntrospection.model_construct(active=False)
+    results = []
+    for token in access_tokens:
+        owner = owners.get(token)
+        if owner is None or owner[1] <= now:
+            results.append(inactive)
+        else:
+            results.append(TokenIntrospection.model_construct(active=True, user_id=owner[0], expires_at=owner[1]))
+    return results
+
+
+def _build_user_auth(user_id: str, token_data: Dict[str, Any]) -> UserAuth:
+    """Build the stored auth record from Lark token data."""
+    return UserAuth(
+        user_id=user_id,
+        access_token=token_data["access_token"],
+        token_type=token_data.get("token_type", "Bearer"),
+        refresh_token=token_data["refresh_token"],
+        expires_at=token_data["expires_at"],
+        refresh_expires_at=token_data["refresh_expires_at"]
+    )
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Speculative warm-up of the login callback's upstream path.
+
+Serving the login redirect starts a background task that renews the app
+access token if it is due and opens a connection to the Lark hosts the
+callback calls, so the callback that follows a few seconds later finds both
+ready. A host is warmed at most once per ``interval`` seconds, which should
+stay below HTTP_KEEPALIVE_EXPIRY so the connection is still pooled when the
+callback arrives.
+"""
+
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.logger import logger
+from app.core.metrics import lark_login_warmups
+from app.services.lark_service import app_token_cache, get_app_access_token
+
+
+NEVER = float("-inf")
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class LoginWarmup:
+    """Prepare the app token and pooled connections for an upcoming login callback."""
+
+    def __init__(self, hosts: Iterable[str], interval: float):
+        # Origins as scheme://host[:port]
+        self.hosts = sorted(set(hosts))
+        self.interval = interval
+        self._warmed_at: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, client: httpx.AsyncClient) -> None:
+        """Start a warm-up in the background unless nothing needs warming."""
+        now = time.monotonic()
+        if app_token_cache.is_fresh() and all(now - self._warmed_at.get(host, NEVER) < self.interval
+                                              for host in self.hosts):
+            return
+        task = asyncio.create_task(self.run(client))
+        # Keep a reference until done so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(self, client: Optional[httpx.AsyncClient] = None) -> None:
+        """Renew the app token if due and open a connection to every host not warmed recently."""
+        client = client or get_http_client()
+        started = time.monotonic()
+        # Claim the hosts first so concurrent redirects don't warm them again
+        hosts = [host for host in self.hosts if started - self._warmed_at.get(host, NEVER) >= self.interval]
+        for host in hosts:
+            self._warmed_at[host] = started
+        try:
+            if not app_token_cache.is_fresh():
+                await get_app_access_token(client)
+                lark_login_warmups.inc("app_token")
+                # The renewal already opened a connection to the API host
+                hosts = [host for host in hosts if host != _origin(settings.LARK_API_BASE_URL)]
+            await asyncio.gather(*(self._connect(client, host) for host in hosts))
+        except Exception as e:
+            logger.debug("Login warm-up failed: {!r}", e)
+
+    async def _connect(self, client: httpx.AsyncClient, host: str) -> None:
+        # Any response leaves the connection in the pool; the status does not matter
+        try:
+            await client.head(host + "/")
+            lark_login_warmups.inc("connection")
+        except httpx.HTTPError as e:
+            self._warmed_at.pop(host, None)
+            logger.debug("Login warm-up of {} failed: {!r}", host, e)
+
+
+# The callback exchanges the code and reads the user on the API host; the auth host only serves the browser
+login_warmup = LoginWarmup(
+    hosts=[_origin(settings.LARK_API_BASE_URL)],
+    interval=settings.LOGIN_WARMUP_INTERVAL
+)
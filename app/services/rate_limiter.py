@@ -0,0 +1,173 @@
+"""
+Outbound scheduler for Lark API calls: a token bucket, an adaptive
+concurrency limit and priority classes.
+
+Every attempt takes a slot before it is sent. Slots are handed out in
+priority order, so interactive logins go ahead of session refreshes and
+those ahead of background jobs. The priority of a call is read from a
+context variable set with ``lark_priority``; tasks inherit it from the
+code that created them. The concurrency limit grows by one every
+``limit`` successful calls and halves when Lark answers 429, pausing all
+calls for the ``Retry-After`` it sends (AIMD).
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+import httpx
+
+from app.core.logger import logger
+
+INTERACTIVE = 0
+REFRESH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = ("interactive", "refresh", "background")
+
+# Longest Retry-After honored, so a bogus header can't stall every call
+MAX_PAUSE = 60.0
+
+_priority: ContextVar[int] = ContextVar("lark_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def lark_priority(priority: int) -> Iterator[None]:
+    """Send the Lark API calls made within the block, and by tasks created in it, at ``priority``."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Priority at which Lark API calls are sent from the current context."""
+    return _priority.get()
+
+
+def _retry_after(response: httpx.Response) -> float:
+    # Lark sends x-ogw-ratelimit-reset; plain HTTP servers send Retry-After
+    for header in ("x-ogw-ratelimit-reset", "retry-after"):
+        value = response.headers.get(header)
+        if value is not None:
+            try:
+                return min(max(float(value), 0.0), MAX_PAUSE)
+            except ValueError:
+                pass
+    return 1.0
+
+
+class OutboundScheduler:
+    """Admit upstream calls within a rate and an adaptive concurrency limit, highest priority first."""
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int, min_concurrency: int = 1,
+                 decrease_interval: float = 1.0):
+        # rate 0 disables the token bucket
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(min(min_concurrency, max_concurrency), 1)
+        self.decrease_interval = decrease_interval
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self.rate_limited = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._waiters: List[Deque[asyncio.Future]] = [deque() for _ in PRIORITY_NAMES]
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    def queue_depth(self) -> Dict[str, int]:
+        """Calls waiting for a slot, by priority name."""
+        return {
+            name: sum(not waiter.done() for waiter in waiters)
+            for name, waiters in zip(PRIORITY_NAMES, self._waiters)
+        }
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """Wait for a slot at the current priority and yield the seconds spent waiting."""
+        priority = _priority.get()
+        start = time.perf_counter()
+        # Skip the queue only when nobody of the same or a higher priority is waiting
+        if not any(self._waiters[:priority + 1]) and self._try_take():
+            self.active += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[priority].append(waiter)
+            self._dispatch()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just as the caller gave up: hand the slot on
+                    self.active -= 1
+                    self._dispatch()
+                elif waiter in self._waiters[priority]:
+                    self._waiters[priority].remove(waiter)
+                raise
+        try:
+            yield time.perf_counter() - start
+        finally:
+            self.active -= 1
+            self._dispatch()
+
+    def record(self, response: httpx.Response) -> None:
+        """Adapt the concurrency limit to the outcome of a call."""
+        if response.status_code == 429:
+            self.rate_limited += 1
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + _retry_after(response))
+            # One burst of 429s is one signal: halve at most once per interval
+            if now - self._decreased_at >= self.decrease_interval:
+                self._decreased_at = now
+                self.limit = max(self.limit / 2, self.min_concurrency)
+                logger.warning(f"Lark API rate limited, concurrency limit lowered to {int(self.limit)}")
+        elif self.limit < self.max_concurrency:
+            self.limit = min(self.limit + 1 / self.limit, self.max_concurrency)
+
+    def _try_take(self) -> bool:
+        if self.active >= int(self.limit):
+            return False
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        if not self.rate:
+            return True
+        self._tokens = min(self._tokens + (now - self._refilled_at) * self.rate, self.burst)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _dispatch(self) -> None:
+        for waiters in self._waiters:
+            while waiters:
+                if waiters[0].done():
+                    waiters.popleft()
+                    continue
+                if not self._try_take():
+                    self._schedule_wakeup()
+                    return
+                self.active += 1
+                waiters.popleft().set_result(None)
+
+    def _schedule_wakeup(self) -> None:
+        """Dispatch again once a token or the end of a pause may admit a waiter."""
+        if self._wakeup is not None or self.active >= int(self.limit):
+            # A finishing call dispatches again
+            return
+        now = time.monotonic()
+        delay = self._paused_until - now
+        if self.rate and self._tokens < 1:
+            delay = max(delay, (1 - self._tokens) / self.rate)
+        self._wakeup = asyncio.get_running_loop().call_later(max(delay, 0.0), self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.models import UserAuth
+
+SessionRefresher = Callable[[str], Awaitable[Optional[UserAuth]]]
+
+# Delay before retrying a session whose proactive refresh failed
+RETRY_DELAY = 30.0
+
+
+class RefreshScheduler:
+    """Refresh stored sessions shortly before their access tokens expire.
+
+    Sessions are kept in a min-heap ordered by refresh time, which is
+    ``margin`` seconds (minus random jitter) before ``expires_at``. A single
+    task sleeps until the earliest entry is due and hands due sessions to a
+    bounded number of concurrent refreshes. Rescheduling a session leaves its
+    old heap entry in place; stale entries are skipped when popped.
+    """
+
+    def __init__(self, margin: float, jitter: float, concurrency: int):
+        self.margin = margin
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.refreshed = 0
+        self.failed = 0
+        self._heap: List[Tuple[float, str, float]] = []
+        self._due: Dict[str, float] = {}
+        self._refresh: Optional[SessionRefresher] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def schedule(self, user_id: str, expires_at: datetime) -> None:
+        """Schedule a proactive refresh for a session, replacing any earlier schedule."""
+        if self._task is None:
+            return
+        expires_ts = expires_at.timestamp()
+        due = expires_ts - self.margin - random.uniform(0, self.jitter)
+        self._push(user_id, due, expires_ts)
+
+    async def start(self, refresh: SessionRefresher, sessions: Iterable[Tuple[str, datetime]] = ()) -> None:
+        """Start the scheduler loop and schedule the given ``(user_id, expires_at)`` sessions."""
+        self._refresh = refresh
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._task = asyncio.create_task(self._run())
+        for user_id, expires_at in sessions:
+            self.schedule(user_id, expires_at)
+        logger.info(f"Token refresh scheduler started with {len(self._due)} sessions")
+
+    async def stop(self) -> None:
+        """Cancel the scheduler loop and any refreshes still running."""
+        if self._task is None:
+            return
+        tasks = [self._task, *self._inflight]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._heap.clear()
+        self._due.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return scheduler counters."""
+        return {
+            "scheduled": len(self._due),
+            "inflight": len(self._inflight),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+        }
+
+    def _push(self, user_id: str, due: float, expires_ts: float) -> None:
+        self._due[user_id] = due
+        heapq.heappush(self._heap, (due, user_id, expires_ts))
+        if self._heap[0][1] == user_id:
+            # New earliest entry, wake the loop so it can shorten its sleep
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, user_id, expires_ts = heapq.heappop(self._heap)
+                if self._due.get(user_id) != due:
+                    continue
+                del self._due[user_id]
+                await self._semaphore.acquire()
+                task = asyncio.create_task(self._refresh_one(user_id, expires_ts))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh_one(self, user_id: str, expires_ts: float) -> None:
+        try:
+            auth = await self._refresh(user_id)
+            self.refreshed += 1
+            if auth is not None:
+                self.schedule(user_id, auth.expires_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Proactive token refresh failed for user {user_id}: {e!r}")
+            retry_at = time.time() + RETRY_DELAY
+            if retry_at < expires_ts and user_id not in self._due:
+                self._push(user_id, retry_at, expires_ts)
+        finally:
+            self._semaphore.release()
+
+
+refresh_scheduler = RefreshScheduler(
+    margin=settings.TOKEN_REFRESH_MARGIN,
+    jitter=settings.TOKEN_REFRESH_JITTER,
+    concurrency=settings.TOKEN_REFRESH_CONCURRENCY
+)
@@ -0,0 +1,182 @@
+"""
+Deadlines, retries and a circuit breaker for upstream Lark API calls.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+import httpx
+
+from app.core.logger import logger
+
+# Raised before the request reaches the network, so retrying can never duplicate it
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker rejects a call without sending it."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fail fast once the upstream error rate crosses a threshold.
+
+    Outcomes are tracked over a rolling time window. When at least
+    ``minimum_calls`` calls in the window failed at ``failure_rate`` or more,
+    the circuit opens and rejects calls for ``reset_timeout`` seconds. It then
+    half-opens and lets one probe call through: success closes the circuit,
+    failure opens it again.
+
+    Every state change, and every probe, starts a new generation. check()
+    returns the generation a call starts in; record() ignores outcomes of
+    calls from an earlier generation, so a slow call sent while the circuit
+    was closed can't close or reopen it later.
+    """
+
+    def __init__(self, failure_rate: float, minimum_calls: int, window: float, reset_timeout: float):
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+        self.generation = 0
+
+    def check(self) -> int:
+        """Raise CircuitOpenError if a call may not be sent right now, else return the call's generation."""
+        if self.state == CLOSED:
+            return self.generation
+        now = time.monotonic()
+        if self.state == OPEN:
+            retry_after = self._opened_at + self.reset_timeout - now
+            if retry_after > 0:
+                raise CircuitOpenError(retry_after)
+            self._reset(HALF_OPEN)
+        # Half-open: a single probe at a time; a probe that never reported back is replaced after reset_timeout
+        if self._probe_started_at is not None and now - self._probe_started_at < self.reset_timeout:
+            raise CircuitOpenError(self.reset_timeout)
+        self._probe_started_at = now
+        # Only the latest probe decides; a replaced one reports a stale generation
+        self.generation += 1
+        return self.generation
+
+    def record(self, success: bool, generation: int) -> None:
+        """Record the outcome of a call that check() allowed in ``generation``."""
+        if generation != self.generation:
+            return
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            if success:
+                logger.info("Circuit breaker closed, Lark API recovered")
+                self._reset(CLOSED)
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, success))
+        self._failures += not success
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, expired_success = self._outcomes.popleft()
+            self._failures -= not expired_success
+
+        calls = len(self._outcomes)
+        if self.state == CLOSED and calls >= self.minimum_calls and self._failures / calls >= self.failure_rate:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        logger.warning(f"Circuit breaker opened, failing Lark API calls fast for {self.reset_timeout}s")
+        self._reset(OPEN)
+        self._opened_at = now
+
+    def _reset(self, state: str) -> None:
+        self.state = state
+        self.generation += 1
+        self._outcomes.clear()
+        self._failures = 0
+        self._probe_started_at = None
+
+
+class RetryPolicy:
+    """Retry budget for one logical upstream call."""
+
+    def __init__(self, attempts: int, base_delay: float, max_delay: float, deadline: float):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given zero-based attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def is_retryable(error: httpx.HTTPError, idempotent: bool) -> bool:
+    """Whether a failed call may be sent again."""
+    if isinstance(error, NOT_SENT_ERRORS):
+        return True
+    # Rate limited requests are rejected before they are processed
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        return True
+    if not idempotent:
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+def is_upstream_failure(error: httpx.HTTPError) -> bool:
+    """Whether an error says the upstream is unhealthy (as opposed to rejecting the request)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+async def send_with_resilience(
+    send: Callable[[], Awaitable[httpx.Response]],
+    breaker: CircuitBreaker,
+    policy: RetryPolicy,
+    idempotent: bool,
+    on_retry: Optional[Callable[[httpx.HTTPError], None]] = None
+) -> httpx.Response:
+    """Send a request within the policy's deadline, retrying failures that are safe to retry.
+
+    Raises CircuitOpenError when the breaker rejects the call, or the last
+    httpx error once retries or the deadline are exhausted.
+    """
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        generation = breaker.check()
+        try:
+            response = await asyncio.wait_for(send(), max(deadline - time.monotonic(), 0))
+            response.raise_for_status()
+            breaker.record(True, generation)
+            return response
+        except asyncio.TimeoutError:
+            error: httpx.HTTPError = httpx.TimeoutException("Lark API call deadline exceeded")
+        except httpx.HTTPError as e:
+            error = e
+        breaker.record(not is_upstream_failure(error), generation)
+
+        attempt += 1
+        delay = policy.backoff(attempt - 1)
+        if attempt >= policy.attempts or not is_retryable(error, idempotent) or time.monotonic() + delay >= deadline:
+            raise error
+        if on_retry is not None:
+            on_retry(error)
+        await asyncio.sleep(delay)
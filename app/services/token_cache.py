@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.logger import logger
+from app.core.shared_state import SharedState
+
+
+TokenFetcher = Callable[[], Awaitable[Tuple[str, int]]]
+
+
+class AppTokenCache:
+    """In-process cache for a Lark app-level access token (app or tenant).
+
+    The token is renewed ``refresh_margin`` seconds before the ``expire`` value
+    returned by Lark, and concurrent callers that miss the cache share a single
+    in-flight renewal instead of each calling Lark. With ``shared`` set, a
+    renewal first adopts the token another worker published and otherwise
+    renews under the shared lock, so the workers of a host share one token.
+    ``name`` identifies the token in the shared state and in log messages.
+    """
+
+    def __init__(self, refresh_margin: float = 300.0, shared: Optional[SharedState] = None, name: str = "app_token"):
+        self.refresh_margin = refresh_margin
+        self.shared = shared
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.renewals = 0
+        self.adopted = 0
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._renewal: Optional[asyncio.Future] = None
+
+    def is_fresh(self) -> bool:
+        """Return True if the cached token is outside the renewal margin."""
+        return self._token is not None and time.monotonic() < self._expires_at - self.refresh_margin
+
+    async def get(self, fetch: TokenFetcher) -> str:
+        """Return the cached token, renewing it through ``fetch`` when needed."""
+        if self.is_fresh():
+            self.hits += 1
+            return self._token
+
+        self.misses += 1
+        if self._renewal is None:
+            self._renewal = asyncio.ensure_future(self._renew(fetch))
+            self._renewal.add_done_callback(self._consume_exception)
+        # Shield the shared renewal so one cancelled caller doesn't cancel it for everyone
+        return await asyncio.shield(self._renewal)
+
+    def invalidate(self) -> None:
+        """Drop the cached token so the next call fetches a new one."""
+        self._token = None
+        self._expires_at = 0.0
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses, "renewals": self.renewals, "adopted": self.adopted}
+
+    async def _renew(self, fetch: TokenFetcher) -> str:
+        try:
+            if self.shared is None:
+                token, expire = await self._fetch(fetch)
+            else:
+                token, expire = await self._renew_shared(fetch)
+            self._token = token
+            self._expires_at = time.monotonic() + expire
+            return token
+        finally:
+            self._renewal = None
+
+    async def _fetch(self, fetch: TokenFetcher) -> Tuple[str, float]:
+        token, expire = await fetch()
+        self.renewals += 1
+        logger.debug("{} renewed, expires in {}s", self.name, expire)
+        return token, expire
+
+    async def _renew_shared(self, fetch: TokenFetcher) -> Tuple[str, float]:
+        published = self._adopt()
+        if published is not None:
+            return published
+        async with self.shared.token_lock(self.name):
+            # Another worker may have renewed the token while we waited for the lock
+            published = self._adopt()
+            if published is not None:
+                return published
+            token, expire = await self._fetch(fetch)
+            self.shared.publish_token(self.name, token, time.time() + expire)
+            return token, expire
+
+    def _adopt(self) -> Optional[Tuple[str, float]]:
+        """Return the published token with its remaining lifetime, if it is outside the renewal margin."""
+        published = self.shared.read_token(self.name)
+        if published is None:
+            return None
+        token, expires_at = published
+        remaining = expires_at - time.time()
+        if remaining <= self.refresh_margin:
+            return None
+        self.adopted += 1
+        return token, remaining
+
+    @staticmethod
+    def _consume_exception(future: asyncio.Future) -> None:
+        # Avoid "exception was never retrieved" warnings when every waiter was cancelled
+        if not future.cancelled():
+            future.exception()
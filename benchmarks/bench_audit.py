@@ -0,0 +1,98 @@
+"""
+Cost of recording audit events on the request path: the ring buffer with
+batched segment flushes against appending each event to the file as it
+happens, on a fast disk and on one that stalls on every write. Also reports
+how fast events are read back from memory and from the segments.
+
+Usage: python -m benchmarks.bench_audit [--events 100000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+from benchmarks.common import print_table
+
+from app.core.audit import AuditCursor, AuditEvent, AuditLog
+
+FIELDS = {"outcome": "success", "user_id": "922277f2-ab7a-4b9c-a151-c619fdaf9a55", "ip": "10.0.0.1"}
+# Stall per write() on the slow disk, like a saturated or network-backed volume
+SLOW_WRITE_DELAY = 0.0005
+
+
+class SlowAuditLog(AuditLog):
+    def _write(self, events: List[AuditEvent]) -> None:
+        time.sleep(SLOW_WRITE_DELAY)
+        super()._write(events)
+
+
+async def write_per_event(path: str, events: int, delay: float) -> tuple:
+    """Append and flush each event before the request continues; return (µs per event, total seconds)."""
+    with open(path, "ab") as f:
+        start = time.perf_counter()
+        for seq in range(events):
+            if delay:
+                time.sleep(delay)
+            f.write(json.dumps({"seq": seq, "type": "login", **FIELDS}).encode() + b"\n")
+            f.flush()
+            if seq % 100 == 0:
+                await asyncio.sleep(0)
+        elapsed = time.perf_counter() - start
+    return elapsed / events * 1e6, elapsed
+
+
+async def buffered(audit: AuditLog, events: int) -> tuple:
+    """Emit through the ring buffer; return (µs per emit, total seconds until everything is on disk)."""
+    await audit.start()
+    start = time.perf_counter()
+    in_emit = 0.0
+    for i in range(events):
+        emit_start = time.perf_counter()
+        audit.emit("login", **FIELDS)
+        in_emit += time.perf_counter() - emit_start
+        if i % 100 == 0:
+            # Let the flush task run as it would between requests
+            await asyncio.sleep(0)
+    await audit.stop()
+    return in_emit / events * 1e6, time.perf_counter() - start
+
+
+def read_rate(audit: AuditLog, events: int) -> float:
+    start = time.perf_counter()
+    read = sum(chunk.count(b"\n") for chunk in audit.read(AuditCursor(), events))
+    return read / (time.perf_counter() - start)
+
+
+async def main(events: int):
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for label, delay, audit_class in [("fast disk", 0.0, AuditLog), ("slow disk", SLOW_WRITE_DELAY, SlowAuditLog)]:
+            per_event_us, per_event_s = await write_per_event(os.path.join(directory, f"{label}.ndjson"), events, delay)
+            rows.append([f"write + flush per event, {label}", f"{per_event_us:.2f}", f"{per_event_s:.2f}"])
+            audit = audit_class(os.path.join(directory, label), buffer_size=events, flush_interval=1.0,
+                                flush_batch=500, segment_bytes=16 * 1024 * 1024)
+            emit_us, total_s = await buffered(audit, events)
+            rows.append([f"ring buffer, {label}", f"{emit_us:.2f}", f"{total_s:.2f}"])
+
+        memory_rate = read_rate(audit, events)
+        # A restarted process has an empty buffer and reads the segments
+        restarted = AuditLog(os.path.join(directory, "slow disk"), buffer_size=10, flush_interval=1.0,
+                             flush_batch=500, segment_bytes=16 * 1024 * 1024)
+        await restarted.start()
+        disk_rate = read_rate(restarted, events)
+        await restarted.stop()
+
+    print(f"{events:,} events, slow disk stalls {SLOW_WRITE_DELAY * 1000:.1f} ms per write")
+    print_table(["path", "µs/event on request path", "seconds until on disk"], rows)
+    print(f"read back: {memory_rate:,.0f} events/s from the ring buffer, {disk_rate:,.0f} events/s from segments")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark audit event recording and reading")
+    parser.add_argument("--events", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.events))
@@ -0,0 +1,118 @@
+"""
+Cost of removing dead sessions from the in-memory store: the timing wheel
+visits only the expired sessions, a scan visits every session. Also reports what the
+least recently active bookkeeping adds to a session lookup when
+MEMORY_STORE_MAX_USERS is set, and that a capped store stays at its cap.
+
+Usage: python -m benchmarks.bench_eviction [--sizes 100000 1000000] [--expired 0.01]
+"""
+
+import argparse
+import asyncio
+import gc
+import time
+
+from benchmarks.common import print_table, time_per_call
+
+from app.core.models import SessionRecord, User
+from app.core.repository import UserRepository
+from app.core.storage import MemoryStorage
+
+
+def sessions(count: int, expired_share: float) -> dict:
+    """Build ``count`` sessions of which ``expired_share`` have an expired refresh token."""
+    now = int(time.time())
+    expired = int(count * expired_share)
+    auths = {}
+    for i in range(count):
+        refresh_expires_at = now - 3600 if i < expired else now + 86400
+        auths[f"id-{i}"] = SessionRecord(f"id-{i}", f"at-{i}", "Bearer", f"rt-{i}", now + 7200, refresh_expires_at)
+    return auths
+
+
+def scan_purge(auths: dict) -> int:
+    """Purge without an expiry index: visit every session."""
+    now = time.time()
+    expired = [user_id for user_id, record in auths.items() if record.refresh_expires_at <= now]
+    for user_id in expired:
+        del auths[user_id]
+    return len(expired)
+
+
+def timed(fn) -> float:
+    """Seconds ``fn`` takes, without a garbage collection of the freshly built store in the middle."""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = fn()
+        if asyncio.iscoroutine(result):
+            # Step the coroutine directly, so the event loop's overhead isn't counted
+            try:
+                result.send(None)
+            except StopIteration:
+                pass
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def purge_rows(sizes, expired_share: float) -> list:
+    rows = []
+    for size in sizes:
+        auths = sessions(size, expired_share)
+        purged = scan_purge(dict(auths))
+        scan_ms = timed(lambda: scan_purge(auths)) * 1000
+        # Most periodic runs find nothing expired
+        scan_idle_ms = timed(lambda: scan_purge(auths)) * 1000
+
+        memory = MemoryStorage(UserRepository({}), sessions(size, expired_share))
+        wheel_ms = timed(memory.purge_expired_sessions) * 1000
+        wheel_idle_us = timed(memory.purge_expired_sessions) * 1e6
+        rows.append([
+            f"{size:,}", f"{purged:,}", f"{scan_ms:.1f}", f"{wheel_ms:.1f}", f"{scan_idle_ms:.1f}", f"{wheel_idle_us:.0f}",
+        ])
+    return rows
+
+
+def cap_rows(loop, cap: int, iterations: int) -> list:
+    rows = []
+    for max_users in (0, cap):
+        memory = MemoryStorage(UserRepository({}), {}, max_users=max_users)
+        now = int(time.time())
+        for i in range(cap * 2):
+            user = User(id=f"id-{i}", name=f"User {i}", open_id=f"ou_{i}", union_id=f"on_{i}")
+            auth = SessionRecord(f"id-{i}", f"at-{i}", "Bearer", f"rt-{i}", now + 7200, now + 86400).to_model()
+            loop.run_until_complete(memory.save_user(user))
+            loop.run_until_complete(memory.save_auth(auth))
+        user_id = f"id-{cap * 2 - 1}"
+        lookup_us = time_per_call(lambda: loop.run_until_complete(memory.get_auth(user_id)), iterations)
+        stats = memory.eviction_stats()
+        rows.append([
+            max_users or "unlimited", f"{cap * 2:,}", f"{len(memory.users):,}", f"{len(memory.auths):,}",
+            f"{stats['lru']:,}", f"{lookup_us:.2f}",
+        ])
+    return rows
+
+
+def main(sizes, expired_share: float, cap: int, iterations: int):
+    loop = asyncio.new_event_loop()
+    purge = purge_rows(sizes, expired_share)
+    capped = cap_rows(loop, cap, iterations)
+    loop.close()
+
+    print(f"Purging sessions, {expired_share:.0%} expired")
+    print_table(["sessions", "expired", "scan ms", "wheel ms", "scan ms, none expired", "wheel µs, none expired"], purge)
+    print()
+    print(f"Logging in {cap * 2:,} users")
+    print_table(["max users", "logged in", "users kept", "sessions kept", "evicted", "µs per get_auth"], capped)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark expired session purges and the store cap")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--expired", type=float, default=0.01)
+    parser.add_argument("--cap", type=int, default=50000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.sizes, args.expired, args.cap, args.iterations)
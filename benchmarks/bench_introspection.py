@@ -0,0 +1,89 @@
+"""
+Benchmark access token introspection against the number of stored sessions.
+Compares the token index with a scan over auth_db, the only way to map a token
+to its user before the index existed, for the in-memory and SQLite stores.
+
+Usage: python -m benchmarks.bench_introspection [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.common import print_table, time_per_call
+
+from app.core.models import SessionRecord, auth_db
+from app.core.repository import user_repository
+from app.core.storage import MemoryStorage
+from app.core.storage.sqlite import SqliteStorage
+from app.services.lark_service import introspect_access_tokens
+
+BATCH_SIZE = 100
+
+
+def populate(count: int) -> None:
+    """Fill the session store with ``count`` synthetic sessions."""
+    auth_db.clear()
+    expires_at = int(time.time()) + 7200
+    for i in range(count):
+        auth_db[f"id-{i}"] = SessionRecord(f"id-{i}", f"at-{i}", "Bearer", f"rt-{i}", expires_at, expires_at + 86400)
+
+
+def linear_scan(access_token: str):
+    """Token lookup available before the index: scan every session."""
+    for record in auth_db.values():
+        if record.access_token == access_token:
+            return record
+    return None
+
+
+async def fill_sqlite(storage: SqliteStorage) -> None:
+    await asyncio.gather(*(storage.save_auth(record.to_model()) for record in auth_db.values()))
+
+
+def main(sizes, iterations):
+    loop = asyncio.new_event_loop()
+    rows = []
+    for size in sizes:
+        populate(size)
+        memory = MemoryStorage(user_repository, auth_db)
+        token = f"at-{size - 1}"
+        batch = [f"at-{i * size // BATCH_SIZE}" for i in range(BATCH_SIZE)]
+
+        scan_us = time_per_call(lambda: linear_scan(token), max(iterations // 100, 10))
+        memory_us = time_per_call(lambda: loop.run_until_complete(introspect_access_tokens([token], memory)), iterations)
+        memory_batch_us = time_per_call(
+            lambda: loop.run_until_complete(introspect_access_tokens(batch, memory)), iterations // 10
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            sqlite = SqliteStorage(os.path.join(tmp, "bench.db"))
+            loop.run_until_complete(sqlite.init())
+            loop.run_until_complete(fill_sqlite(sqlite))
+            sqlite_us = time_per_call(
+                lambda: loop.run_until_complete(introspect_access_tokens([token], sqlite)), iterations // 10
+            )
+            sqlite_batch_us = time_per_call(
+                lambda: loop.run_until_complete(introspect_access_tokens(batch, sqlite)), iterations // 100
+            )
+            loop.run_until_complete(sqlite.close())
+
+        rows.append([
+            size, f"{scan_us:.1f}", f"{memory_us:.1f}", f"{memory_batch_us / BATCH_SIZE:.2f}",
+            f"{sqlite_us:.1f}", f"{sqlite_batch_us / BATCH_SIZE:.2f}"
+        ])
+    loop.close()
+    print_table(
+        ["sessions", "scan_us", "memory_us", "memory_batch_us/token", "sqlite_us", "sqlite_batch_us/token"],
+        rows
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark access token introspection")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.sizes, args.iterations)
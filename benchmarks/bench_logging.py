@@ -0,0 +1,91 @@
+"""
+Compare request throughput of GET /api/auth/user/lark/login, which logs once
+per request, under different logging configurations. Both sinks write to
+temporary files so the terminal does not dominate the measurement. The
+"slow disk" rows add a 1 ms stall to every console write to show what the
+enqueued mode buys when the sink blocks.
+
+Usage:
+    python -m benchmarks.bench_logging
+"""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import print_table
+
+import httpx
+
+from app.core.logger import configure_logging, logger
+from app.main import app
+
+REQUESTS = 5000
+CONCURRENCY = 50
+
+SLOW_WRITE_DELAY = 0.001
+
+
+class SlowStream:
+    """File wrapper stalling on every write, like a saturated disk or a blocked pipe."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, message: str) -> None:
+        time.sleep(SLOW_WRITE_DELAY)
+        self.stream.write(message)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+CONFIGS = [
+    ("off", dict(level="CRITICAL", file=None)),
+    ("sync", dict(enqueue=False)),
+    ("enqueued", dict(enqueue=True)),
+    ("enqueued, json", dict(enqueue=True, json=True)),
+    ("enqueued, 1% sampled", dict(enqueue=True, sample_rates={"auth_redirect": 0.01})),
+    ("sync, slow disk", dict(enqueue=False, slow=True)),
+    ("enqueued, slow disk", dict(enqueue=True, slow=True)),
+]
+
+
+async def measure(client: httpx.AsyncClient) -> float:
+    """Return requests per second for REQUESTS logins sent by CONCURRENCY workers."""
+    remaining = REQUESTS
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await client.get("/api/auth/user/lark/login")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, options in CONFIGS:
+                with open(Path(tmp) / "console.log", "w") as console:
+                    options = {"file": str(Path(tmp) / "lark_oauth.log"), **options}
+                    options["console"] = SlowStream(console) if options.pop("slow", False) else console
+                    configure_logging(level=options.pop("level", "INFO"), **options)
+                    await measure(client)  # warm up
+                    rps = await measure(client)
+                    await logger.complete()
+                    logger.remove()
+                rows.append([label, f"{rps:,.0f}"])
+
+    print(f"{REQUESTS} requests, concurrency {CONCURRENCY}")
+    print_table(["logging", "requests/s"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
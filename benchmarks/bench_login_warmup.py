@@ -0,0 +1,118 @@
+"""
+Login callback latency by stage after an idle period, with and without the
+login warm-up. Between logins the app token comes due for renewal and the
+pooled connections expire, as on a quiet worker. Opening a connection is
+slowed down to model the TCP and TLS handshakes with a remote Lark region.
+
+Usage: python -m benchmarks.bench_login_warmup [--logins 5] [--handshake 0.06] [--think 0.3]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpcore
+import httpx
+
+from benchmarks.common import print_table
+from benchmarks.mock_lark import MockLarkConfig, MockLarkServer
+
+STAGES = ["app_token", "code_exchange", "user_info", "store", "total"]
+KEEPALIVE_EXPIRY = 1.0
+# Idle time between logins: longer than the keep-alive expiry and the app token's remaining freshness
+IDLE = 2.5
+# The mock's app token is fresh for this long before it is due for renewal
+TOKEN_FRESH_FOR = 2
+
+
+class SlowConnectBackend(httpcore.AsyncNetworkBackend):
+    """Network backend adding a fixed delay to every new connection."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        return await self.backend.connect_tcp(*args, **kwargs)
+
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+def slow_transport(handshake: float) -> httpx.AsyncHTTPTransport:
+    transport = httpx.AsyncHTTPTransport()
+    # httpx has no public hook for the network backend
+    transport._pool = httpcore.AsyncConnectionPool(
+        max_connections=100, keepalive_expiry=KEEPALIVE_EXPIRY, network_backend=SlowConnectBackend(handshake)
+    )
+    return transport
+
+
+def stage_means(histogram, before: dict) -> dict:
+    means = {}
+    for stage in STAGES:
+        counts, total = histogram._series.get((stage,), [[0], 0.0])
+        count_before, total_before = before.get(stage, (0, 0.0))
+        count = sum(counts) - count_before
+        means[stage] = (total - total_before) / count * 1000 if count else 0.0
+    return means
+
+
+def snapshot(histogram) -> dict:
+    return {stage: (sum(counts), total) for (stage,), (counts, total) in histogram._series.items()}
+
+
+async def run(logins: int, handshake: float, think: float) -> list:
+    # Imported here so the app picks up the environment pointing at the mock
+    from app.core.config import settings
+    from app.core.http_client import init_http_client
+    from app.core.metrics import lark_login_stage_duration
+    from app.main import app
+
+    rows = []
+    async with app.router.lifespan_context(app):
+        await init_http_client(slow_transport(handshake))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for enabled in (False, True):
+                settings.LOGIN_WARMUP_ENABLED = enabled
+                before = snapshot(lark_login_stage_duration)
+                for i in range(logins):
+                    await asyncio.sleep(IDLE)
+                    await client.get("/api/auth/user/lark/login")
+                    # The user approves the login on Lark's page
+                    await asyncio.sleep(think)
+                    response = await client.get("/api/auth/user/lark/callback", params={"code": f"{enabled}-{i}"})
+                    assert response.status_code == 307, response.text
+                means = stage_means(lark_login_stage_duration, before)
+                rows.append(["warm-up" if enabled else "no warm-up", *(f"{means[stage]:.1f}" for stage in STAGES)])
+    return rows
+
+
+def main(logins: int, handshake: float, think: float, latency: float):
+    config = MockLarkConfig(latency=latency, token_expire=300 + TOKEN_FRESH_FOR)
+    with MockLarkServer(config) as mock:
+        os.environ["LARK_API_BASE_URL"] = mock.base_url
+        os.environ["APP_TOKEN_REFRESH_MARGIN"] = "300"
+        os.environ["LOGIN_WARMUP_INTERVAL"] = str(KEEPALIVE_EXPIRY / 2)
+        os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+        os.environ.setdefault("LOG_FILE", "")
+        start = time.perf_counter()
+        rows = asyncio.run(run(logins, handshake, think))
+
+    print(f"{logins} logins per setup after {IDLE}s idle, {handshake * 1000:.0f} ms per new connection, "
+          f"mock latency {latency * 1000:.0f} ms, {think * 1000:.0f} ms between redirect and callback "
+          f"({time.perf_counter() - start:.0f}s)")
+    print_table(["setup", *(f"{stage} ms" for stage in STAGES)], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark login callback stages with and without the warm-up")
+    parser.add_argument("--logins", type=int, default=5)
+    parser.add_argument("--handshake", type=float, default=0.06)
+    parser.add_argument("--think", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    main(args.logins, args.handshake, args.think, args.latency)
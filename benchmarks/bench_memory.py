@@ -0,0 +1,84 @@
+"""
+Memory benchmark for cached sessions.
+Reports bytes per session for the previous layout (a pydantic UserAuth per
+session) and the compact SessionRecord layout, for both auth_db and users_db.
+
+Usage: python -m benchmarks.bench_memory [--count 1000000]
+"""
+
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.common import print_table
+
+from app.core.models import SessionRecord, User, UserAuth, UserRecord
+
+
+def auth_models(count, now):
+    # Sessions are created over time, so every record carries its own expiry
+    for i in range(count):
+        created_at = now - timedelta(seconds=i)
+        yield UserAuth(
+            user_id=f"user-{i:08d}",
+            access_token=f"u-{i:064d}",
+            refresh_token=f"ur-{i:064d}",
+            expires_at=created_at + timedelta(hours=2),
+            refresh_expires_at=created_at + timedelta(days=30)
+        )
+
+
+def user_models(count, now):
+    for i in range(count):
+        created_at = now - timedelta(seconds=i)
+        yield User(name=f"user {i}", open_id=f"ou_{i:032d}", union_id=f"on_{i:032d}",
+                   created_at=created_at, updated_at=created_at + timedelta(microseconds=i))
+
+
+def build_auth_models(count, now):
+    return {auth.user_id: auth for auth in auth_models(count, now)}
+
+
+def build_auth_records(count, now):
+    # Built the way the store builds them, one model at a time
+    return {auth.user_id: SessionRecord.from_model(auth) for auth in auth_models(count, now)}
+
+
+def build_user_models(count, now):
+    return {user.id: user for user in user_models(count, now)}
+
+
+def build_user_records(count, now):
+    return {user.id: UserRecord.from_model(user) for user in user_models(count, now)}
+
+
+def measure(build, count, now):
+    """Return the bytes allocated per entry by ``build``."""
+    gc.collect()
+    tracemalloc.start()
+    store = build(count, now)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return size / count
+
+
+def main(count):
+    now = datetime.now()
+    rows = []
+    for label, old, new in [
+        ("auth_db", build_auth_models, build_auth_records),
+        ("users_db", build_user_models, build_user_records),
+    ]:
+        old_bytes = measure(old, count, now)
+        new_bytes = measure(new, count, now)
+        rows.append([label, count, f"{old_bytes:.0f}", f"{new_bytes:.0f}", f"{1 - new_bytes / old_bytes:.0%}"])
+    print_table(["store", "entries", "pydantic_bytes", "compact_bytes", "saved"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory per cached session")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+    main(args.count)
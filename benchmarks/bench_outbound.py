@@ -0,0 +1,115 @@
+"""
+Logins arriving while a background job floods the Lark API, against a mock
+that answers 429 beyond a per-second limit. Compares sending every call
+straight out with the outbound scheduler, without and with priorities.
+
+Usage: python -m benchmarks.bench_outbound [--rate-limit 100] [--logins 100] [--background-calls 1500]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.common import print_table
+from benchmarks.mock_lark import MockLarkConfig, MockLarkServer
+
+BACKGROUND_TASKS = 32
+LOGIN_INTERVAL = 0.03
+
+
+def percentile(values: list, share: float) -> float:
+    return sorted(values)[min(int(len(values) * share), len(values) - 1)] if values else 0.0
+
+
+async def scenario(base_url: str, scheduler, use_priorities: bool, logins: int, background_calls: int) -> list:
+    from app.services import lark_service
+    from app.services.rate_limiter import BACKGROUND, INTERACTIVE, lark_priority
+
+    lark_service.lark_scheduler = scheduler
+    before = httpx.get(base_url.replace("/open-apis", "/_stats")).json().get("rate_limited", 0)
+    remaining = [background_calls]
+    background_failed = [0]
+
+    async def background() -> None:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            try:
+                await lark_service.list_department_users_page("od-1")
+            except Exception:
+                background_failed[0] += 1
+
+    async def login(i: int) -> float:
+        await asyncio.sleep(i * LOGIN_INTERVAL)
+        start = time.perf_counter()
+        token_data = await lark_service.get_user_access_token(f"{id(scheduler)}-{i}")
+        await lark_service.get_user_info(token_data["access_token"])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with lark_priority(BACKGROUND if use_priorities else INTERACTIVE):
+        flood = [asyncio.create_task(background()) for _ in range(BACKGROUND_TASKS)]
+    results = await asyncio.gather(*(login(i) for i in range(logins)), return_exceptions=True)
+    await asyncio.gather(*flood)
+    elapsed = time.perf_counter() - start
+
+    latencies = [result for result in results if isinstance(result, float)]
+    rate_limited = httpx.get(base_url.replace("/open-apis", "/_stats")).json().get("rate_limited", 0) - before
+    return [
+        f"{logins - len(latencies)}/{logins}",
+        f"{statistics.median(latencies) * 1000:.0f}" if latencies else "-",
+        f"{percentile(latencies, 0.95) * 1000:.0f}" if latencies else "-",
+        f"{background_failed[0]}/{background_calls}",
+        rate_limited,
+        f"{elapsed:.1f}",
+    ]
+
+
+async def run(base_url: str, rate_limit: int, logins: int, background_calls: int) -> list:
+    from app.core.http_client import close_http_client, init_http_client
+    from app.services.lark_service import get_app_access_token, get_tenant_access_token
+    from app.services.rate_limiter import OutboundScheduler
+
+    await init_http_client()
+    await get_app_access_token()
+    await get_tenant_access_token()
+    # Keep a margin under the upstream limit for clock skew between the two windows
+    rate = rate_limit * 0.9
+    setups = [
+        ("unscheduled", OutboundScheduler(rate=0, burst=1, max_concurrency=10000), False),
+        ("scheduler, one class", OutboundScheduler(rate=rate, burst=10, max_concurrency=32), False),
+        ("scheduler, priorities", OutboundScheduler(rate=rate, burst=10, max_concurrency=32), True),
+    ]
+    rows = []
+    for label, scheduler, use_priorities in setups:
+        rows.append([label, *await scenario(base_url, scheduler, use_priorities, logins, background_calls)])
+        # Let the mock's rate window roll over between scenarios
+        await asyncio.sleep(1.0)
+    await close_http_client()
+    return rows
+
+
+def main(rate_limit: int, logins: int, background_calls: int, latency: float):
+    config = MockLarkConfig(latency=latency, rate_limit=rate_limit, department_users=50)
+    with MockLarkServer(config) as mock:
+        os.environ["LARK_API_BASE_URL"] = mock.base_url
+        os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+        os.environ.setdefault("LOG_FILE", "")
+        rows = asyncio.run(run(mock.base_url, rate_limit, logins, background_calls))
+
+    print(f"Mock limit {rate_limit} calls/s, latency {latency * 1000:.0f} ms; {logins} logins every "
+          f"{LOGIN_INTERVAL * 1000:.0f} ms during {background_calls} background calls from {BACKGROUND_TASKS} tasks")
+    print_table(["setup", "failed logins", "login p50 ms", "login p95 ms", "failed background", "429s", "seconds"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the outbound scheduler against a rate limited mock")
+    parser.add_argument("--rate-limit", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--background-calls", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    main(args.rate_limit, args.logins, args.background_calls, args.latency)
@@ -0,0 +1,139 @@
+"""
+Warm restart of the in-memory store with MEMORY_STORE_DIR: the cost of
+journaling a write on the request path, how long a snapshot takes and how
+long it blocks the event loop, and how long a restart takes to restore the
+snapshot and replay the write-ahead log.
+
+Usage: python -m benchmarks.bench_persistence [--sizes 100000 1000000] [--writes 100000]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import print_table, time_per_call
+
+from app.core.models import SessionRecord, UserRecord
+from app.core.repository import UserRepository
+from app.core.storage import MemoryStorage
+from app.core.storage.persistence import StorePersistence
+
+# Loop ticks of the probe measuring event loop stalls during a snapshot
+TICK = 0.001
+
+
+def populate(size: int, persistence=None) -> MemoryStorage:
+    now = int(time.time())
+    users = UserRepository({})
+    auths = {}
+    for i in range(size):
+        users.upsert(UserRecord(f"id-{i}", f"User {i}", None, f"ou_{i}", f"on_{i}", None, now, now))
+        auths[f"id-{i}"] = SessionRecord(f"id-{i}", f"at-{i}", "Bearer", f"rt-{i}", now + 7200, now + 86400)
+    return MemoryStorage(users, auths, persistence=persistence)
+
+
+def persistence(directory: str) -> StorePersistence:
+    # Intervals long enough that nothing runs in the background unless asked
+    return StorePersistence(directory, snapshot_interval=3600, flush_interval=3600)
+
+
+async def max_stall(work) -> float:
+    """Run ``work`` and return the longest the event loop went without running another task, in seconds."""
+    longest = 0.0
+    done = False
+
+    async def probe():
+        nonlocal longest
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(TICK)
+            now = time.perf_counter()
+            longest = max(longest, now - last - TICK)
+            last = now
+
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(TICK * 2)
+    await work
+    done = True
+    await task
+    return longest
+
+
+async def measure(size: int, writes: int, directory: str) -> list:
+    storage = populate(size, persistence(directory))
+    storage.persistence.claim()
+    await storage.persistence.start(storage)
+
+    start = time.perf_counter()
+    stall = await max_stall(storage.persistence.snapshot(storage))
+    snapshot_s = time.perf_counter() - start
+    snapshot_mb = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1e6
+
+    # Writes after the snapshot go to the log, like those since the last snapshot before a crash
+    now = int(time.time())
+    for i in range(writes):
+        record = SessionRecord(f"id-{i}", f"at2-{i}", "Bearer", f"rt2-{i}", now + 7200, now + 86400)
+        storage.persistence.session(record)
+    log_start = time.perf_counter()
+    await storage.persistence._flush()
+    log_ms = (time.perf_counter() - log_start) * 1000
+    # Leave without the final snapshot, as a crashed worker does
+    storage.persistence._task.cancel()
+    os.close(storage.persistence._lock_fd)
+
+    restored = MemoryStorage(UserRepository({}), {}, persistence=persistence(directory))
+    start = time.perf_counter()
+    await restored.init()
+    restore_s = time.perf_counter() - start
+    assert len(restored.auths) == size and len(restored.users) == size
+    assert restored.auths["id-0"].access_token == ("at2-0" if writes else "at-0")
+    restored.persistence._task.cancel()
+    os.close(restored.persistence._lock_fd)
+    return [
+        f"{size:,}", f"{snapshot_mb:.0f}", f"{snapshot_s:.2f}", f"{stall * 1000:.1f}", f"{writes:,}",
+        f"{log_ms:.0f}", f"{restore_s:.2f}",
+    ]
+
+
+def journal_cost(iterations: int) -> list:
+    """Microseconds per save_auth without and with journaling."""
+    loop = asyncio.new_event_loop()
+    rows = []
+    now = int(time.time())
+    auth = SessionRecord("id-0", "at-0", "Bearer", "rt-0", now + 7200, now + 86400).to_model()
+    for label, journal in (("not persisted", None), ("journaled", persistence(tempfile.gettempdir()))):
+        storage = populate(1000, journal)
+        us = time_per_call(lambda: loop.run_until_complete(storage.save_auth(auth)), iterations)
+        rows.append([label, f"{us:.2f}"])
+    loop.close()
+    return rows
+
+
+def main(sizes, writes: int, iterations: int):
+    rows = []
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix="bench-store-")
+        try:
+            rows.append(asyncio.run(measure(size, writes, directory)))
+        finally:
+            shutil.rmtree(directory)
+    journal = journal_cost(iterations)
+
+    print("Snapshot and restart of the in-memory store (one user and one session per entry)")
+    print_table(["entries", "snapshot MB", "snapshot s", "max loop stall ms", "logged writes", "log append ms",
+                 "restore s"], rows)
+    print()
+    print("Request path cost of a session write")
+    print_table(["store", "µs per save_auth"], journal)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark snapshots and restores of the in-memory store")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--writes", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.sizes, args.writes, args.iterations)
@@ -0,0 +1,78 @@
+"""
+Microbenchmark for rendering the GET /api/user/{user_id} response body.
+Compares the previous path (dicts built with user.dict() and isoformat(),
+then jsonable_encoder and JSONResponse) with UserResponse rendered by
+ModelJSONResponse through pydantic-core.
+
+Usage: python -m benchmarks.bench_serialization [--iterations 20000]
+"""
+
+import argparse
+import warnings
+from datetime import datetime, timedelta
+
+from benchmarks.common import print_table, time_per_call
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.models import User, UserAuth, UserResponse
+from app.core.responses import ModelJSONResponse
+
+
+def legacy_render(user: User, auth: UserAuth) -> bytes:
+    """Response rendering as done before UserResponse existed."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        user_data = user.dict()
+    content = {
+        "user": user_data,
+        "auth": {
+            "access_token": auth.access_token,
+            "token_type": auth.token_type,
+            "refresh_token": auth.refresh_token,
+            "expires_at": auth.expires_at.isoformat(),
+            "refresh_expires_at": auth.refresh_expires_at.isoformat()
+        }
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def model_render(user: User, auth: UserAuth) -> bytes:
+    return ModelJSONResponse(UserResponse.from_records(user, auth)).body
+
+
+def main(iterations):
+    now = datetime.now()
+    user = User(
+        name="Benchmark User",
+        email="bench@example.com",
+        open_id="ou_0123456789abcdef",
+        union_id="on_0123456789abcdef",
+        avatar_url="https://example.com/avatar.png"
+    )
+    auth = UserAuth(
+        user_id=user.id,
+        access_token="u-" + "a" * 60,
+        refresh_token="ur-" + "r" * 60,
+        expires_at=now + timedelta(hours=2),
+        refresh_expires_at=now + timedelta(days=30)
+    )
+    assert legacy_render(user, auth) == model_render(user, auth), "JSON output differs"
+
+    legacy_us = time_per_call(lambda: legacy_render(user, auth), iterations)
+    model_us = time_per_call(lambda: model_render(user, auth), iterations)
+    print_table(
+        ["path", "us_per_response", "speedup"],
+        [
+            ["jsonable_encoder", f"{legacy_us:.2f}", "1.00x"],
+            ["model_dump_json", f"{model_us:.2f}", f"{legacy_us / model_us:.2f}x"],
+        ]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark user response serialization")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
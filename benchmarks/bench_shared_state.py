@@ -0,0 +1,98 @@
+"""
+Run several worker processes against the mock Lark API, each fetching the app
+token and refreshing the same set of refresh tokens at once, with and without
+SHARED_STATE_DIR. Like Lark, the mock accepts each refresh token once, so
+refreshes that race across workers fail.
+
+Usage: python -m benchmarks.bench_shared_state [--workers 4] [--tokens 50]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import print_table
+from benchmarks.mock_lark import MockLarkConfig, MockLarkServer
+
+CALLS_PER_TOKEN = 3
+
+
+def worker(env: dict, tokens: int, prefix: str, start_at: float, results: multiprocessing.Queue) -> None:
+    """Refresh every token CALLS_PER_TOKEN times concurrently; report the app token and failed refreshes."""
+    os.environ.update(env)
+    # Settings are read at import, so the app is imported only once the environment is set
+    from app.core.http_client import close_http_client
+    from app.services.lark_service import get_app_access_token, refresh_access_token
+
+    async def run():
+        await asyncio.sleep(max(start_at - time.time(), 0))
+        app_token = await get_app_access_token()
+        refreshed = await asyncio.gather(*(
+            refresh_access_token(f"{prefix}-{i}") for i in range(tokens) for _ in range(CALLS_PER_TOKEN)
+        ), return_exceptions=True)
+        await close_http_client()
+        return app_token, sum(isinstance(result, Exception) for result in refreshed)
+
+    results.put(asyncio.run(run()))
+
+
+def run_workers(base_url: str, workers: int, tokens: int, shared_dir: str, prefix: str) -> tuple:
+    """Return (seconds, distinct app tokens, failed refreshes) across ``workers`` processes."""
+    env = {"LARK_API_BASE_URL": base_url, "SHARED_STATE_DIR": shared_dir, "LOG_FILE": "", "LOG_LEVEL": "CRITICAL"}
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    # Start together once every process has imported the app
+    start_at = time.time() + 3.0
+    processes = [context.Process(target=worker, args=(env, tokens, prefix, start_at, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=60) for _ in processes]
+    elapsed = time.time() - start_at
+    for process in processes:
+        process.join()
+    app_tokens = {app_token for app_token, _ in outcomes}
+    return elapsed, len(app_tokens), sum(failed for _, failed in outcomes)
+
+
+def upstream_calls(base_url: str) -> dict:
+    return httpx.get(base_url.replace("/open-apis", "/_stats")).json()
+
+
+def main(workers: int, tokens: int, latency: float):
+    rows = []
+    with MockLarkServer(MockLarkConfig(latency=latency)) as mock, tempfile.TemporaryDirectory() as directory:
+        for label, shared_dir in [("per worker", ""), ("SHARED_STATE_DIR", directory)]:
+            before = upstream_calls(mock.base_url)
+            # The mock remembers used refresh tokens, so each run refreshes its own
+            elapsed, app_tokens, failed = run_workers(mock.base_url, workers, tokens, shared_dir, label)
+            after = upstream_calls(mock.base_url)
+            calls = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+            rows.append([
+                label,
+                calls.get("app_access_token", 0),
+                calls.get("oidc_refresh_access_token", 0),
+                app_tokens,
+                f"{failed}/{workers * tokens * CALLS_PER_TOKEN}",
+                f"{elapsed:.2f}",
+            ])
+
+    print(f"{workers} workers x {tokens} refresh tokens x {CALLS_PER_TOKEN} concurrent refreshes, "
+          f"mock latency {latency * 1000:.0f} ms")
+    print_table(
+        ["state", "app token calls", "refresh calls", "distinct app tokens", "failed refreshes", "seconds"],
+        rows
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cross-worker app token and refresh coordination")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    main(args.workers, args.tokens, args.latency)
@@ -0,0 +1,142 @@
+"""
+Compare the frontend static server against the previous single-threaded
+SimpleHTTPRequestHandler server: throughput and bytes sent for the pages in
+static/, revalidation, and page latency while another client stalls
+mid-request. Each server runs in its own process so it does not share the
+GIL with the load generator.
+
+Usage:
+    python -m benchmarks.bench_static
+"""
+
+import asyncio
+import functools
+import http.server
+import multiprocessing
+import socket
+import socketserver
+import statistics
+import time
+
+from benchmarks.common import print_table
+
+import httpx
+
+from scripts.run_frontend import DEFAULT_DIRECTORY, FrontendHandler, FrontendServer
+
+PATHS = ["/index.html", "/login-success.html", "/styles.css"]
+REQUESTS = 3000
+CONCURRENCY = 20
+STALL_TIMEOUT = 3.0
+
+
+class QuietLegacyHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietFrontendHandler(FrontendHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def legacy_server() -> socketserver.TCPServer:
+    return socketserver.TCPServer(("127.0.0.1", 0), functools.partial(QuietLegacyHandler, directory=DEFAULT_DIRECTORY))
+
+
+def frontend_server() -> FrontendServer:
+    QuietFrontendHandler.assets.preload()
+    return FrontendServer(("127.0.0.1", 0), QuietFrontendHandler)
+
+
+def _serve(factory, ports: multiprocessing.Queue) -> None:
+    server = factory()
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start(factory) -> tuple:
+    """Run the server built by ``factory`` in a child process; return (process, base URL)."""
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(factory, ports), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ports.get(timeout=10)}"
+
+
+async def throughput(base_url: str, headers: dict) -> tuple:
+    """Return (requests/s, mean response bytes) for REQUESTS page loads."""
+    remaining = REQUESTS
+    sizes = []
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get(PATHS[remaining % len(PATHS)], headers=headers)
+            # Bytes on the wire, before httpx decodes the content coding
+            sizes.append(int(response.headers.get("content-length", len(response.content))))
+
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        start_time = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - start_time
+    return REQUESTS / elapsed, statistics.mean(sizes)
+
+
+async def revalidation(base_url: str) -> tuple:
+    """Return (requests/s, status) for conditional requests using the server's own validators."""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        first = await client.get("/styles.css")
+        conditional = {}
+        if "etag" in first.headers:
+            conditional["If-None-Match"] = first.headers["etag"]
+        if "last-modified" in first.headers:
+            conditional["If-Modified-Since"] = first.headers["last-modified"]
+        start_time = time.perf_counter()
+        for _ in range(REQUESTS // 3):
+            response = await client.get("/styles.css", headers=conditional)
+        return REQUESTS // 3 / (time.perf_counter() - start_time), response.status_code
+
+
+def latency_with_stalled_client(base_url: str) -> str:
+    """Time a page load while another connection has sent only half of its request."""
+    host, port = base_url.rsplit("/", 1)[1].split(":")
+    stalled = socket.create_connection((host, int(port)))
+    stalled.sendall(b"GET /index.html HTTP/1.1\r\nHost: x\r\n")
+    try:
+        start_time = time.perf_counter()
+        httpx.get(f"{base_url}/index.html", timeout=STALL_TIMEOUT)
+        return f"{(time.perf_counter() - start_time) * 1000:.1f} ms"
+    except httpx.TimeoutException:
+        return f"timed out ({STALL_TIMEOUT:.0f} s)"
+    finally:
+        stalled.close()
+
+
+async def main():
+    rows = []
+    for label, factory in [("SimpleHTTPRequestHandler", legacy_server), ("FrontendServer", frontend_server)]:
+        process, base_url = start(factory)
+        plain_rps, plain_bytes = await throughput(base_url, {"Accept-Encoding": "identity"})
+        gzip_rps, gzip_bytes = await throughput(base_url, {"Accept-Encoding": "gzip, br"})
+        revalidate_rps, revalidate_status = await revalidation(base_url)
+        stalled = await asyncio.to_thread(latency_with_stalled_client, base_url)
+        rows.append([
+            label,
+            f"{plain_rps:,.0f}", f"{plain_bytes:,.0f}",
+            f"{gzip_rps:,.0f}", f"{gzip_bytes:,.0f}",
+            f"{revalidate_rps:,.0f} ({revalidate_status})",
+            stalled,
+        ])
+        process.terminate()
+
+    print(f"{REQUESTS} requests over {', '.join(PATHS)}, concurrency {CONCURRENCY}")
+    print_table(
+        ["server", "req/s", "bytes/resp", "req/s gzip", "bytes/resp gzip", "revalidate req/s", "page load, 1 stalled client"],
+        rows
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Benchmark login cost against the number of registered users.
+Compares the indexed user repository with the previous linear scan over users_db.
+
+Usage: python -m benchmarks.bench_user_store [--sizes 1000 10000 100000 200000]
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from benchmarks.common import print_table, time_per_call
+
+from app.core.models import UserRecord, users_db
+from app.core.repository import user_repository
+from app.services.lark_service import create_or_update_user
+
+
+def populate(count: int) -> None:
+    """Fill the user store with ``count`` synthetic users."""
+    users_db.clear()
+    for i in range(count):
+        users_db[f"id-{i}"] = UserRecord(f"id-{i}", f"user {i}", None, f"ou_{i}", f"on_{i}", None, 0, 0)
+    user_repository.reindex()
+
+
+def linear_scan(open_id: str):
+    """Lookup used by create_or_update_user before the repository existed."""
+    for user in users_db.values():
+        if user.open_id == open_id:
+            return user
+    return None
+
+
+def main(sizes, iterations):
+    now = datetime.now()
+    token_data = {
+        "access_token": "at",
+        "refresh_token": "rt",
+        "expires_at": now + timedelta(hours=2),
+        "refresh_expires_at": now + timedelta(days=30),
+    }
+    loop = asyncio.new_event_loop()
+    rows = []
+    for size in sizes:
+        populate(size)
+        # Worst case for the scan: the user who logs in was registered last
+        open_id = f"ou_{size - 1}"
+        user_info = {"open_id": open_id, "union_id": f"on_{size - 1}", "name": "user"}
+        scan_us = time_per_call(lambda: linear_scan(open_id), iterations)
+        index_us = time_per_call(lambda: user_repository.get_by_open_id(open_id), iterations)
+        login_us = time_per_call(
+            lambda: loop.run_until_complete(create_or_update_user(user_info, token_data)), iterations
+        )
+        rows.append([size, f"{scan_us:.1f}", f"{index_us:.2f}", f"{login_us:.1f}"])
+    loop.close()
+    print_table(["users", "scan_lookup_us", "index_lookup_us", "login_us"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark user lookup during login")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 200000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.sizes, args.iterations)
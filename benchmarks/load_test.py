@@ -0,0 +1,170 @@
+"""
+End-to-end load test of the login callback and token refresh endpoints.
+Runs the FastAPI app in-process against a local mock of the Lark API
+(benchmarks/mock_lark.py) at fixed concurrency levels and reports throughput,
+p50/p95/p99 latency and upstream Lark calls per request. Results are saved as
+JSON so runs can be compared between releases.
+
+Usage:
+    python -m benchmarks.load_test --label v0.2.0
+    python -m benchmarks.load_test --label v0.3.0 --compare benchmarks/results/v0.2.0.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.common import print_table
+from benchmarks.mock_lark import DEFAULT_PORT, MockLarkConfig, MockLarkServer
+
+import httpx
+
+RESULTS_DIR = Path("benchmarks/results")
+
+# Counters reported by the mock that are not upstream endpoints
+MOCK_FAILURE_KEYS = {"errors", "rejects", "rate_limited"}
+
+Scenario = Callable[[httpx.AsyncClient, int], Awaitable[bool]]
+
+
+def login_scenario(users: int, run_id: str) -> Scenario:
+    async def login(client: httpx.AsyncClient, i: int) -> bool:
+        # The mock maps the part before the dot to a user, so logins cycle over ``users`` accounts
+        code = f"{i % users}.{run_id}-{i}"
+        response = await client.get("/api/auth/user/lark/callback", params={"code": code})
+        return response.status_code == 307
+    return login
+
+
+def refresh_scenario(run_id: str) -> Scenario:
+    async def refresh(client: httpx.AsyncClient, i: int) -> bool:
+        response = await client.post("/api/auth/user/lark/refresh", json={"refresh_token": f"ur-{run_id}-{i}"})
+        return response.status_code == 200
+    return refresh
+
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, concurrency: int, total: int) -> Dict:
+    """Send ``total`` requests from ``concurrency`` concurrent workers."""
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < total:
+            start = time.perf_counter()
+            try:
+                ok = await scenario(client, i)
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
+
+
+async def upstream_calls(mock_client: httpx.AsyncClient, stats_url: str) -> int:
+    stats = (await mock_client.get(stats_url)).json()
+    return sum(count for key, count in stats.items() if key not in MOCK_FAILURE_KEYS)
+
+
+async def run(args, mock_stats_url: str) -> List[Dict]:
+    # Imported here so the app picks up LARK_API_BASE_URL pointing at the mock
+    from app.main import app
+
+    run_id = datetime.now().strftime("%H%M%S")
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client, \
+                httpx.AsyncClient() as mock_client:
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    # Unique codes and refresh tokens per level so no level is served from another's caches
+                    tag = f"{run_id}-{concurrency}"
+                    scenario = login_scenario(args.users, tag) if name == "login" else refresh_scenario(tag)
+                    before = await upstream_calls(mock_client, mock_stats_url)
+                    result = await drive(client, scenario, concurrency, args.requests)
+                    calls = await upstream_calls(mock_client, mock_stats_url) - before
+                    succeeded = max(result["requests"] - result["errors"], 1)
+                    results.append({
+                        "scenario": name,
+                        "concurrency": concurrency,
+                        **result,
+                        "upstream_per_request": round(calls / succeeded, 2),
+                    })
+    return results
+
+
+def print_results(results: List[Dict], baseline: List[Dict] = None) -> None:
+    base = {(r["scenario"], r["concurrency"]): r for r in baseline or []}
+    headers = ["scenario", "conc", "rps", "p50_ms", "p95_ms", "p99_ms", "errors", "upstream/req"]
+    if baseline:
+        headers += ["rps_vs_base", "p95_vs_base"]
+    rows = []
+    for r in results:
+        row = [r["scenario"], r["concurrency"], r["throughput_rps"], r["p50_ms"], r["p95_ms"], r["p99_ms"],
+               r["errors"], r["upstream_per_request"]]
+        previous = base.get((r["scenario"], r["concurrency"]))
+        if baseline:
+            row += [
+                f"{r['throughput_rps'] / previous['throughput_rps'] - 1:+.0%}" if previous else "-",
+                f"{r['p95_ms'] / previous['p95_ms'] - 1:+.0%}" if previous else "-",
+            ]
+        rows.append(row)
+    print_table(headers, rows)
+
+
+def main(args) -> None:
+    config = MockLarkConfig(args.latency, args.jitter, args.error_rate, args.reject_rate)
+    with MockLarkServer(config, args.mock_port) as mock:
+        os.environ["LARK_API_BASE_URL"] = mock.base_url
+        results = asyncio.run(run(args, f"http://127.0.0.1:{args.mock_port}/_stats"))
+
+    baseline = json.loads(Path(args.compare).read_text())["results"] if args.compare else None
+    print_results(results, baseline)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output = RESULTS_DIR / f"{args.label}.json"
+    output.write_text(json.dumps({
+        "label": args.label,
+        "timestamp": datetime.now().isoformat(),
+        "mock": vars(config),
+        "results": results,
+    }, indent=2))
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the login and refresh endpoints against a mock Lark API")
+    parser.add_argument("--scenarios", nargs="+", choices=["login", "refresh"], default=["login", "refresh"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario and concurrency level")
+    parser.add_argument("--users", type=int, default=1000, help="Distinct accounts the logins cycle over")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock Lark latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="Mock Lark latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock calls failing with HTTP 500")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of mock calls rejected with a Lark error")
+    parser.add_argument("--mock-port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--label", default=datetime.now().strftime("%Y%m%d-%H%M%S"), help="Name of the results file")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    main(parser.parse_args())
@@ -0,0 +1,226 @@
+"""
+Local mock of the Lark endpoints used by app/services/lark_service.py.
+Adds configurable latency and error injection and counts calls per endpoint.
+
+Usage: python -m benchmarks.mock_lark [--port 9100] [--latency 0.02] [--error-rate 0.01]
+Then point the app at it with LARK_API_BASE_URL=http://127.0.0.1:9100/open-apis
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+DEFAULT_PORT = 9100
+
+
+class MockLarkConfig:
+    """Runtime knobs of the mock server."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 reject_rate: float = 0.0, token_expire: int = 7200, departments: int = 20,
+                 department_users: int = 100, directory_revision: int = 0, rate_limit: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate
+        self.token_expire = token_expire
+        # Synthetic organization: the root plus ``departments`` departments of ``department_users`` users.
+        # Bumping ``directory_revision`` renames one user in a hundred
+        self.departments = departments
+        self.department_users = department_users
+        self.directory_revision = directory_revision
+        # Calls accepted per one-second window across all endpoints, like Lark's per-app limit; 0 is unlimited
+        self.rate_limit = rate_limit
+
+
+def create_mock_app(config: MockLarkConfig) -> FastAPI:
+    """Create the mock Lark API application."""
+    app = FastAPI()
+    calls: Counter = Counter()
+    # Like Lark, a refresh token is good for one refresh
+    used_refresh_tokens = set()
+    window = [0, 0]
+
+    async def simulate(endpoint: str) -> Optional[JSONResponse]:
+        """Count the call, sleep for the configured latency and maybe inject a failure."""
+        calls[endpoint] += 1
+        if config.rate_limit:
+            now = time.time()
+            if int(now) != window[0]:
+                window[:] = [int(now), 0]
+            window[1] += 1
+            if window[1] > config.rate_limit:
+                calls["rate_limited"] += 1
+                return JSONResponse(
+                    {"code": 99991400, "msg": "request trigger frequency limit"},
+                    status_code=429,
+                    headers={"x-ogw-ratelimit-reset": f"{int(now) + 1 - now:.3f}"}
+                )
+        delay = config.latency + random.uniform(-config.jitter, config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = random.random()
+        if roll < config.error_rate:
+            calls["errors"] += 1
+            return JSONResponse({"code": -1, "msg": "injected server error"}, status_code=500)
+        if roll < config.error_rate + config.reject_rate:
+            calls["rejects"] += 1
+            return JSONResponse({"code": 20003, "msg": "injected rejection"})
+        return None
+
+    def token_data(access_token: str, refresh_token: str) -> dict:
+        return {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "refresh_token": refresh_token,
+            "expires_in": config.token_expire,
+            "refresh_expires_in": 2592000,
+        }
+
+    @app.post("/open-apis/auth/v3/app_access_token/internal")
+    async def app_access_token():
+        failure = await simulate("app_access_token")
+        if failure:
+            return failure
+        return {"code": 0, "msg": "ok", "app_access_token": f"a-{time.time_ns()}", "expire": config.token_expire}
+
+    @app.post("/open-apis/authen/v1/oidc/access_token")
+    async def oidc_access_token(request: Request):
+        failure = await simulate("oidc_access_token")
+        if failure:
+            return failure
+        code = (await request.json())["code"]
+        return {"code": 0, "msg": "ok", "data": token_data(f"u-{code}", f"ur-{code}")}
+
+    @app.get("/open-apis/authen/v1/user_info")
+    async def user_info(request: Request):
+        failure = await simulate("user_info")
+        if failure:
+            return failure
+        # Codes look like "<user>.<request>", so repeated logins of a user map to the same open_id
+        user = request.headers["authorization"].split("u-", 1)[-1].split(".", 1)[0]
+        return {"code": 0, "msg": "ok", "data": {
+            "name": f"User {user}",
+            "email": f"user{user}@example.com",
+            "open_id": f"ou_{user}",
+            "union_id": f"on_{user}",
+            "avatar_url": f"https://example.com/avatar/{user}.png",
+        }}
+
+    @app.post("/open-apis/authen/v1/oidc/refresh_access_token")
+    async def oidc_refresh_access_token(request: Request):
+        failure = await simulate("oidc_refresh_access_token")
+        if failure:
+            return failure
+        refresh_token = (await request.json())["refresh_token"]
+        if refresh_token in used_refresh_tokens:
+            calls["reused_refresh_tokens"] += 1
+            return JSONResponse({"code": 20003, "msg": "refresh token already used"})
+        used_refresh_tokens.add(refresh_token)
+        return {"code": 0, "msg": "ok", "data": token_data(f"u-r{refresh_token}", f"{refresh_token}+")}
+
+    @app.post("/open-apis/auth/v3/tenant_access_token/internal")
+    async def tenant_access_token():
+        failure = await simulate("tenant_access_token")
+        if failure:
+            return failure
+        return {"code": 0, "msg": "ok", "tenant_access_token": f"t-{time.time_ns()}", "expire": config.token_expire}
+
+    def page(items: list, request: Request) -> dict:
+        offset = int(request.query_params.get("page_token") or 0)
+        size = int(request.query_params.get("page_size", 50))
+        has_more = offset + size < len(items)
+        return {"items": items[offset:offset + size], "has_more": has_more,
+                "page_token": str(offset + size) if has_more else ""}
+
+    def directory_user(department: int, index: int) -> dict:
+        user = f"d{department}_{index}"
+        name = f"User {user}"
+        if index % 100 == 0 and config.directory_revision:
+            name += f" r{config.directory_revision}"
+        return {
+            "open_id": f"ou_{user}",
+            "union_id": f"on_{user}",
+            "name": name,
+            "email": f"{user}@example.com",
+            "avatar": {"avatar_72": f"https://example.com/avatar/{user}_72.png"},
+        }
+
+    @app.get("/open-apis/contact/v3/departments/0/children")
+    async def departments(request: Request):
+        failure = await simulate("departments")
+        if failure:
+            return failure
+        items = [{"open_department_id": f"od-{d}", "name": f"Department {d}"} for d in range(1, config.departments + 1)]
+        return {"code": 0, "msg": "ok", "data": page(items, request)}
+
+    @app.get("/open-apis/contact/v3/users/find_by_department")
+    async def department_users(request: Request):
+        failure = await simulate("department_users")
+        if failure:
+            return failure
+        department = int(request.query_params["department_id"].removeprefix("od-"))
+        items = [directory_user(department, i) for i in range(config.department_users)]
+        if department > 0:
+            # The first few users of the previous department also belong to this one
+            items += [directory_user(department - 1, i) for i in range(min(5, config.department_users))]
+        return {"code": 0, "msg": "ok", "data": page(items, request)}
+
+    @app.get("/_stats")
+    async def stats():
+        return dict(calls)
+
+    @app.post("/_config")
+    async def update_config(request: Request):
+        for key, value in (await request.json()).items():
+            setattr(config, key, value)
+        return vars(config)
+
+    return app
+
+
+class MockLarkServer:
+    """Run the mock app with uvicorn on a background thread."""
+
+    def __init__(self, config: MockLarkConfig, port: int = DEFAULT_PORT):
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(
+            create_mock_app(config), host="127.0.0.1", port=port, log_level="warning"
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/open-apis"
+
+    def __enter__(self) -> "MockLarkServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the Lark API")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="Uniform latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with HTTP 500")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of calls answered with a Lark error code")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Calls per second answered before returning 429")
+    args = parser.parse_args()
+
+    config = MockLarkConfig(args.latency, args.jitter, args.error_rate, args.reject_rate, rate_limit=args.rate_limit)
+    uvicorn.run(create_mock_app(config), host="127.0.0.1", port=args.port, log_level="warning")
@@ -15,6 +15,7 @@ import os
 # Import centralized logger
 sys.path.append('.')
 from app.core.logger import logger
+from scripts.run_backend import DEFAULT_GRACEFUL_TIMEOUT, add_production_arguments, build_uvicorn_command
 
 # Default configurations
 DEFAULT_BACKEND_PORT = 8000
@@ -24,10 +25,14 @@ DEFAULT_BACKEND_HOST = "localhost"
 class ServerManager:
     """Manages both frontend and backend servers."""
     
-    def __init__(self, backend_port=DEFAULT_BACKEND_PORT, frontend_port=DEFAULT_FRONTEND_PORT, backend_host=DEFAULT_BACKEND_HOST):
+    def __init__(self, backend_port=DEFAULT_BACKEND_PORT, frontend_port=DEFAULT_FRONTEND_PORT, backend_host=DEFAULT_BACKEND_HOST,
+                 prod=False, **backend_options):
         self.backend_port = backend_port
         self.frontend_port = frontend_port
         self.backend_host = backend_host
+        self.prod = prod
+        self.backend_options = backend_options
+        self.backend_command = None
         self.backend_process = None
         self.frontend_process = None
         self.running = False
@@ -35,14 +40,13 @@ class ServerManager:
     def start_backend(self):
         """Start the backend server."""
         try:
-            cmd = [
-                sys.executable, "-m", "uvicorn", "app.main:app",
-                "--host", self.backend_host,
-                "--port", str(self.backend_port),
-                "--reload"
-            ]
-            
+            cmd = self.backend_command
             logger.info(f"Starting backend server at http://{self.backend_host}:{self.backend_port}")
+            if self.prod:
+                # Workers write to our stdout directly instead of through a re-logging thread
+                self.backend_process = subprocess.Popen(cmd)
+                return
+
             self.backend_process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
@@ -95,6 +99,19 @@ class ServerManager:
         if not os.path.exists(".env"):
             logger.warning("⚠️  No .env file found. Please create one with your Lark app credentials.")
             logger.info("💡 See .env.example for the required format.")
+
+        # Checked before any thread starts, so a backend that cannot run stops everything
+        try:
+            self.backend_command = build_uvicorn_command(
+                self.backend_host,
+                self.backend_port,
+                reload=True,
+                prod=self.prod,
+                **self.backend_options
+            )
+        except RuntimeError as e:
+            logger.error(f"❌ {e}")
+            return False
             
         # Start backend in a separate thread
         backend_thread = threading.Thread(target=self.start_backend, daemon=True)
@@ -128,11 +145,20 @@ class ServerManager:
         if self.frontend_process:
             logger.warning("🛑 Stopping frontend server...")
             self.frontend_process.terminate()
+
+        if self.backend_process and self.prod:
+            # SIGTERM makes uvicorn stop accepting connections and drain in-flight requests
+            graceful_timeout = self.backend_options.get("graceful_timeout", DEFAULT_GRACEFUL_TIMEOUT)
+            try:
+                self.backend_process.wait(timeout=graceful_timeout + 5)
+            except subprocess.TimeoutExpired:
+                logger.error("Backend did not stop in time, killing it")
+                self.backend_process.kill()
             
         logger.success("✅ Both servers stopped successfully.")
 
 def signal_handler(signum, frame, server_manager):
-    """Handle Ctrl+C gracefully."""
+    """Handle Ctrl+C and SIGTERM gracefully."""
     logger.warning("\n⚠️  Received interrupt signal. Shutting down servers...")
     server_manager.stop_servers()
     logger.success("👋 Goodbye!")
@@ -147,6 +173,7 @@ def main():
                        help=f"Frontend port (default: {DEFAULT_FRONTEND_PORT})")
     parser.add_argument("--backend-host", type=str, default=DEFAULT_BACKEND_HOST, 
                        help=f"Backend host (default: {DEFAULT_BACKEND_HOST})")
+    add_production_arguments(parser)
     
     args = parser.parse_args()
     
@@ -154,11 +181,17 @@ def main():
     server_manager = ServerManager(
         backend_port=args.backend_port,
         frontend_port=args.frontend_port,
-        backend_host=args.backend_host
+        backend_host=args.backend_host,
+        prod=args.prod,
+        workers=args.workers,
+        keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        graceful_timeout=args.graceful_timeout
     )
     
     # Set up signal handler for graceful shutdown
     signal.signal(signal.SIGINT, lambda s, f: signal_handler(s, f, server_manager))
+    signal.signal(signal.SIGTERM, lambda s, f: signal_handler(s, f, server_manager))
     
     # Start servers
     if server_manager.start_servers():
@@ -1,6 +1,8 @@
+import argparse
+import importlib.util
+import os
 import subprocess
 import sys
-import argparse
 
 # Import centralized logger
 sys.path.append('.')
@@ -10,19 +12,106 @@ from app.core.logger import logger
 DEFAULT_PORT = 8000
 DEFAULT_HOST = "localhost"
 
-def run_backend(host=DEFAULT_HOST, port=DEFAULT_PORT, reload=True):
-    """Start the backend server using uvicorn."""
+# Production mode defaults
+DEFAULT_KEEP_ALIVE = 5
+DEFAULT_BACKLOG = 2048
+DEFAULT_GRACEFUL_TIMEOUT = 30
+
+
+def default_workers() -> int:
+    """Number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def load_settings():
+    """Return the app settings, or None while required ones (usually from .env) are missing."""
+    from pydantic import ValidationError
     try:
-        cmd = [
-            sys.executable, "-m", "uvicorn", "app.main:app",
-            "--host", host,
-            "--port", str(port)
-        ]
-        
+        from app.core.config import settings
+    except ValidationError as e:
+        logger.warning(f"Cannot check the worker settings: {e.error_count()} required settings are missing")
+        return None
+    return settings
+
+
+def build_uvicorn_command(
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    reload=True,
+    prod=False,
+    workers=None,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    backlog=DEFAULT_BACKLOG,
+    graceful_timeout=DEFAULT_GRACEFUL_TIMEOUT
+):
+    """Build the uvicorn command line.
+
+    Production mode runs ``workers`` processes (one per CPU by default) without
+    reload or access log, uses uvloop/httptools when installed, and lets
+    in-flight requests finish for ``graceful_timeout`` seconds on SIGTERM.
+    Raises RuntimeError when the settings cannot run in production mode.
+    """
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", host,
+        "--port", str(port)
+    ]
+
+    if not prod:
         if reload:
             cmd.append("--reload")
-            
-        logger.info(f"Starting backend server at http://{host}:{port}")
+        return cmd
+
+    workers = workers or default_workers()
+    cmd += [
+        "--workers", str(workers),
+        "--timeout-keep-alive", str(keep_alive),
+        "--backlog", str(backlog),
+        "--timeout-graceful-shutdown", str(graceful_timeout),
+        "--no-access-log"
+    ]
+    for option, module in (("--loop", "uvloop"), ("--http", "httptools")):
+        if importlib.util.find_spec(module) is not None:
+            cmd += [option, module]
+        else:
+            logger.warning(f"{module} is not installed, falling back to the pure-Python implementation "
+                           f"(pip install -r requirements/prod.txt)")
+
+    settings = load_settings()
+    if settings is None:
+        return cmd
+    if not settings.SESSION_SECRET_KEYS:
+        # A random per-process key would log users out on every restart and reject them on other workers
+        raise RuntimeError("SESSION_SECRET_KEYS must be set in production mode, e.g. "
+                           "SESSION_SECRET_KEYS='[\"<random secret>\"]'")
+    if workers > 1 and not settings.DATABASE_URL:
+        logger.warning(f"DATABASE_URL is not set: each of the {workers} workers keeps its own in-memory "
+                       f"user store, so sessions created in one worker are invisible to the others")
+    if workers > 1 and not settings.SHARED_STATE_DIR:
+        logger.warning(f"SHARED_STATE_DIR is not set: each of the {workers} workers fetches its own app "
+                       f"access token and may refresh a token another worker is already refreshing")
+    return cmd
+
+
+def run_backend(host=DEFAULT_HOST, port=DEFAULT_PORT, reload=True, prod=False, **options):
+    """Start the backend server using uvicorn."""
+    try:
+        cmd = build_uvicorn_command(host, port, reload, prod, **options)
+    except RuntimeError as e:
+        logger.error(f"Failed to start backend server: {e}")
+        sys.exit(1)
+    logger.info(f"Starting backend server at http://{host}:{port}")
+
+    if prod:
+        # Replace this process so SIGTERM from the supervisor reaches uvicorn directly;
+        # removing the sinks first flushes queued log messages
+        logger.remove()
+        os.execv(sys.executable, cmd)
+
+    try:
         subprocess.run(cmd, check=True)
     except subprocess.CalledProcessError as e:
         logger.error(f"Failed to start backend server: {e}")
@@ -30,12 +119,37 @@ def run_backend(host=DEFAULT_HOST, port=DEFAULT_PORT, reload=True):
     except KeyboardInterrupt:
         logger.info("Backend server stopped")
 
+
+def add_production_arguments(parser):
+    """Add the production mode options shared with run.py."""
+    parser.add_argument("--prod", action="store_true",
+                        help="Production mode: multiple workers, no reload, uvloop/httptools when installed")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes in production mode (default: number of CPUs)")
+    parser.add_argument("--keep-alive", type=int, default=DEFAULT_KEEP_ALIVE,
+                        help=f"Seconds to keep idle connections open (default: {DEFAULT_KEEP_ALIVE})")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG,
+                        help=f"Pending connection backlog (default: {DEFAULT_BACKLOG})")
+    parser.add_argument("--graceful-timeout", type=int, default=DEFAULT_GRACEFUL_TIMEOUT,
+                        help=f"Seconds to drain in-flight requests on SIGTERM (default: {DEFAULT_GRACEFUL_TIMEOUT})")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the backend server")
     parser.add_argument("--host", type=str, default=DEFAULT_HOST, help=f"Host to run the server on (default: {DEFAULT_HOST})")
     parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to run the server on (default: {DEFAULT_PORT})")
     parser.add_argument("--no-reload", action="store_true", help="Disable auto-reload on code changes")
-    
+    add_production_arguments(parser)
+
     args = parser.parse_args()
-    
-    run_backend(args.host, args.port, not args.no_reload) 
\ No newline at end of file
+
+    run_backend(
+        args.host,
+        args.port,
+        not args.no_reload,
+        args.prod,
+        workers=args.workers,
+        keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        graceful_timeout=args.graceful_timeout
+    )
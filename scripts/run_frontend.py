@@ -1,30 +1,84 @@
 import http.server
-import socketserver
 import os
 import argparse
 import sys
+from urllib.parse import unquote, urlsplit
 
 # Import centralized logger
 sys.path.append('.')
 from app.core.logger import logger
+from app.core.static_assets import StaticAssetIndex, is_versioned, not_modified, not_modified_headers
 
 # Default port
 DEFAULT_PORT = 3000
 DEFAULT_DIRECTORY = "static"
 
 class FrontendHandler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DEFAULT_DIRECTORY, **kwargs)
-    
+    """Serve static assets with precompressed variants, strong ETags and Cache-Control.
+
+    Small files are answered from memory; larger ones are sent with sendfile.
+    """
+    # Keep connections open between page and asset requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't let Nagle hold the body back on kept-alive connections
+    disable_nagle_algorithm = True
+    assets = StaticAssetIndex(DEFAULT_DIRECTORY)
+
+    def do_GET(self):
+        self.serve_asset(send_body=True)
+
+    def do_HEAD(self):
+        self.serve_asset(send_body=False)
+
+    def serve_asset(self, send_body):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if path.endswith("/"):
+            path += "index.html"
+
+        asset = self.assets.get(path)
+        if asset is None:
+            self.send_error(404, "File not found")
+            return
+
+        encoding, body, etag = asset.select(self.headers.get("Accept-Encoding"))
+        headers = asset.headers(encoding, etag, is_versioned(url.query, asset.etag), body)
+        if not_modified(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            for name, value in not_modified_headers(headers).items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not send_body:
+            return
+        if body is not None:
+            self.wfile.write(body)
+        else:
+            with open(asset.path, "rb") as f:
+                self.connection.sendfile(f)
+
     def log_message(self, format, *args):
-        logger.info("%s - %s", self.address_string(), format % args)
+        logger.info("{} - {}", self.address_string(), format % args)
+
+
+class FrontendServer(http.server.ThreadingHTTPServer):
+    """One thread per connection, so a slow client never blocks other page loads."""
+    daemon_threads = True
+    request_queue_size = 128
+
 
 def run_server(port=DEFAULT_PORT):
     """Start the frontend server."""
     handler = FrontendHandler
-    
-    with socketserver.TCPServer(("", port), handler) as httpd:
-        logger.info(f"Serving frontend at http://localhost:{port}")
+    loaded = handler.assets.preload()
+
+    with FrontendServer(("", port), handler) as httpd:
+        logger.info(f"Serving frontend at http://localhost:{port} ({loaded} files preloaded)")
         logger.info("Press Ctrl+C to stop the server")
         try:
             httpd.serve_forever()
@@ -35,10 +89,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the frontend server")
     parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to run the server on (default: {DEFAULT_PORT})")
     args = parser.parse_args()
-    
+
     # Check if static directory exists
     if not os.path.exists(DEFAULT_DIRECTORY):
         logger.error(f"Directory '{DEFAULT_DIRECTORY}' not found")
         exit(1)
-        
-    run_server(args.port) 
\ No newline at end of file
+
+    run_server(args.port)
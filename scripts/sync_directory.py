@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import sys
+
+# Import centralized logger
+sys.path.append('.')
+from app.core.config import settings
+from app.core.http_client import close_http_client, init_http_client
+from app.core.logger import logger
+from app.core.storage import close_storage, init_storage
+from app.services.directory_sync import DirectorySync
+
+
+async def sync_directory(concurrency, page_size):
+    """Sync the Lark directory once into the storage configured by DATABASE_URL."""
+    await init_http_client()
+    storage = await init_storage()
+    try:
+        return await DirectorySync(concurrency, page_size).run(storage)
+    finally:
+        await close_storage()
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the organization's users from Lark into the user store")
+    parser.add_argument("--concurrency", type=int, default=settings.DIRECTORY_SYNC_CONCURRENCY,
+                        help=f"Departments fetched at once (default: {settings.DIRECTORY_SYNC_CONCURRENCY})")
+    parser.add_argument("--page-size", type=int, default=settings.DIRECTORY_SYNC_PAGE_SIZE,
+                        help=f"Users per contact API page (default: {settings.DIRECTORY_SYNC_PAGE_SIZE})")
+    args = parser.parse_args()
+
+    if not settings.DATABASE_URL:
+        logger.warning("DATABASE_URL is not set: synced users are kept in memory and discarded on exit")
+
+    try:
+        result = asyncio.run(sync_directory(args.concurrency, args.page_size))
+    except Exception as e:
+        logger.error(f"Directory sync failed: {e!r}")
+        sys.exit(1)
+    logger.info(f"Synced {result['users']} users in {result['seconds']}s ({result['users_per_second']} users/s): "
+                f"{result['created']} created, {result['updated']} updated, {result['unchanged']} unchanged")
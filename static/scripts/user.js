@@ -40,17 +40,24 @@ document.addEventListener('DOMContentLoaded', async () => {
             loadingMessage.textContent = 'Error loading user information. Please try again.';
         }
     } else {
-        // Check if we have user data in localStorage
-        const storedUserData = localStorage.getItem('larkUserData');
-        if (storedUserData) {
-            try {
-                const userData = JSON.parse(storedUserData);
-                displayUserInfo(userData);
-            } catch (error) {
-                console.error('Error parsing user data:', error);
-                loadingMessage.textContent = 'Error loading user information. Please try again.';
+        // Later visits identify the user from the session cookie, which any worker verifies without a store lookup
+        try {
+            const response = await fetch(`${backendUrl}/api/user/me`, { credentials: 'include' });
+            if (!response.ok) {
+                throw new Error('Session expired');
             }
-        } else {
+            
+            const session = await response.json();
+            displayUserInfo({
+                id: session.user_id,
+                name: session.name,
+                email: session.email,
+                avatar_url: session.avatar_url
+            });
+        } catch (error) {
+            console.error('Error loading session:', error);
+            localStorage.removeItem('larkAuthData');
+            localStorage.removeItem('larkUserData');
             loadingMessage.textContent = 'No user information found. Please log in again.';
         }
     }
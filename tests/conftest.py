@@ -0,0 +1,12 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Placeholder credentials so the application settings load without a .env file
+os.environ.setdefault("LARK_APP_ID", "test_app_id")
+os.environ.setdefault("LARK_APP_SECRET", "test_app_secret")
+os.environ.setdefault("REDIRECT_URI", "http://localhost:8000/api/auth/user/lark/callback")
+os.environ.setdefault("LOG_FILE", "")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("AUDIT_LOG_DIR", "")
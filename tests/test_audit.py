@@ -0,0 +1,75 @@
+"""
+Reading the audit streams of several workers through one of them.
+"""
+
+import asyncio
+import json
+from typing import Dict, List
+
+import pytest
+
+from app.core.audit import AuditCursor, AuditLog
+
+
+def audit_log(root: str) -> AuditLog:
+    return AuditLog(root, buffer_size=100, flush_interval=0.05, flush_batch=100, segment_bytes=1 << 20)
+
+
+def read(log: AuditLog, since: str, limit: int = 1000) -> List[Dict]:
+    return [json.loads(line) for chunk in log.read(AuditCursor.parse(since), limit) for line in chunk.splitlines()]
+
+
+def cursor_after(events: List[Dict], since: str = "0") -> str:
+    cursor = AuditCursor.parse(since)
+    for event in events:
+        cursor.positions[event["stream"]] = event["seq"]
+    return ",".join(f"{stream}:{seq}" for stream, seq in cursor.positions.items())
+
+
+def test_cursor_parsing():
+    cursor = AuditCursor.parse("5,worker-1:17")
+    assert cursor.get("worker-1") == 17
+    assert cursor.get("worker-0") == 5
+    for invalid in ("", "worker-0:", "worker-0:-1", "x"):
+        with pytest.raises(ValueError):
+            AuditCursor.parse(invalid)
+
+
+def test_events_of_every_worker_are_merged_and_resumed(tmp_path):
+    async def scenario():
+        first, second = audit_log(str(tmp_path)), audit_log(str(tmp_path))
+        await first.start()
+        await second.start()
+        assert {first.stream, second.stream} == {"worker-0", "worker-1"}
+
+        # Timestamps have millisecond precision
+        for n in range(3):
+            first.emit("login", n=n)
+            await asyncio.sleep(0.002)
+            second.emit("refresh", n=n)
+            await asyncio.sleep(0.002)
+        await second.stop()
+
+        events = read(first, "0")
+        assert [(event["stream"], event["seq"]) for event in events] == [
+            (stream, seq) for seq in (1, 2, 3) for stream in ("worker-0", "worker-1")
+        ]
+
+        # The cursor resumes each stream where the reader left it
+        cursor = cursor_after(events[:3])
+        assert [(event["stream"], event["seq"]) for event in read(first, cursor)] == [
+            ("worker-1", 2), ("worker-0", 3), ("worker-1", 3)
+        ]
+        assert read(first, cursor_after(events)) == []
+        assert len(read(first, "0", limit=4)) == 4
+
+        # A flushed event of another worker ends a long poll
+        waiting = asyncio.create_task(first.wait_for_events(AuditCursor.parse(cursor_after(events)), 5.0))
+        await second.start()
+        second.emit("refresh", n=3)
+        await asyncio.wait_for(waiting, 1.0)
+        await second.stop()
+        assert [(event["stream"], event["seq"]) for event in read(first, cursor_after(events))] == [("worker-1", 4)]
+        await first.stop()
+
+    asyncio.run(scenario())
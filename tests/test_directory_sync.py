@@ -0,0 +1,67 @@
+"""
+Directory sync against stubbed contact API pages.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+import pytest
+
+from app.core.repository import UserRepository
+from app.core.storage.memory import MemoryStorage
+from app.services import directory_sync
+from app.services.directory_sync import DirectorySync
+
+DEPARTMENTS = 50
+
+
+def user_item(n: int) -> Dict[str, Any]:
+    return {"open_id": f"ou_{n}", "union_id": f"on_{n}", "name": f"User {n}"}
+
+
+@pytest.fixture
+def contact_api(monkeypatch):
+    """Serve DEPARTMENTS departments with one user each; departments listed in ``failing`` raise."""
+    failing = {}
+
+    async def list_departments_page(page_token: Optional[str] = None, page_size: int = 50):
+        return {"items": [{"open_department_id": str(n)} for n in range(1, DEPARTMENTS)], "has_more": False}
+
+    async def list_department_users_page(department_id: str, page_token: Optional[str] = None,
+                                         page_size: int = 50):
+        if department_id in failing:
+            raise failing[department_id]
+        return {"items": [user_item(int(department_id))], "has_more": False}
+
+    monkeypatch.setattr(directory_sync, "list_departments_page", list_departments_page)
+    monkeypatch.setattr(directory_sync, "list_department_users_page", list_department_users_page)
+    return failing
+
+
+def test_worker_failure_ends_the_sync(contact_api):
+    # Every worker dies while the lister still has more departments than fit in the queue
+    contact_api.update({str(n): RuntimeError("boom") for n in range(DEPARTMENTS)})
+    storage = MemoryStorage(UserRepository({}), {})
+
+    async def run():
+        await asyncio.wait_for(DirectorySync(concurrency=2, page_size=50).run(storage), timeout=5)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(run())
+
+
+def test_every_sync_stores_users_missing_from_storage(contact_api):
+    storage = MemoryStorage(UserRepository({}), {})
+    sync = DirectorySync(concurrency=4, page_size=50)
+
+    first = asyncio.run(sync.run(storage))
+    assert first["created"] == DEPARTMENTS
+
+    # Dropped the way the MEMORY_STORE_MAX_USERS eviction drops users
+    evicted = asyncio.run(storage.get_user_by_open_id("ou_7"))
+    storage.users.delete(evicted.id)
+
+    second = asyncio.run(sync.run(storage))
+    assert second["created"] == 1
+    assert second["unchanged"] == DEPARTMENTS - 1
+    assert asyncio.run(storage.get_user_by_open_id("ou_7")) is not None
@@ -0,0 +1,22 @@
+"""
+Size-based rotation of the batched log file.
+"""
+
+import os
+
+from app.core.logger import RotatingFile
+
+
+def test_files_rotate_by_encoded_size(tmp_path):
+    path = str(tmp_path / "app.log")
+    log = RotatingFile(path, max_bytes=100)
+    # 10 characters, 26 bytes in UTF-8
+    line = "日志" * 4 + "!\n"
+    for _ in range(7):
+        log.write(line)
+    log.close()
+
+    sizes = sorted(os.path.getsize(os.path.join(tmp_path, name)) for name in os.listdir(tmp_path))
+    assert sizes == [26, 78, 78]
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == line
@@ -0,0 +1,82 @@
+"""
+Which failed code exchanges are cached, and who may be handed a replayed login.
+"""
+
+import asyncio
+from collections import Counter
+from typing import Optional
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.repository import UserRepository
+from app.core.storage.memory import MemoryStorage
+from app.services.lark_service import complete_login
+
+
+def lark_stub(exchange_error: int = 0):
+    calls = Counter()
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.rsplit("/", 1)[-1]
+        calls[endpoint] += 1
+        if endpoint == "internal":
+            return httpx.Response(200, json={"code": 0, "app_access_token": "a-token", "expire": 7200})
+        if endpoint == "access_token" and exchange_error:
+            return httpx.Response(200, json={"code": exchange_error, "msg": "stubbed failure"})
+        if endpoint == "access_token":
+            # Lark accepts a code once
+            if calls[endpoint] > 1:
+                return httpx.Response(200, json={"code": 20065, "msg": "code already used"})
+            return httpx.Response(200, json={"code": 0, "data": {
+                "access_token": "u-token", "refresh_token": "ur-token", "expires_in": 7200
+            }})
+        return httpx.Response(200, json={"code": 0, "data": {
+            "name": "User", "open_id": "ou_1", "union_id": "on_1", "email": None, "avatar_url": None
+        }})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle)), calls
+
+
+def login_twice(code: str, client: httpx.AsyncClient, first_state: Optional[str], second_state: Optional[str]):
+    storage = MemoryStorage(UserRepository({}), {})
+    outcomes = []
+
+    async def attempt(state: Optional[str]):
+        try:
+            result, replayed = await complete_login(code, client, storage, state=state)
+            outcomes.append("replayed" if replayed else "logged in")
+        except HTTPException as e:
+            outcomes.append(e.status_code)
+
+    asyncio.run(attempt(first_state))
+    asyncio.run(attempt(second_state))
+    return outcomes
+
+
+@pytest.mark.parametrize("error", [20003, 20004, 20065])
+def test_rejected_code_is_answered_from_the_cache(error: int):
+    client, calls = lark_stub(error)
+    assert login_twice(f"rejected-{error}", client, "s", "s") == [401, 401]
+    assert calls["access_token"] == 1
+
+
+@pytest.mark.parametrize("error", [20002, 20050, -1])
+def test_other_lark_errors_are_not_cached(error: int):
+    client, calls = lark_stub(error)
+    assert login_twice(f"failed-{error}", client, "s", "s") == [401, 401]
+    assert calls["access_token"] == 2
+
+
+def test_login_is_replayed_to_the_browser_that_started_it():
+    client, calls = lark_stub()
+    assert login_twice("code-1", client, "s", "s") == ["logged in", "replayed"]
+    assert calls["access_token"] == 1
+
+
+@pytest.mark.parametrize("second_state", ["other", None])
+def test_login_is_not_replayed_to_anyone_else_holding_the_code(second_state: Optional[str]):
+    client, calls = lark_stub()
+    assert login_twice(f"code-{second_state}", client, "s", second_state) == ["logged in", 401]
+    assert calls["access_token"] == 2
@@ -0,0 +1,126 @@
+"""
+Snapshots and write-ahead log of the in-memory store.
+"""
+
+import asyncio
+import os
+import pickle
+import stat
+import zlib
+
+import pytest
+
+from app.core.models import SessionRecord, UserRecord
+from app.core.repository import UserRepository
+from app.core.storage.memory import MemoryStorage
+from app.core.storage.persistence import FRAME_HEADER, StorePersistence
+
+NOW = 1767605412.345678
+
+
+def persistence(directory: str) -> StorePersistence:
+    return StorePersistence(directory, snapshot_interval=3600, flush_interval=3600)
+
+
+def record_user(storage: MemoryStorage, n: int) -> None:
+    user = UserRecord(f"id-{n}", f"User {n}", None, f"ou_{n}", f"on_{n}", None, NOW, NOW + n)
+    session = SessionRecord(f"id-{n}", f"at-{n}", "Bearer", f"rt-{n}", NOW + 7200, NOW + 86400, n)
+    storage.users.upsert(user)
+    storage.auths[user.id] = session
+    storage.persistence.user(user)
+    storage.persistence.session(session)
+
+
+def open_store(directory: str) -> MemoryStorage:
+    store = persistence(directory)
+    assert store.claim()
+    users, sessions = store.load()
+    return MemoryStorage(UserRepository(users), sessions, persistence=store)
+
+
+def restored(directory: str):
+    users, sessions = persistence(directory).load()
+    return {user_id: (user.name, user.updated_at) for user_id, user in users.items()}, \
+        {user_id: (session.refresh_token, session.version) for user_id, session in sessions.items()}
+
+
+def test_snapshot_and_log_are_restored_as_plain_records(tmp_path):
+    directory = str(tmp_path / "store")
+
+    async def scenario():
+        storage = open_store(directory)
+        await storage.persistence.start(storage)
+        for n in range(3):
+            record_user(storage, n)
+        await storage.persistence.snapshot(storage)
+        record_user(storage, 3)
+        storage.persistence.delete_session("id-0")
+        await storage.persistence._flush()
+
+    asyncio.run(scenario())
+    users, sessions = restored(directory)
+    assert users == {f"id-{n}": (f"User {n}", NOW + n) for n in range(4)}
+    assert sessions == {f"id-{n}": (f"rt-{n}", n) for n in range(1, 4)}
+
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    for name in os.listdir(directory):
+        assert stat.S_IMODE(os.stat(os.path.join(directory, name)).st_mode) == 0o600, name
+
+
+def test_pickled_and_foreign_files_are_not_loaded(tmp_path):
+    directory = tmp_path / "store"
+    directory.mkdir(mode=0o700)
+
+    class Planted:
+        def __reduce__(self):
+            return (os.system, (f"touch {tmp_path / 'pwned'}",))
+
+    data = pickle.dumps([(1, ("id-x", "X", None, "ou_x", "on_x", None, NOW, NOW)), Planted()])
+    (directory / "wal-00000001.log").write_bytes(FRAME_HEADER.pack(len(data), zlib.crc32(data)) + data)
+    assert restored(str(directory)) == ({}, {})
+    assert not (tmp_path / "pwned").exists()
+
+    if os.getuid() != 0:
+        pytest.skip("changing a file's owner needs root")
+    os.remove(directory / "wal-00000001.log")
+
+    async def write_log():
+        storage = open_store(str(directory))
+        await storage.persistence.start(storage)
+        record_user(storage, 1)
+        await storage.persistence._flush()
+
+    asyncio.run(write_log())
+    assert restored(str(directory))[0] == {"id-1": ("User 1", NOW + 1)}
+    for name in os.listdir(directory):
+        os.chown(directory / name, 12345, -1)
+    assert restored(str(directory)) == ({}, {})
+
+
+def test_failed_flush_keeps_the_batch_for_the_next_log(tmp_path, monkeypatch):
+    directory = str(tmp_path / "store")
+
+    async def scenario():
+        storage = open_store(directory)
+        store = storage.persistence
+        await store.start(storage)
+        record_user(storage, 1)
+        append = store._append
+
+        def torn_append(wal, batch):
+            wal.write(b"\0\0\1\0partial")
+            raise OSError(28, "No space left on device")
+
+        monkeypatch.setattr(store, "_append", torn_append)
+        with pytest.raises(OSError):
+            await store._flush()
+        assert len(store.journal) == 2
+
+        record_user(storage, 2)
+        monkeypatch.setattr(store, "_append", append)
+        await store._flush()
+        assert store.journal == []
+
+    asyncio.run(scenario())
+    users, sessions = restored(directory)
+    assert set(users) == set(sessions) == {"id-1", "id-2"}
@@ -0,0 +1,54 @@
+"""
+Proactive refreshes by the schedulers of several workers sharing one store.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from app.core.models import UserAuth
+from app.core.repository import UserRepository
+from app.core.storage.memory import MemoryStorage
+from app.services import lark_service
+from app.services.lark_service import refresh_user_session
+from app.services.refresh_scheduler import RefreshScheduler
+
+
+def test_session_refreshed_by_another_worker_is_rescheduled_not_refreshed(monkeypatch):
+    storage = MemoryStorage(UserRepository({}), {})
+    calls = []
+
+    async def refresh_access_token(refresh_token, client=None):
+        calls.append(refresh_token)
+        now = datetime.now()
+        return {"access_token": f"at-{len(calls)}", "refresh_token": f"rt-{len(calls)}",
+                "expires_at": now + timedelta(hours=2), "refresh_expires_at": now + timedelta(days=30)}
+
+    monkeypatch.setattr(lark_service, "refresh_access_token", refresh_access_token)
+
+    async def scenario():
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=1.2)
+        await storage.save_auth(UserAuth(user_id="u1", access_token="at-0", token_type="Bearer", refresh_token="rt-0",
+                                         expires_at=expires_at, refresh_expires_at=now + timedelta(days=30)))
+
+        # Both workers learned the same expiry; the first is due after 0.2s, the second after 0.7s
+        first = RefreshScheduler(margin=1.0, jitter=0.0, concurrency=1)
+        second = RefreshScheduler(margin=0.5, jitter=0.0, concurrency=1)
+        for scheduler in (first, second):
+            await scheduler.start(lambda user_id: refresh_user_session(user_id, storage), [("u1", expires_at)])
+        try:
+            await asyncio.sleep(1.0)
+        finally:
+            stats = first.stats(), second.stats()
+            stored = await storage.get_auth("u1")
+            due = second._due.get("u1")
+            await first.stop()
+            await second.stop()
+
+        assert calls == ["rt-0"]
+        assert stored.refresh_token == "rt-1"
+        assert stats[0]["failed"] == stats[1]["failed"] == 0
+        # The second worker picks up the stored expiry instead of refreshing again
+        assert due == stored.expires_at.timestamp() - 0.5
+
+    asyncio.run(scenario())
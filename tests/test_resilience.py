@@ -0,0 +1,220 @@
+"""
+Retries, deadlines and the circuit breaker against a fault-injecting stub of the Lark API.
+"""
+
+import asyncio
+import time
+from typing import List, Tuple, Union
+
+import httpx
+import pytest
+
+from app.services.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RetryPolicy, send_with_resilience
+)
+
+URL = "https://lark.test/open-apis/authen/v1/user_info"
+
+Fault = Union[int, float, Tuple[float, int], Exception]
+
+
+class FaultStub:
+    """Answer each request with the next scripted fault.
+
+    A fault is a status code, a delay in seconds before a 200, a ``(delay, status code)`` pair, or an
+    exception to raise. Once the script is exhausted every request gets a 200.
+    """
+
+    def __init__(self, *faults: Fault):
+        self.faults: List[Fault] = list(faults)
+        self.calls = 0
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        fault = self.faults.pop(0) if self.faults else 200
+        if isinstance(fault, Exception):
+            raise fault
+        if isinstance(fault, float):
+            fault = (fault, 200)
+        if isinstance(fault, tuple):
+            delay, fault = fault
+            await asyncio.sleep(delay)
+        return httpx.Response(fault, json={"code": 0}, request=request)
+
+    def send(self):
+        return self.client.get(URL)
+
+
+def breaker(minimum_calls: int = 4, reset_timeout: float = 0.05) -> CircuitBreaker:
+    return CircuitBreaker(failure_rate=0.5, minimum_calls=minimum_calls, window=30, reset_timeout=reset_timeout)
+
+
+def policy(attempts: int = 3, deadline: float = 5.0) -> RetryPolicy:
+    return RetryPolicy(attempts=attempts, base_delay=0.001, max_delay=0.005, deadline=deadline)
+
+
+def call(stub: FaultStub, circuit: CircuitBreaker, retry: RetryPolicy, idempotent: bool = True) -> httpx.Response:
+    return asyncio.run(send_with_resilience(stub.send, circuit, retry, idempotent))
+
+
+def test_transient_failures_are_retried():
+    stub = FaultStub(503, httpx.ReadError("reset"))
+    response = call(stub, breaker(minimum_calls=10), policy())
+    assert response.status_code == 200
+    assert stub.calls == 3
+
+
+def test_retries_stop_at_the_attempt_limit():
+    stub = FaultStub(503, 503, 503, 503)
+    with pytest.raises(httpx.HTTPStatusError):
+        call(stub, breaker(minimum_calls=10), policy(attempts=3))
+    assert stub.calls == 3
+
+
+def test_retries_stop_within_the_deadline():
+    stub = FaultStub(*[(0.1, 503)] * 10)
+    start = time.monotonic()
+    with pytest.raises(httpx.HTTPError):
+        call(stub, breaker(minimum_calls=10), policy(attempts=10, deadline=0.25))
+    assert time.monotonic() - start < 0.4
+    assert stub.calls <= 3
+
+
+def test_hanging_call_is_cut_at_the_deadline():
+    stub = FaultStub(10.0)
+    start = time.monotonic()
+    with pytest.raises(httpx.TimeoutException):
+        call(stub, breaker(minimum_calls=10), policy(deadline=0.1))
+    assert time.monotonic() - start < 0.3
+    assert stub.calls == 1
+
+
+@pytest.mark.parametrize("fault", [503, httpx.ReadError("reset")])
+def test_non_idempotent_call_is_not_retried_once_sent(fault: Fault):
+    stub = FaultStub(fault)
+    with pytest.raises(httpx.HTTPError):
+        call(stub, breaker(minimum_calls=10), policy(), idempotent=False)
+    assert stub.calls == 1
+
+
+@pytest.mark.parametrize("fault", [httpx.ConnectError("refused"), 429])
+def test_non_idempotent_call_is_retried_when_never_processed(fault: Fault):
+    stub = FaultStub(fault)
+    assert call(stub, breaker(minimum_calls=10), policy(), idempotent=False).status_code == 200
+    assert stub.calls == 2
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 404])
+def test_client_errors_are_not_retried_or_counted(status_code: int):
+    stub = FaultStub(*[status_code] * 5)
+    circuit = breaker(minimum_calls=2)
+    for _ in range(5):
+        with pytest.raises(httpx.HTTPStatusError):
+            call(stub, circuit, policy())
+    assert stub.calls == 5
+    assert circuit.state == CLOSED
+
+
+def test_circuit_opens_after_the_failure_threshold():
+    stub = FaultStub(*[503] * 4)
+    circuit = breaker(minimum_calls=4, reset_timeout=30)
+    for _ in range(4):
+        with pytest.raises(httpx.HTTPStatusError):
+            call(stub, circuit, policy(attempts=1))
+    assert circuit.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        call(stub, circuit, policy(attempts=1))
+    assert stub.calls == 4
+
+
+def test_half_open_probe_recovers_the_circuit():
+    stub = FaultStub(*[503] * 4, 0.05)
+    circuit = breaker(minimum_calls=4, reset_timeout=0.05)
+    for _ in range(4):
+        with pytest.raises(httpx.HTTPStatusError):
+            call(stub, circuit, policy(attempts=1))
+    time.sleep(0.06)
+
+    async def probe_and_second_call():
+        probe = asyncio.create_task(send_with_resilience(stub.send, circuit, policy(attempts=1), True))
+        await asyncio.sleep(0.01)
+        assert circuit.state == HALF_OPEN
+        # Only one probe at a time
+        with pytest.raises(CircuitOpenError):
+            await send_with_resilience(stub.send, circuit, policy(attempts=1), True)
+        return await probe
+
+    assert asyncio.run(probe_and_second_call()).status_code == 200
+    assert circuit.state == CLOSED
+    assert stub.calls == 5
+
+
+def test_failed_probe_opens_the_circuit_again():
+    stub = FaultStub(*[503] * 5)
+    circuit = breaker(minimum_calls=4, reset_timeout=0.05)
+    for _ in range(4):
+        with pytest.raises(httpx.HTTPStatusError):
+            call(stub, circuit, policy(attempts=1))
+    time.sleep(0.06)
+    with pytest.raises(httpx.HTTPStatusError):
+        call(stub, circuit, policy(attempts=1))
+    assert circuit.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        call(stub, circuit, policy(attempts=1))
+    assert stub.calls == 5
+
+
+def open_circuit(circuit: CircuitBreaker) -> None:
+    for _ in range(circuit.minimum_calls):
+        circuit.record(False, circuit.check())
+    assert circuit.state == OPEN
+
+
+def test_call_from_before_the_circuit_opened_cannot_close_it():
+    circuit = breaker(reset_timeout=0.01)
+    slow_call = circuit.check()
+    open_circuit(circuit)
+    time.sleep(0.02)
+    probe = circuit.check()
+    assert circuit.state == HALF_OPEN
+
+    circuit.record(True, slow_call)
+    assert circuit.state == HALF_OPEN
+    circuit.record(False, slow_call)
+    assert circuit.state == HALF_OPEN
+
+    circuit.record(True, probe)
+    assert circuit.state == CLOSED
+
+
+def test_call_from_before_recovery_cannot_reopen_the_circuit():
+    circuit = breaker(reset_timeout=0.01)
+    open_circuit(circuit)
+    time.sleep(0.02)
+    probe = circuit.check()
+    circuit.record(True, probe)
+    assert circuit.state == CLOSED
+
+    # Late outcomes of the probe and of calls from before it, reported after the recovery
+    circuit.record(False, probe - 1)
+    circuit.record(False, probe)
+    assert circuit.state == CLOSED
+    assert circuit._failures == 0
+
+
+def test_replaced_probe_does_not_decide():
+    circuit = breaker(reset_timeout=0.01)
+    open_circuit(circuit)
+    time.sleep(0.02)
+    stuck_probe = circuit.check()
+    # The probe never reported back within reset_timeout, so another one is let through
+    time.sleep(0.02)
+    probe = circuit.check()
+    assert probe != stuck_probe
+
+    circuit.record(False, stuck_probe)
+    assert circuit.state == HALF_OPEN
+    circuit.record(True, probe)
+    assert circuit.state == CLOSED
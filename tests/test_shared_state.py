@@ -0,0 +1,63 @@
+"""
+State shared between worker processes through SHARED_STATE_DIR.
+"""
+
+import asyncio
+import os
+import socket
+import stat
+
+import httpx
+
+from app.core.shared_state import SharedState
+from benchmarks.bench_shared_state import CALLS_PER_TOKEN, run_workers
+from benchmarks.mock_lark import MockLarkConfig, MockLarkServer
+
+WORKERS = 4
+TOKENS = 10
+
+
+def mode(path: str) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_state_files_are_private_to_the_workers_user(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        directory = str(tmp_path / "shared")
+        state = SharedState(directory, lock_timeout=1.0, result_ttl=10.0)
+        state.publish_token("app_token", "t-secret", 2e9)
+
+        async def refresh():
+            async with state.refresh_lease("r-secret") as lease:
+                lease.publish({"access_token": "u-secret"})
+
+        asyncio.run(refresh())
+    finally:
+        os.umask(umask)
+
+    assert mode(directory) == 0o700
+    files = os.listdir(directory)
+    assert "app_token.json" in files and any(name.startswith("refresh-") and name.endswith(".json") for name in files)
+    for name in files:
+        assert mode(os.path.join(directory, name)) == 0o600, name
+
+
+def test_workers_renew_and_refresh_each_token_once(tmp_path):
+    with MockLarkServer(MockLarkConfig(latency=0.02), port=free_port()) as mock:
+        elapsed, app_tokens, failed = run_workers(mock.base_url, WORKERS, TOKENS, str(tmp_path), "test")
+        calls = httpx.get(mock.base_url.replace("/open-apis", "/_stats")).json()
+
+    # Every worker ends up with the one app token a single worker fetched
+    assert calls.get("app_access_token", 0) == 1
+    assert app_tokens == 1
+    # Each refresh token reaches Lark once; concurrent refreshes in every worker get that result
+    assert calls.get("oidc_refresh_access_token", 0) == TOKENS
+    assert calls.get("reused_refresh_tokens", 0) == 0
+    assert failed == 0, f"{failed}/{WORKERS * TOKENS * CALLS_PER_TOKEN} refreshes failed"
@@ -0,0 +1,35 @@
+"""
+Versioned asset URLs in the static pages.
+"""
+
+from app.core.static_assets import StaticAssetIndex, is_versioned
+
+
+def test_pages_link_assets_by_content_hash(tmp_path):
+    (tmp_path / "scripts").mkdir()
+    (tmp_path / "styles.css").write_text("body { color: red; }")
+    (tmp_path / "scripts" / "app.js").write_text("console.log(1);")
+    (tmp_path / "index.html").write_text(
+        '<link rel="stylesheet" href="styles.css">\n'
+        '<script src="scripts/app.js"></script>\n'
+        '<script src="https://cdn.example.com/lib.js"></script>\n'
+        '<a href="styles.css">&lt;link href="styles.css"&gt;</a>\n'
+    )
+    assets = StaticAssetIndex(str(tmp_path))
+    css, js = assets.get("styles.css"), assets.get("scripts/app.js")
+    page = assets.get("index.html").bodies["identity"].decode()
+    assert page == (
+        f'<link rel="stylesheet" href="styles.css?v={css.etag}">\n'
+        f'<script src="scripts/app.js?v={js.etag}"></script>\n'
+        '<script src="https://cdn.example.com/lib.js"></script>\n'
+        '<a href="styles.css">&lt;link href="styles.css"&gt;</a>\n'
+    )
+    assert is_versioned(f"v={css.etag}", css.etag)
+    assert not is_versioned("v=old", css.etag)
+    assert not is_versioned("", css.etag)
+
+    # Changing an asset changes the page, even though the page file itself is untouched
+    (tmp_path / "styles.css").write_text("body { color: blue; }")
+    page = assets.get("index.html").bodies["identity"].decode()
+    assert f'href="styles.css?v={assets.get("styles.css").etag}"' in page
+    assert css.etag not in page
@@ -0,0 +1,73 @@
+"""
+Cached GET /api/user/{user_id} responses never outlive the stored user or session.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from app.api.endpoints.user import get_user
+from app.core.cache import TTLCache, user_response_cache
+from app.core.models import User, UserAuth
+from app.core.repository import UserRepository
+from app.core.storage.memory import MemoryStorage
+from app.core.storage.sqlite import SqliteStorage
+
+
+def user(n: int) -> User:
+    now = datetime.now()
+    return User(id=f"id-{n}", name=f"User {n}", open_id=f"ou_{n}", union_id=f"on_{n}", created_at=now, updated_at=now)
+
+
+def auth(n: int, token: str, refresh_expires_at: datetime) -> UserAuth:
+    return UserAuth(user_id=f"id-{n}", access_token=f"at-{token}", token_type="Bearer", refresh_token=f"rt-{token}",
+                    expires_at=datetime.now() + timedelta(hours=2), refresh_expires_at=refresh_expires_at)
+
+
+def test_evicted_and_purged_sessions_leave_the_cache():
+    cache = TTLCache(ttl=60, max_entries=10)
+    storage = MemoryStorage(UserRepository({}), {}, max_users=2, on_remove=cache.delete)
+
+    async def scenario():
+        await storage.save_user(user(1))
+        await storage.save_auth(auth(1, "1", datetime.now() - timedelta(minutes=5)))
+        await storage.save_user(user(2))
+        for n in (1, 2):
+            cache.set(f"id-{n}", "rendered")
+
+        assert await storage.purge_expired_sessions() == 1
+        assert cache.get("id-1") is None
+
+        await storage.save_user(user(3))
+        assert await storage.get_user("id-1") is None
+        assert cache.get("id-2") == "rendered"
+        await storage.save_user(user(4))
+        assert cache.get("id-2") is None
+
+    asyncio.run(scenario())
+
+
+def test_shared_storage_serves_what_another_worker_wrote(tmp_path):
+    path = str(tmp_path / "users.db")
+    user_response_cache.clear()
+
+    async def scenario():
+        this_worker, other_worker = SqliteStorage(path), SqliteStorage(path)
+        await this_worker.init()
+        await other_worker.init()
+        try:
+            later = datetime.now() + timedelta(days=30)
+            await this_worker.save_user(user(1))
+            await this_worker.save_auth(auth(1, "first", later))
+            first = json.loads((await get_user("id-1", this_worker, None)).body)
+
+            await other_worker.save_auth(auth(1, "rotated", later))
+            second = json.loads((await get_user("id-1", this_worker, None)).body)
+        finally:
+            await this_worker.close()
+            await other_worker.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["auth"]["refresh_token"] == "rt-first"
+    assert second["auth"]["refresh_token"] == "rt-rotated"